@@ -0,0 +1,182 @@
+"""Initial schema (adopts databases created by the old startup create_all/ALTERs)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+risklevel = postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', name='risklevel', create_type=False)
+
+# Columns the old startup() added with ALTER TABLE ... ADD COLUMN IF NOT EXISTS
+LEGACY_COLUMNS = [
+    "ALTER TABLE patient_profiles ADD COLUMN IF NOT EXISTS chief_complaint JSON DEFAULT '[]'::json",
+    "ALTER TABLE escalations ADD COLUMN IF NOT EXISTS patient_profile_snapshot JSON",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS hashed_password VARCHAR",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS role VARCHAR DEFAULT 'patient'",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS clinic_id VARCHAR",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS audio_transcript_id VARCHAR",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS audio_url VARCHAR",
+]
+
+# Frozen copy of ActivityService.rebuild at this revision
+BACKFILL_PATIENT_ACTIVITY = """
+WITH stats AS (
+    SELECT c.user_id AS patient_id,
+           max(m.timestamp) AS last_message_at,
+           max(m.timestamp) FILTER (WHERE m.sender_type = 'patient') AS last_patient_message_at,
+           max(m.timestamp) FILTER (WHERE m.sender_type = 'clinician') AS last_clinician_reply_at
+    FROM conversations c JOIN messages m ON m.conversation_id = c.id
+    GROUP BY c.user_id
+), unread AS (
+    SELECT c.user_id AS patient_id, count(m.id) AS unread_count
+    FROM conversations c
+    JOIN messages m ON m.conversation_id = c.id
+    JOIN stats s ON s.patient_id = c.user_id
+    WHERE m.sender_type = 'patient'
+      AND (s.last_clinician_reply_at IS NULL OR m.timestamp > s.last_clinician_reply_at)
+    GROUP BY c.user_id
+), pending AS (
+    SELECT c.user_id AS patient_id, count(e.id) AS pending_count, max(m.risk_level) AS highest_open_risk
+    FROM conversations c
+    JOIN escalations e ON e.conversation_id = c.id
+    LEFT JOIN messages m ON m.id = e.trigger_message_id
+    WHERE e.status = 'pending'
+    GROUP BY c.user_id
+)
+INSERT INTO patient_activity (patient_id, clinic_id, last_message_at, last_patient_message_at,
+                              last_clinician_reply_at, unread_count, pending_escalation_count,
+                              highest_open_risk, updated_at)
+SELECT u.id, u.clinic_id, s.last_message_at, s.last_patient_message_at, s.last_clinician_reply_at,
+       coalesce(un.unread_count, 0), coalesce(p.pending_count, 0), p.highest_open_risk, now()
+FROM users u
+LEFT JOIN stats s ON s.patient_id = u.id
+LEFT JOIN unread un ON un.patient_id = u.id
+LEFT JOIN pending p ON p.patient_id = u.id
+WHERE u.role = 'patient'
+ON CONFLICT (patient_id) DO NOTHING
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+
+    risklevel.create(bind, checkfirst=True)
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('hashed_password', sa.String(), nullable=False),
+            sa.Column('role', sa.String(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('clinic_id', sa.String(), nullable=True),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if 'conversations' not in existing:
+        op.create_table(
+            'conversations',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('title', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_conversations_id', 'conversations', ['id'])
+
+    if 'messages' not in existing:
+        op.create_table(
+            'messages',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('conversation_id', sa.Integer(), sa.ForeignKey('conversations.id'), nullable=True),
+            sa.Column('sender_type', sa.String(), nullable=True),
+            sa.Column('content', sa.String(), nullable=True),
+            sa.Column('content_redacted', sa.String(), nullable=True),
+            sa.Column('risk_level', risklevel, nullable=True),
+            sa.Column('risk_reason', sa.String(), nullable=True),
+            sa.Column('confidence_score', sa.Integer(), nullable=True),
+            sa.Column('audio_transcript_id', sa.String(), nullable=True),
+            sa.Column('audio_url', sa.String(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_messages_id', 'messages', ['id'])
+
+    if 'patient_profiles' not in existing:
+        op.create_table(
+            'patient_profiles',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('patient_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+            sa.Column('medications', sa.JSON(), nullable=True),
+            sa.Column('symptoms', sa.JSON(), nullable=True),
+            sa.Column('allergies', sa.JSON(), nullable=True),
+            sa.Column('chief_complaint', sa.JSON(), nullable=True),
+            sa.Column('last_updated', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_patient_profiles_id', 'patient_profiles', ['id'])
+
+    if 'escalations' not in existing:
+        op.create_table(
+            'escalations',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('conversation_id', sa.Integer(), sa.ForeignKey('conversations.id'), nullable=True),
+            sa.Column('trigger_message_id', sa.Integer(), sa.ForeignKey('messages.id'), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('triage_summary', sa.String(), nullable=True),
+            sa.Column('patient_profile_snapshot', sa.JSON(), nullable=True),
+        )
+        op.create_index('ix_escalations_id', 'escalations', ['id'])
+
+    for statement in LEGACY_COLUMNS:
+        op.execute(statement)
+
+    if 'patient_activity' not in existing:
+        op.create_table(
+            'patient_activity',
+            sa.Column('patient_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('clinic_id', sa.String(), nullable=True),
+            sa.Column('last_message_at', sa.DateTime(), nullable=True),
+            sa.Column('last_patient_message_at', sa.DateTime(), nullable=True),
+            sa.Column('last_clinician_reply_at', sa.DateTime(), nullable=True),
+            sa.Column('unread_count', sa.Integer(), nullable=False),
+            sa.Column('pending_escalation_count', sa.Integer(), nullable=False),
+            sa.Column('highest_open_risk', risklevel, nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index(
+            'ix_patient_activity_recent', 'patient_activity',
+            [sa.text('last_message_at DESC NULLS LAST'), sa.text('patient_id DESC')],
+        )
+        op.create_index(
+            'ix_patient_activity_clinic_recent', 'patient_activity',
+            ['clinic_id', sa.text('last_message_at DESC NULLS LAST'), sa.text('patient_id DESC')],
+        )
+    op.execute(BACKFILL_PATIENT_ACTIVITY)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('patient_activity')
+    op.drop_table('escalations')
+    op.drop_table('patient_profiles')
+    op.drop_table('messages')
+    op.drop_table('conversations')
+    op.drop_table('users')
+    risklevel.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,54 @@
+"""Hot-path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ('ix_messages_conversation_id_timestamp', 'messages', ['conversation_id', 'timestamp'], False),
+    ('ix_conversations_user_id', 'conversations', ['user_id'], False),
+    ('ix_escalations_status_conversation_id', 'escalations', ['status', 'conversation_id'], False),
+    ('ix_patient_profiles_patient_id', 'patient_profiles', ['patient_id'], True),
+    ('ix_users_role_clinic_id', 'users', ['role', 'clinic_id'], False),
+]
+
+# Racing memory updates could create several profiles per patient; keep the most recently updated one
+DEDUPE_PATIENT_PROFILES = """
+DELETE FROM patient_profiles p
+USING patient_profiles newer
+WHERE p.patient_id = newer.patient_id
+  AND (coalesce(newer.last_updated, 'epoch'), newer.id) > (coalesce(p.last_updated, 'epoch'), p.id)
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(DEDUPE_PATIENT_PROFILES)
+    # CONCURRENTLY avoids blocking writes on live tables; it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name, table, columns, unique=unique,
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,37 @@
+"""Shared risk classification cache
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'risk_cache',
+        sa.Column('key', sa.String(), primary_key=True),
+        sa.Column('result', sa.JSON(), nullable=False),
+        sa.Column('llm_seconds', sa.Float(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        prefixes=['UNLOGGED'],
+    )
+    op.create_index('ix_risk_cache_expires_at', 'risk_cache', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_risk_cache_expires_at', table_name='risk_cache')
+    op.drop_table('risk_cache')
@@ -0,0 +1,89 @@
+"""Normalize profile facts into patient_facts
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# patient_profiles JSON column -> patient_facts.category
+CATEGORY_COLUMNS = {
+    'medication': 'medications',
+    'symptom': 'symptoms',
+    'allergy': 'allergies',
+    'chief_complaint': 'chief_complaint',
+}
+
+# One row per distinct normalized value; if a list held duplicates, the most recently updated wins
+BACKFILL = """
+INSERT INTO patient_facts (patient_id, category, value, normalized_value, status, provenance_pointer,
+                           stopped_at, created_at, updated_at)
+SELECT DISTINCT ON (patient_id, normalized_value)
+       patient_id, '{category}', value, normalized_value, status, provenance_pointer, stopped_at, updated_at, updated_at
+FROM (
+    SELECT p.patient_id,
+           btrim(f->>'value') AS value,
+           lower(regexp_replace(btrim(f->>'value'), '\\s+', ' ', 'g')) AS normalized_value,
+           coalesce(f->>'status', 'unknown') AS status,
+           CASE WHEN f->>'provenance_pointer' ~ '^[0-9]+$' THEN (f->>'provenance_pointer')::integer END AS provenance_pointer,
+           CASE WHEN f->>'stopped_at' IS NOT NULL THEN (f->>'stopped_at')::timestamp END AS stopped_at,
+           coalesce((f->>'updated_at')::timestamp, p.last_updated) AS updated_at
+    FROM patient_profiles p, json_array_elements(p.{column}) f
+    WHERE p.patient_id IS NOT NULL AND json_typeof(p.{column}) = 'array'
+      AND coalesce(btrim(f->>'value'), '') <> ''
+) facts
+ORDER BY patient_id, normalized_value, updated_at DESC
+"""
+
+RESTORE = """
+UPDATE patient_profiles p SET {column} = coalesce((
+    SELECT json_agg(json_strip_nulls(json_build_object(
+        'value', f.value, 'status', f.status, 'provenance_pointer', f.provenance_pointer,
+        'updated_at', f.updated_at, 'stopped_at', f.stopped_at)) ORDER BY f.id)
+    FROM patient_facts f WHERE f.patient_id = p.patient_id AND f.category = '{category}'
+), '[]'::json)
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'patient_facts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('patient_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('value', sa.String(), nullable=False),
+        sa.Column('normalized_value', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('provenance_pointer', sa.Integer(), nullable=True),
+        sa.Column('stopped_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('patient_id', 'category', 'normalized_value', name='uq_patient_facts_patient_category_value'),
+    )
+    op.create_index('ix_patient_facts_lookup', 'patient_facts', ['category', 'normalized_value', 'status'])
+
+    for category, column in CATEGORY_COLUMNS.items():
+        op.execute(BACKFILL.format(category=category, column=column))
+    for column in CATEGORY_COLUMNS.values():
+        op.drop_column('patient_profiles', column)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for category, column in CATEGORY_COLUMNS.items():
+        op.add_column('patient_profiles', sa.Column(column, sa.JSON(), nullable=True))
+        op.execute(RESTORE.format(category=category, column=column))
+    op.drop_index('ix_patient_facts_lookup', table_name='patient_facts')
+    op.drop_table('patient_facts')
@@ -0,0 +1,77 @@
+"""Event-sourced profile history; escalations reference a profile version
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# History starts here: every existing profile gets a snapshot of its current version
+SEED_SNAPSHOTS = """
+INSERT INTO profile_snapshots (patient_id, version, facts, last_updated, created_at)
+SELECT p.patient_id, p.version,
+       coalesce((
+           SELECT json_agg(json_build_object(
+               'category', f.category, 'normalized_value', f.normalized_value, 'value', f.value,
+               'status', f.status, 'provenance_pointer', f.provenance_pointer,
+               'stopped_at', f.stopped_at, 'updated_at', f.updated_at) ORDER BY f.id)
+           FROM patient_facts f WHERE f.patient_id = p.patient_id
+       ), '[]'::json),
+       p.last_updated, now() AT TIME ZONE 'utc'
+FROM patient_profiles p
+WHERE p.patient_id IS NOT NULL
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'profile_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('patient_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('profile_version', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('normalized_value', sa.String(), nullable=True),
+        sa.Column('value', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('provenance_pointer', sa.Integer(), nullable=True),
+        sa.Column('stopped_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_profile_events_patient_version', 'profile_events', ['patient_id', 'profile_version'])
+
+    op.create_table(
+        'profile_snapshots',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('patient_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('facts', sa.JSON(), nullable=False),
+        sa.Column('last_updated', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('patient_id', 'version', name='uq_profile_snapshots_patient_version'),
+    )
+    op.execute(SEED_SNAPSHOTS)
+
+    op.add_column('escalations', sa.Column('profile_id', sa.Integer(), sa.ForeignKey('patient_profiles.id'), nullable=True))
+    op.add_column('escalations', sa.Column('profile_version', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('escalations', 'profile_version')
+    op.drop_column('escalations', 'profile_id')
+    op.drop_table('profile_snapshots')
+    op.drop_index('ix_profile_events_patient_version', table_name='profile_events')
+    op.drop_table('profile_events')
@@ -0,0 +1,29 @@
+"""Message updated_at, so history ETags change when risk fields are rewritten
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE messages SET updated_at = timestamp")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('messages', 'updated_at')
@@ -1,177 +1,255 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from app.db.database import get_db, SessionLocal
-from app.db.models import Message, Escalation, PatientProfile, Conversation, User
+from app.db.models import Message, Escalation, Conversation, User, Job
 from app.schemas import MessageCreate, MessageResponse, EscalationResponse, RiskLevel, PatientProfileResponse
-# from app.services.redaction import RedactionService # Deprecated in favor of core.privacy
-from app.core.privacy import redact_pii, structured_log
+from app.core.privacy import redact_pii_async, structured_log
+from app.core.config import SPECULATIVE_CHAT_REPLY, MEMORY_COALESCE_SECONDS, RETRIAGE_MAX_ATTEMPTS
+from app.core.metrics import metrics
+from app.core.tracing import span
+from app.core.events import broker, publish, publish_all, conversation_topic, clinic_topic
 from app.services.risk import RiskAnalysisService
-from app.services.memory import MemoryService
-from app.services.chat import ChatService
+from app.services.risk_rules import RiskRuleClassifier
+from app.services.jobs import enqueue, MEMORY_EXTRACT, RISK_RETRIAGE
+from app.services.llm_scheduler import LLMUnavailable
+from app.services.chat import ChatService, ChatResponse
+from app.services.context import ConversationContext
+from app.services.activity import ActivityService
+from app.services.facts import get_profile, delete_profile, profile_reference
 from app.api.deps import get_current_user
 from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter()
 
 # Instantiate Services
 risk_service = RiskAnalysisService()
-memory_service = MemoryService()
+risk_rules = RiskRuleClassifier()
 chat_service = ChatService()
+activity_service = ActivityService()
 
-async def run_background_memory_update(patient_id: int, content: str, message_id: int):
+ESCALATION_MESSAGE = "I'm really concerned about what you're sharing. I've flagged this for a nurse to review immediately - please hang tight, they will be with you right away."
+# Sent instead of a reply while AI triage is unavailable; the message is re-triaged by the worker
+DEGRADED_MESSAGE = "I've received your message, but I can't respond properly right now. It has been saved and will be checked as soon as possible. If this is an emergency, please call 911 or your local emergency number."
+HELD_FOR_RETRIAGE = "Held for re-triage: AI triage unavailable"
+
+# Messages given to risk analysis and the reply, the new one included
+HISTORY_LIMIT = 5
+
+# Map confidence string to score for DB storage (backward compatibility)
+CONFIDENCE_SCORES = {"High": 90, "Medium": 50, "Low": 10}
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Streamed replies still being generated/saved (strong refs so they finish after a disconnect)
+_reply_tasks: set[asyncio.Task] = set()
+
+def _reply_task_done(task: asyncio.Task):
+    _reply_tasks.discard(task)
+    metrics.set("chat_reply_tasks", len(_reply_tasks))
+
+async def run_background_triage_summary(escalation_id: int, clinic_id: str | None, rule_reason: str, context: ConversationContext):
     """
-    Wrapper to run memory extraction in background with its own DB session.
+    LLM triage for an escalation opened by the rule pre-classifier, after the response is sent.
+    The escalation stands whatever the LLM says; a disagreement is noted for the clinician.
     """
+    try:
+        # No rules fallback: echoing the rule's own verdict back would read as the AI agreeing
+        llm_result = await risk_service.analyze_risk(context, fallback_to_rules=False)
+    except LLMUnavailable:
+        return  # The rule escalation and its summary stand
+    metrics.incr("risk_fast_path_llm_total", llm_level=llm_result.risk_level.value)
+    lines = [f"- {rule_reason}"]
+    if llm_result.risk_level != RiskLevel.HIGH:
+        lines.append(f"- AI triage rated this {llm_result.risk_level.value}: {llm_result.reason}")
+    lines.append(llm_result.summary or f"- {llm_result.reason}")
+
     async with SessionLocal() as session:
-        await memory_service.extract_and_update_memory(session, patient_id, content, message_id)
+        escalation = await session.get(Escalation, escalation_id)
+        if escalation is None:
+            return
+        escalation.triage_summary = "\n".join(lines)
+        await publish(session, clinic_topic(clinic_id), "escalation.updated", escalation_id=escalation_id)
+        await session.commit()
 
-@router.post("/", response_model=MessageResponse | EscalationResponse)
-async def chat_endpoint(
-    msg_in: MessageCreate, 
-    background_tasks: BackgroundTasks,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
+async def _get_profile(db: AsyncSession, patient_id: int) -> PatientProfileResponse:
+    return await get_profile(db, patient_id)
+
+async def _read_profile(patient_id: int) -> PatientProfileResponse:
+    # Own short-lived session so it can run alongside the request session's queries
+    with span("profile"):
+        async with SessionLocal() as session:
+            return await get_profile(session, patient_id)
+
+async def _recent_history(conversation_id: int, limit: int) -> list[Message]:
+    """The conversation's last `limit` messages, newest first (own session, like _read_profile)."""
+    with span("history"):
+        async with SessionLocal() as session:
+            result = await session.execute(
+                select(Message)
+                .where(Message.conversation_id == conversation_id)
+                .order_by(Message.timestamp.desc())
+                .limit(limit)
+            )
+            return result.scalars().all()
+
+async def _redact(content: str) -> str:
+    with span("redact"):
+        return await redact_pii_async(content)
+
+async def _receive_message(db: AsyncSession, msg_in: MessageCreate, current_user: User):
     """
-    Main Chat Interface.
-    Flow: Redact -> Save -> Risk -> (Escalate OR Reply + Memory).
+    Shared front half of the chat pipeline: Validate -> Redact -> Save + queue Memory.
+    The conversation lookup, recent history, profile and redaction run concurrently; the
+    message is then saved in one transaction (ids come back from INSERT ... RETURNING).
+    Returns (user_msg, context): the ConversationContext every service of this request shares.
     """
-    
-    # 0. Validate Conversation
-    result = await db.execute(select(Conversation).where(Conversation.id == msg_in.conversation_id))
-    conversation = result.scalars().first()
-    
-    if not conversation:
+    # Only the conversation's owner gets past validation, so the patient is the current user
+    patient_id = current_user.id
+    new_conversation = msg_in.conversation_id == 0
+
+    # 0. Validate Conversation, with the independent reads started alongside
+    with span("validate"):
+        reads = [_redact(msg_in.content), _read_profile(patient_id)]
+        if not new_conversation:
+            reads += [
+                db.execute(select(Conversation).where(Conversation.id == msg_in.conversation_id)),
+                _recent_history(msg_in.conversation_id, HISTORY_LIMIT - 1),
+            ]
+        content_redacted, profile, *conversation_reads = await asyncio.gather(*reads)
+
+    if new_conversation:
         # Auto-create if ID is 0, assigning to current_user
-        if msg_in.conversation_id == 0:
-            conversation = Conversation(user_id=current_user.id)
-            db.add(conversation)
-            await db.commit()
-            await db.refresh(conversation)
-            msg_in.conversation_id = conversation.id
-        else:
+        conversation = Conversation(user_id=current_user.id)
+        db.add(conversation)
+        await db.flush()
+        msg_in.conversation_id = conversation.id
+        prior_history = []
+    else:
+        conversation_result, prior_history = conversation_reads
+        conversation = conversation_result.scalars().first()
+        if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
     
     # Verify Ownership
     if conversation.user_id != current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
 
-    # Step A: Redaction & Logging
+    # Step A: Logging (the content was redacted above)
     structured_log("Message Received", {"user_id": current_user.id, "conversation_id": conversation.id})
-    content_redacted = redact_pii(msg_in.content)
     
     # Save User Message
-    user_msg = Message(
-        conversation_id=msg_in.conversation_id,
-        sender_type="patient",
-        content=msg_in.content, # Encrypted at rest (abstracted)
-        content_redacted=content_redacted,
-        timestamp=datetime.utcnow()
-    )
-    db.add(user_msg)
-    await db.commit()
-    await db.refresh(user_msg)
-    
-    # Fetch History for Risk Analysis (Last 5)
-    # Simple query
-    hist_result = await db.execute(
-        select(Message)
-        .where(Message.conversation_id == msg_in.conversation_id)
-        .order_by(Message.timestamp.desc())
-        .limit(5)
-    )
-    history = hist_result.scalars().all() # Reversed order usually
-    
-    # Step B: Memory Extraction (Background)
-    # Schedule it BEFORE risk check to ensure high-risk messages are also processed
-    patient_id = conversation.user_id if conversation.user_id else 1
-    # Use wrapper to ensure fresh session
-    background_tasks.add_task(run_background_memory_update, patient_id, content_redacted, user_msg.id)
-
-    # Step C: Risk Analysis
-    risk_result = await risk_service.analyze_risk(history, content_redacted)
-    
-    # Update User Message with Risk Metadata
-    user_msg.risk_level = risk_result.risk_level
-    user_msg.risk_reason = risk_result.reason
-    await db.commit()
-    
-    # If HIGH or MEDIUM RISK -> Stop AI and Trigger Escalation
-    if risk_result.risk_level in [RiskLevel.HIGH, RiskLevel.MEDIUM]:
-        # Fetch Profile for Snapshot
-        patient_id = conversation.user_id if conversation.user_id else 1
-        prof_result = await db.execute(select(PatientProfile).where(PatientProfile.patient_id == patient_id))
-        profile = prof_result.scalars().first()
-        
-        # Serialize Profile
-        profile_snapshot = {}
-        if profile:
-            from fastapi.encoders import jsonable_encoder
-            profile_snapshot = jsonable_encoder(PatientProfileResponse.model_validate(profile))
-
-        # Create Escalation
-        escalation = Escalation(
+    with span("save_message"):
+        user_msg = Message(
             conversation_id=msg_in.conversation_id,
-            trigger_message_id=user_msg.id,
-            triage_summary=risk_result.summary or f"{risk_result.risk_level} risk detected via automated analysis.",
-            patient_profile_snapshot=profile_snapshot
-        )
-        db.add(escalation)
-        await db.commit()
-        await db.refresh(escalation)
-        
-        # STOP: Early Return with Hardcoded System Message (Safety)
-        system_msg_content = "I'm really concerned about what you're sharing. I've flagged this for a nurse to review immediately - please hang tight, they will be with you right away."
-        
-        system_msg = Message(
-            conversation_id=msg_in.conversation_id,
-            sender_type="ai",
-            content=system_msg_content,
-            content_redacted=system_msg_content,
-            risk_level=risk_result.risk_level,
-            confidence_score=100, # System alerts are deterministic, so 100% confidence
+            sender_type="patient",
+            content=msg_in.content, # Encrypted at rest (abstracted)
+            content_redacted=content_redacted,
             timestamp=datetime.utcnow()
         )
-        # Transient attributes for API response
-        system_msg.confidence = "High"
-        system_msg.reason = "System Rule: Automatic Escalation"
-        
-        db.add(system_msg)
+        db.add(user_msg)
+        await db.flush()
+
+        # Step B: Memory Extraction (worker job, committed with the message)
+        # Queued BEFORE the risk check so high-risk messages are also processed. The delay lets
+        # the patient's next few messages join this one in a single extraction.
+        await enqueue(db, MEMORY_EXTRACT, {"patient_id": patient_id, "message_id": user_msg.id},
+                      key=f"patient:{patient_id}", delay=MEMORY_COALESCE_SECONDS)
+
+        await activity_service.record_message(db, current_user.id, current_user.clinic_id, "patient", user_msg.timestamp)
+        await publish_all(db, [
+            (conversation_topic(msg_in.conversation_id), "message.created", {}),
+            (clinic_topic(current_user.clinic_id), "patient.activity",
+             {"patient_id": current_user.id, "conversation_id": msg_in.conversation_id}),
+        ])
         await db.commit()
-        
-        return EscalationResponse(
-            message=system_msg_content,
-            escalation_id=escalation.id,
-            conversation_id=msg_in.conversation_id,
-            reason=risk_result.reason
-        )
-        
-    # Step D: Chat Reply
-    # Get Profile
-    prof_result = await db.execute(select(PatientProfile).where(PatientProfile.patient_id == patient_id))
-    profile = prof_result.scalars().first()
+
+    # Context for risk and the reply: the last HISTORY_LIMIT messages, this one included
+    return user_msg, ConversationContext.from_rows([*prior_history, user_msg], profile)
+
+async def _escalate(db: AsyncSession, patient: User, user_msg: Message, risk_result) -> EscalationResponse:
+    """
+    Create the triage ticket and the hardcoded safety message. The AI reply is never generated or shown.
+    One transaction: the ticket, the notice, the activity counters and any pending changes
+    to `user_msg` (its risk metadata) are committed together.
+    """
+    # Reference the profile version the clinician should see (rebuilt from profile history on demand)
+    profile_id, profile_version = await profile_reference(db, patient.id)
+
+    # Create Escalation
+    escalation = Escalation(
+        conversation_id=user_msg.conversation_id,
+        trigger_message_id=user_msg.id,
+        triage_summary=risk_result.summary or f"{risk_result.risk_level} risk detected via automated analysis.",
+        profile_id=profile_id,
+        profile_version=profile_version,
+    )
+    db.add(escalation)
     
-    # Serialize History for ChatService (needs simple dicts)
-    # history variable (Line 84) contains the last 5 messages
-    from fastapi.encoders import jsonable_encoder
-    history_serialized = [jsonable_encoder(m) for m in history]
-    # Reverse to chronological order for the LLM
-    history_serialized.reverse()
-
-    chat_response = await chat_service.generate_reply(content_redacted, profile, history=history_serialized)
+    # STOP: Early Return with Hardcoded System Message (Safety)
+    system_msg = Message(
+        conversation_id=user_msg.conversation_id,
+        sender_type="ai",
+        content=ESCALATION_MESSAGE,
+        content_redacted=ESCALATION_MESSAGE,
+        risk_level=risk_result.risk_level,
+        confidence_score=100, # System alerts are deterministic, so 100% confidence
+        timestamp=datetime.utcnow()
+    )
+    db.add(system_msg)
+    # Escalation id for the notification
+    await db.flush()
+
+    await activity_service.record_escalation_opened(db, patient.id, patient.clinic_id, risk_result.risk_level)
+    await activity_service.record_message(db, patient.id, patient.clinic_id, "ai", system_msg.timestamp)
+    await publish_all(db, [
+        (conversation_topic(user_msg.conversation_id), "message.created", {}),
+        (clinic_topic(patient.clinic_id), "escalation.created",
+         {"escalation_id": escalation.id, "patient_id": patient.id,
+          "conversation_id": user_msg.conversation_id, "risk_level": risk_result.risk_level.value}),
+    ])
+    await db.commit()
     
-    # Map confidence string to score for DB storage (backward compatibility)
-    conf_map = {"High": 90, "Medium": 50, "Low": 10}
-    db_score = conf_map.get(chat_response.confidence, 0)
+    return EscalationResponse(
+        message=ESCALATION_MESSAGE,
+        escalation_id=escalation.id,
+        conversation_id=user_msg.conversation_id,
+        reason=risk_result.reason
+    )
 
+async def _rule_escalation(db: AsyncSession, patient: User, user_msg: Message, context: ConversationContext,
+                           background_tasks: BackgroundTasks) -> EscalationResponse | None:
+    """
+    Rule pre-classifier: unambiguous emergencies escalate without waiting for the LLM.
+    Returns None when the rules are not sure, in which case the LLM decides as usual.
+    """
+    with span("rules"):
+        rule_result = risk_rules.classify(context.message)
+    if rule_result is None:
+        return None
+    metrics.incr("risk_fast_path_total")
+    user_msg.risk_level = rule_result.risk_level
+    user_msg.risk_reason = rule_result.reason
+    with span("escalate"):
+        response = await _escalate(db, patient, user_msg, rule_result)
+    background_tasks.add_task(run_background_triage_summary, response.escalation_id, patient.clinic_id,
+                              rule_result.reason, context)
+    return response
+
+async def _save_reply(db: AsyncSession, patient: User, conversation_id: int, chat_response: ChatResponse) -> MessageResponse:
+    """Save the AI reply in one transaction, with any pending changes (e.g. the patient message's risk metadata)."""
     bot_msg = Message(
-        conversation_id=msg_in.conversation_id,
+        conversation_id=conversation_id,
         sender_type="ai",
         content=chat_response.content,
-        content_redacted=redact_pii(chat_response.content),
+        content_redacted=await redact_pii_async(chat_response.content),
         risk_level=RiskLevel.LOW,
-        confidence_score=db_score,
+        confidence_score=CONFIDENCE_SCORES.get(chat_response.confidence, 0),
         timestamp=datetime.utcnow()
     )
     # Attach transient attributes for API Response (Pydantic schema)
@@ -180,19 +258,281 @@ async def chat_endpoint(
     bot_msg.citations = chat_response.citations
     
     db.add(bot_msg)
+    await activity_service.record_message(db, patient.id, patient.clinic_id, "ai", bot_msg.timestamp)
+    await publish_all(db, [
+        (conversation_topic(conversation_id), "message.created", {}),
+        (clinic_topic(patient.clinic_id), "patient.activity", {"patient_id": patient.id, "conversation_id": conversation_id}),
+    ])
+    # The INSERT's RETURNING fills in the id; every other field was set here
     await db.commit()
-    await db.refresh(bot_msg)
     
     return MessageResponse.model_validate(bot_msg)
 
+async def _hold_for_retriage(db: AsyncSession, patient: User, user_msg: Message) -> MessageResponse:
+    """
+    Degraded mode (LLM unavailable and no rule matched): don't escalate and don't reply.
+    The message is queued for re-triage once the LLM is back, and the patient is told so.
+    """
+    metrics.incr("risk_retriage_total", outcome="queued")
+    user_msg.risk_reason = HELD_FOR_RETRIAGE
+    # One key per conversation: a burst of held messages is re-triaged together
+    await enqueue(db, RISK_RETRIAGE, {"message_id": user_msg.id, "clinic_id": patient.clinic_id},
+                  key=f"conversation:{user_msg.conversation_id}", max_attempts=RETRIAGE_MAX_ATTEMPTS)
+    notice = ChatResponse(content=DEGRADED_MESSAGE, confidence="High", reason="System Rule: AI triage unavailable",
+                          citations=["System Notice"])
+    return await _save_reply(db, patient, user_msg.conversation_id, notice)
+
+RISK_ORDER = {RiskLevel.LOW: 0, RiskLevel.MEDIUM: 1, RiskLevel.HIGH: 2}
+
+async def retriage_messages(jobs: List[Job]):
+    """
+    Worker handler for risk.retriage: triage the messages held while the LLM was unavailable,
+    one conversation per call. A conversation gets at most one escalation (added to its pending
+    one if there is one); if everything is LOW the patient gets the reply they were waiting for,
+    unless the conversation has moved on since.
+    LLMUnavailable propagates, so the job is retried (or deferred while the circuit is open).
+    """
+    message_ids = [job.payload["message_id"] for job in jobs]
+    async with SessionLocal() as session:
+        messages = (await session.execute(
+            select(Message).where(Message.id.in_(message_ids)).order_by(Message.id)
+        )).scalars().all()
+        if not messages:
+            return
+        conversation_id = messages[0].conversation_id
+        conversation = await session.get(Conversation, conversation_id)
+        patient = await session.get(User, conversation.user_id)
+
+        worst = None
+        for msg in messages:
+            history = (await session.execute(
+                select(Message)
+                .where(Message.conversation_id == conversation_id, Message.id <= msg.id)
+                .order_by(Message.timestamp.desc())
+                .limit(HISTORY_LIMIT)
+            )).scalars().all()
+            result = await risk_service.analyze_risk(ConversationContext.from_rows(history))
+            msg.risk_level = result.risk_level
+            msg.risk_reason = result.reason
+            if result.risk_level != RiskLevel.LOW and (worst is None or RISK_ORDER[result.risk_level] > RISK_ORDER[worst[1].risk_level]):
+                worst = (msg, result)
+
+        if worst:
+            msg, result = worst
+            metrics.incr("risk_retriage_total", outcome="escalated")
+            pending = (await session.execute(
+                select(Escalation).where(Escalation.conversation_id == conversation_id, Escalation.status == "pending")
+                .order_by(Escalation.id.desc()).limit(1)
+            )).scalars().first()
+            if pending is None:
+                await _escalate(session, patient, msg, result)
+                return
+            # Already in the clinician queue: add to it instead of opening another ticket
+            pending.triage_summary = "\n".join(filter(None, [
+                pending.triage_summary, f"- Re-triaged after outage ({result.risk_level.value}): {result.reason}",
+            ]))
+            await activity_service.record_escalation_raised(session, patient.id, result.risk_level)
+            await publish(session, clinic_topic(patient.clinic_id), "escalation.updated", escalation_id=pending.id)
+            await session.commit()
+            return
+
+        metrics.incr("risk_retriage_total", outcome="low")
+        latest = messages[-1]
+        newer = (await session.execute(
+            select(func.count(Message.id)).where(
+                Message.conversation_id == conversation_id, Message.id > latest.id,
+                Message.content != DEGRADED_MESSAGE,
+            )
+        )).scalar()
+        await session.commit()
+        if newer:
+            return
+        history = (await session.execute(
+            select(Message)
+            .where(Message.conversation_id == conversation_id, Message.id < latest.id)
+            .order_by(Message.timestamp.desc())
+            .limit(HISTORY_LIMIT - 1)
+        )).scalars().all()
+        profile = await _get_profile(session, patient.id)
+        context = ConversationContext.from_rows([*history, latest], profile)
+        chat_response = await chat_service.generate_reply(context)
+        await _save_reply(session, patient, conversation_id, chat_response)
+
+@router.post("/", response_model=MessageResponse | EscalationResponse)
+async def chat_endpoint(
+    msg_in: MessageCreate, 
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Main Chat Interface.
+    Flow: Redact -> Save -> Rules -> Risk -> (Escalate OR Reply + Memory).
+    If the LLM is unavailable and no rule matched, the message is held for re-triage instead.
+    Two transactions: the patient message, then its risk metadata with the escalation or reply.
+    """
+    user_msg, context = await _receive_message(db, msg_in, current_user)
+
+    # Rule pre-classifier: unambiguous emergencies escalate in milliseconds, before the LLM
+    rule_response = await _rule_escalation(db, current_user, user_msg, context, background_tasks)
+    if rule_response:
+        return rule_response
+
+    # Speculative Reply: start generating the reply while risk is still being analyzed.
+    # It is only used if the message turns out LOW risk; otherwise it is cancelled and never saved.
+    reply_task = None
+    if SPECULATIVE_CHAT_REPLY:
+        reply_task = asyncio.create_task(chat_service.generate_reply(context))
+
+    # Step C: Risk Analysis
+    try:
+        with span("risk"):
+            risk_result = await risk_service.analyze_risk(context)
+    except LLMUnavailable:
+        if reply_task:
+            reply_task.cancel()
+        return await _hold_for_retriage(db, current_user, user_msg)
+    except BaseException:
+        if reply_task:
+            reply_task.cancel()
+        raise
+    
+    # Update User Message with Risk Metadata (committed with the escalation or the reply)
+    user_msg.risk_level = risk_result.risk_level
+    user_msg.risk_reason = risk_result.reason
+    
+    # If HIGH or MEDIUM RISK -> Stop AI and Trigger Escalation
+    if risk_result.risk_level in [RiskLevel.HIGH, RiskLevel.MEDIUM]:
+        if reply_task:
+            # Safety: the speculative reply must never reach the patient
+            reply_task.cancel()
+            metrics.incr("speculative_reply_total", outcome="wasted")
+
+        with span("escalate"):
+            return await _escalate(db, current_user, user_msg, risk_result)
+        
+    # Step D: Chat Reply
+    if reply_task:
+        metrics.incr("speculative_reply_total", outcome="used")
+        with span("reply"):
+            chat_response = await reply_task
+    else:
+        with span("reply"):
+            chat_response = await chat_service.generate_reply(context)
+    
+    with span("save_reply"):
+        return await _save_reply(db, current_user, msg_in.conversation_id, chat_response)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+def _escalation_stream(escalation_response: EscalationResponse) -> StreamingResponse:
+    async def escalation_events():
+        yield _sse("escalation", escalation_response)
+
+    return StreamingResponse(escalation_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _final_stream(message_response: MessageResponse) -> StreamingResponse:
+    async def final_events():
+        yield _sse("token", {"content": message_response.content})
+        yield _sse("final", message_response)
+
+    return StreamingResponse(final_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/stream")
+async def chat_stream_endpoint(
+    msg_in: MessageCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming variant of the Chat Interface (Server-Sent Events).
+    The risk gate completes before anything is streamed. Events:
+    - `escalation`: EscalationResponse (HIGH/MEDIUM risk, no AI reply)
+    - `token`: {"content": "<delta>"} as the reply is generated
+    - `final`: MessageResponse for the saved reply (confidence, reason, citations);
+      while AI triage is unavailable, the notice that the message is held for re-triage
+    """
+    user_msg, context = await _receive_message(db, msg_in, current_user)
+
+    # Rule pre-classifier
+    rule_response = await _rule_escalation(db, current_user, user_msg, context, background_tasks)
+    if rule_response:
+        return _escalation_stream(rule_response)
+
+    # Step C: Risk Analysis (must finish before the first token goes out)
+    try:
+        with span("risk"):
+            risk_result = await risk_service.analyze_risk(context)
+    except LLMUnavailable:
+        held_response = await _hold_for_retriage(db, current_user, user_msg)
+        return _final_stream(held_response)
+    user_msg.risk_level = risk_result.risk_level
+    user_msg.risk_reason = risk_result.reason
+
+    if risk_result.risk_level in [RiskLevel.HIGH, RiskLevel.MEDIUM]:
+        with span("escalate"):
+            escalation_response = await _escalate(db, current_user, user_msg, risk_result)
+        return _escalation_stream(escalation_response)
+
+    # The reply is saved on its own session after the stream; persist the risk metadata now
+    await db.commit()
+
+    conversation_id = msg_in.conversation_id
+    # The stream outlives the request-scoped session; release its connection now
+    await db.close()
+
+    async def generate_and_save(events: asyncio.Queue):
+        try:
+            chat_response = None
+            async for delta, final in chat_service.stream_reply(context):
+                if final is not None:
+                    chat_response = final
+                elif delta:
+                    events.put_nowait(("token", {"content": delta}))
+            async with SessionLocal() as session:
+                bot_response = await _save_reply(session, current_user, conversation_id, chat_response)
+            events.put_nowait(("final", bot_response))
+        finally:
+            events.put_nowait(None)
+
+    async def reply_events():
+        events = asyncio.Queue()
+        # Generation and saving run in their own task: if the patient disconnects mid-stream
+        # only this generator is cancelled, and the full reply is still saved
+        task = asyncio.create_task(generate_and_save(events))
+        _reply_tasks.add(task)
+        task.add_done_callback(_reply_task_done)
+        metrics.set("chat_reply_tasks", len(_reply_tasks))
+        while (item := await events.get()) is not None:
+            yield _sse(*item)
+        await task
+
+    return StreamingResponse(reply_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: any listed tag equal to ours ignoring W/, or "*"."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
 @router.get("/{conversation_id}/history", response_model=list[MessageResponse])
 async def get_history(
     conversation_id: int,
+    request: Request,
+    response: Response,
+    since: Optional[int] = Query(None, description="Only return messages with id greater than this cursor"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Fetch message history for polling.
+    `since` is the id of the newest message the client already has (message ids are
+    monotonic, unlike timestamps). The ETag tracks the conversation's appended messages
+    and their latest update (a retriage rewriting risk_level/risk_reason changes it), so an
+    unchanged conversation answers 304 without loading or serializing any rows.
     """
     # Security: Verify Conversation Ownership
     query_conv = select(Conversation).where(Conversation.id == conversation_id)
@@ -205,11 +545,92 @@ async def get_history(
     if conversation.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
 
+    # Conditional GET: cheap aggregate instead of loading the conversation
+    state = await db.execute(
+        select(func.max(Message.id), func.count(Message.id), func.max(Message.updated_at))
+        .where(Message.conversation_id == conversation_id)
+    )
+    last_id, count, updated = state.one()
+    version = f"{updated:%Y%m%d%H%M%S%f}" if updated else "0"
+    etag = f'W/"{conversation_id}-{last_id or 0}-{count}-{version}"'
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
     # Fetch Messages
-    query = select(Message).where(Message.conversation_id == conversation_id).order_by(Message.timestamp.asc())
-    result = await db.execute(query)
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    if since is not None:
+        if last_id is None or since >= last_id:
+            return []
+        query = query.where(Message.id > since)
+    result = await db.execute(query.order_by(Message.id.asc()))
     return result.scalars().all()
 
+# Idle connections get a comment line this often so proxies keep them open
+SSE_KEEPALIVE_SECONDS = 15
+
+@router.get("/{conversation_id}/events")
+async def conversation_events(
+    conversation_id: int,
+    request: Request,
+    since: Optional[int] = Query(None, description="Id of the newest message the client already has"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Subscribe to new messages in a conversation (Server-Sent Events).
+    Every committed message (patient, AI reply, escalation notice, clinician reply) is pushed
+    as a `message` event carrying a MessageResponse; the SSE `id` is the message id, so
+    reconnecting with `since` (or Last-Event-ID) resumes without gaps.
+    """
+    # Security: Verify Conversation Ownership
+    result_conv = await db.execute(select(Conversation).where(Conversation.id == conversation_id))
+    conversation = result_conv.scalars().first()
+    # Request-scoped dependencies only exit after the stream ends; release the
+    # connection now instead of holding it idle in transaction per open tab
+    await db.close()
+
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    if conversation.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to access this conversation")
+
+    cursor = since
+    if cursor is None and request.headers.get("last-event-id", "").isdigit():
+        cursor = int(request.headers["last-event-id"])
+
+    async def fetch_new(after: Optional[int]):
+        # Short-lived sessions: nothing is checked out while the stream waits for events
+        async with SessionLocal() as session:
+            query = select(Message).where(Message.conversation_id == conversation_id)
+            if after is not None:
+                query = query.where(Message.id > after)
+            result = await session.execute(query.order_by(Message.id.asc()))
+            return result.scalars().all()
+
+    async def message_events():
+        nonlocal cursor
+        async with broker.subscribe(conversation_topic(conversation_id)) as queue:
+            # Backlog first (subscribed already, so nothing committed in between is lost)
+            catch_up = True
+            while not await request.is_disconnected():
+                if catch_up:
+                    for m in await fetch_new(cursor):
+                        cursor = m.id
+                        yield f"id: {m.id}\n" + _sse("message", MessageResponse.model_validate(m))
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                    # Coalesce bursts into one query
+                    while not queue.empty():
+                        queue.get_nowait()
+                    catch_up = True
+                except asyncio.TimeoutError:
+                    catch_up = await broker.ensure_listening()
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(message_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.get("/patient/profile", response_model=PatientProfileResponse)
 async def get_patient_profile(
     db: AsyncSession = Depends(get_db),
@@ -218,17 +639,7 @@ async def get_patient_profile(
     """
     Get the live patient profile (Living Memory).
     """
-    result = await db.execute(select(PatientProfile).where(PatientProfile.patient_id == current_user.id))
-    profile = result.scalars().first()
-    
-    if not profile:
-        # Return empty if not exists
-        return PatientProfileResponse(
-            medications=[], symptoms=[], allergies=[], chief_complaint=[], 
-            last_updated=datetime.utcnow()
-        )
-    
-    return profile
+    return await get_profile(db, current_user.id)
 
 @router.delete("/patient/profile", status_code=204)
 async def delete_patient_profile(
@@ -238,11 +649,7 @@ async def delete_patient_profile(
     """
     Clear the patient profile. Useful for testing or reset.
     """
-    result = await db.execute(select(PatientProfile).where(PatientProfile.patient_id == current_user.id))
-    profile = result.scalars().first()
-    
-    if profile:
-        await db.delete(profile)
-        await db.commit()
+    await delete_profile(db, current_user.id)
+    await db.commit()
     
     return
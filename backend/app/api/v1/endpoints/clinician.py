@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import base64
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, case
-from app.db.database import get_db
-from app.db.models import User, Message, Conversation, Escalation, PatientProfile
-from app.api.deps import get_current_user
-from app.schemas import PatientProfileResponse 
-from typing import List
+from sqlalchemy import select, func, desc, case, or_, tuple_
+from app.db.database import get_db, SessionLocal
+from app.db.models import User, Message, Conversation, Escalation, PatientProfile, PatientActivity, RiskLevel, Job
+from app.api.deps import get_current_user, get_current_clinician
+from app.core.events import broker, clinic_topic, CLINIC_ALL
+from app.schemas import PatientProfileResponse, PatientProfileVersionResponse
+from app.services.facts import CATEGORY_FIELDS, find_facts, get_profile, profile_at_version, version_at
+from app.services.circuit_breaker import llm_breaker
+from app.services.jobs import RISK_RETRIAGE
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -17,59 +25,88 @@ class PatientListItem(BaseModel):
     last_active: datetime | None
     unread_count: int = 0
     risk_status: str = "normal" # normal, escalated
+    highest_risk: str | None = None # Highest risk among pending escalations
+
+def _encode_patient_cursor(last_active: datetime | None, patient_id: int) -> str:
+    raw = f"{last_active.isoformat() if last_active else ''}|{patient_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_patient_cursor(cursor: str) -> tuple[datetime | None, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        last_active, patient_id = raw.rsplit("|", 1)
+        return (datetime.fromisoformat(last_active) if last_active else None), int(patient_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/patients", response_model=List[PatientListItem])
 async def get_patients(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    escalated_only: bool = False,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_clinician)
 ):
-    # Retrieve all patients
-    # Join with latest message timestamp
-    # Check for active escalations
-    
-    # 1. Get Patients
-    q_patients = select(User).where(User.role == "patient")
-    res_patients = await db.execute(q_patients)
-    patients = res_patients.scalars().all()
-    
-    patient_list = []
-    
-    for p in patients:
-        # Get last message time
-        # This is a bit inefficient (N+1), optimizable with subqueries/joins but fine for prototype
-        subq = (
-            select(Message.timestamp)
-            .join(Conversation, Conversation.id == Message.conversation_id)
-            .where(Conversation.user_id == p.id)
-            .order_by(Message.timestamp.desc())
-            .limit(1)
-        )
-        res_last = await db.execute(subq)
-        last_active = res_last.scalars().first() or datetime.min
-
-        # Check for unresolved escalations
-        q_esc = (
-            select(Escalation)
-            .join(Conversation, Conversation.id == Escalation.conversation_id)
-            .where(Conversation.user_id == p.id)
-            .where(Escalation.status == 'pending')
+    """
+    Patient list for the clinician dashboard, most recently active first.
+    Reads the write-maintained patient_activity summary, so the cost is O(page size)
+    regardless of message history; patients without a summary row yet (no messages)
+    are outer-joined in with zero counts, last. Keyset-paginated: pass the X-Next-Cursor
+    response header back as `cursor` for the next page.
+    unread_count = patient messages since the care team's (clinician) last reply.
+    Enforces Clinic Scope like list_escalations.
+    """
+    last_active = PatientActivity.last_message_at
+    pending_count = func.coalesce(PatientActivity.pending_escalation_count, 0)
+    query = (
+        select(
+            User.id,
+            User.email,
+            last_active,
+            func.coalesce(PatientActivity.unread_count, 0),
+            pending_count,
+            PatientActivity.highest_open_risk,
         )
-        res_esc = await db.execute(q_esc)
-        active_escalation = res_esc.scalars().first()
-        
-        status = "escalated" if active_escalation else "normal"
-
-        patient_list.append(PatientListItem(
-            id=p.id,
-            email=p.email,
-            last_active=last_active if last_active != datetime.min else None,
-            risk_status=status
-        ))
-    
-    # Sort by last_active desc
-    patient_list.sort(key=lambda x: x.last_active or datetime.min, reverse=True)
-    
-    return patient_list
+        .outerjoin(PatientActivity, PatientActivity.patient_id == User.id)
+        .where(User.role == "patient")
+    )
+
+    # Enforce Clinic Scope
+    if current_user.clinic_id:
+        query = query.where(User.clinic_id == current_user.clinic_id)
+
+    if escalated_only:
+        query = query.where(pending_count > 0)
+
+    # Keyset: ORDER BY last_active DESC NULLS LAST, id DESC
+    if cursor:
+        cursor_active, cursor_id = _decode_patient_cursor(cursor)
+        if cursor_active is not None:
+            query = query.where(or_(
+                tuple_(last_active, User.id) < tuple_(cursor_active, cursor_id),
+                last_active.is_(None),
+            ))
+        else:
+            query = query.where(last_active.is_(None), User.id < cursor_id)
+
+    query = query.order_by(last_active.desc().nulls_last(), User.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_patient_cursor(rows[-1][2], rows[-1][0])
+
+    return [
+        PatientListItem(
+            id=patient_id,
+            email=email,
+            last_active=active,
+            unread_count=unread_count,
+            risk_status="escalated" if pending_count else "normal",
+            highest_risk=highest.value if highest else None
+        ) for patient_id, email, active, unread_count, pending_count, highest in rows
+    ]
 
 @router.get("/patient/{patient_id}/profile", response_model=PatientProfileResponse)
 async def get_patient_profile_by_id(
@@ -83,17 +120,82 @@ async def get_patient_profile_by_id(
     if current_user.role != "clinician":
         raise HTTPException(status_code=403, detail="Only clinicians can access this endpoint")
 
-    result = await db.execute(select(PatientProfile).where(PatientProfile.patient_id == patient_id))
-    profile = result.scalars().first()
-    
-    if not profile:
-        # Return empty if not exists
-        return PatientProfileResponse(
-            medications=[], symptoms=[], allergies=[], chief_complaint=[], 
-            last_updated=datetime.utcnow()
-        )
-    
-    return profile
+    return await get_profile(db, patient_id)
+
+@router.get("/patient/{patient_id}/profile/history", response_model=PatientProfileVersionResponse)
+async def get_patient_profile_history(
+    patient_id: int,
+    version: Optional[int] = Query(None, ge=1, description="Profile version to rebuild"),
+    message_id: Optional[int] = Query(None, description="Rebuild the profile as it was when this message was sent"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_clinician)
+):
+    """
+    Point-in-time profile, rebuilt from the nearest compacted snapshot plus the
+    profile events after it. Pass a version, or a message id to see what was known
+    when the patient sent it. Without either, returns the current version.
+    """
+    if version is None and message_id is not None:
+        sent_at = (await db.execute(
+            select(Message.timestamp)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Message.id == message_id, Conversation.user_id == patient_id)
+        )).scalar()
+        if sent_at is None:
+            raise HTTPException(status_code=404, detail="Message not found for this patient")
+        version = await version_at(db, patient_id, sent_at)
+    elif version is None:
+        version = (await db.execute(
+            select(PatientProfile.version).where(PatientProfile.patient_id == patient_id)
+        )).scalar()
+    return await profile_at_version(db, patient_id, version)
+
+class FactMatch(BaseModel):
+    id: int
+    patient_id: int
+    email: str
+    category: str
+    value: str
+    status: str
+    provenance_pointer: int | None
+    updated_at: datetime | None
+
+@router.get("/facts", response_model=List[FactMatch])
+async def search_facts(
+    response: Response,
+    category: str = Query(..., description="medication, symptom, allergy or chief_complaint"),
+    value: str = Query(..., min_length=1, description="Matched case-insensitively, e.g. 'warfarin'"),
+    status: Optional[str] = Query(None, description="e.g. 'active'"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_clinician)
+):
+    """
+    Patients with a given Living Memory fact, e.g. everyone active on warfarin.
+    Index lookup on patient_facts (category, normalized value, status).
+    Enforces Clinic Scope like list_escalations.
+    """
+    if category not in CATEGORY_FIELDS:
+        raise HTTPException(status_code=400, detail=f"category must be one of: {', '.join(CATEGORY_FIELDS)}")
+    rows = await find_facts(db, category, value, status=status, clinic_id=current_user.clinic_id,
+                            limit=limit + 1, after_id=cursor)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1][0].id)
+
+    return [
+        FactMatch(
+            id=fact.id,
+            patient_id=fact.patient_id,
+            email=email,
+            category=fact.category,
+            value=fact.value,
+            status=fact.status,
+            provenance_pointer=fact.provenance_pointer,
+            updated_at=fact.updated_at,
+        ) for fact, email in rows
+    ]
 
 class MessageLogItem(BaseModel):
     id: int
@@ -105,43 +207,158 @@ class MessageLogItem(BaseModel):
     confidence_score: int | None
     confidence_level: str | None # Derived from score
 
+def _confidence_level(score: int | None) -> str | None:
+    if not score: return None
+    if score >= 90: return "High"
+    if score >= 50: return "Medium"
+    return "Low"
+
+# Column-level select (no ORM identity map), so streamed rows can be dropped as soon as they are sent
+MESSAGE_LOG_COLUMNS = (
+    Message.id,
+    Message.sender_type,
+    func.coalesce(Message.content_redacted, Message.content),  # Use redacted for log safe view
+    Message.timestamp,
+    Message.risk_level,
+    Message.risk_reason,
+    Message.confidence_score,
+)
+
+# Rows fetched per round trip from the server-side cursor in NDJSON mode
+MESSAGE_STREAM_BATCH_SIZE = 500
+
+def _message_log_item(row) -> MessageLogItem:
+    message_id, sender_type, content, timestamp, risk_level, risk_reason, confidence_score = row
+    return MessageLogItem(
+        id=message_id,
+        sender_type=sender_type,
+        content=content,
+        timestamp=timestamp,
+        risk_level=risk_level.value if risk_level else None,
+        risk_reason=risk_reason,
+        confidence_score=confidence_score,
+        confidence_level=_confidence_level(confidence_score)
+    )
+
 @router.get("/patient/{patient_id}/messages", response_model=List[MessageLogItem])
 async def get_patient_messages(
     patient_id: int,
+    response: Response,
+    before: Optional[int] = Query(None, description="Only messages older than this message id (X-Next-Cursor of the previous page)"),
+    limit: int = Query(200, ge=1, le=1000),
+    conversation_id: Optional[int] = None,
+    risk_level: Optional[RiskLevel] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get full message log for a patient (Clinician only).
+    Message log for a patient, newest first (Clinician only).
+    Keyset-paginated on message id: pass the X-Next-Cursor response header back as `before`.
+    format=ndjson streams every matching message (no `limit`) as one JSON object per line,
+    read through a server-side cursor so memory stays flat however long the history is.
     """
     if current_user.role != "clinician":
         raise HTTPException(status_code=403, detail="Only clinicians can access this endpoint")
 
     # Join Conversation to filter by patient_id
     stmt = (
-        select(Message)
+        select(*MESSAGE_LOG_COLUMNS)
         .join(Conversation, Conversation.id == Message.conversation_id)
         .where(Conversation.user_id == patient_id)
-        .order_by(Message.timestamp.desc())
     )
-    result = await db.execute(stmt)
-    messages = result.scalars().all()
-    
-    def get_conf_level(score):
-        if not score: return None
-        if score >= 90: return "High"
-        if score >= 50: return "Medium"
-        return "Low"
+    if conversation_id is not None:
+        stmt = stmt.where(Message.conversation_id == conversation_id)
+    if risk_level is not None:
+        stmt = stmt.where(Message.risk_level == risk_level)
+    if before is not None:
+        stmt = stmt.where(Message.id < before)
+    # Ids are assigned in insert order, so this is chronological and a unique keyset
+    stmt = stmt.order_by(Message.id.desc())
 
-    return [
-        MessageLogItem(
-            id=m.id,
-            sender_type=m.sender_type,
-            content=m.content_redacted or m.content, # Use redacted for log safe view
-            timestamp=m.timestamp,
-            risk_level=m.risk_level.value if m.risk_level else None,
-            risk_reason=m.risk_reason,
-            confidence_score=m.confidence_score,
-            confidence_level=get_conf_level(m.confidence_score)
-        ) for m in messages
-    ]
+    if format == "ndjson":
+        # The request session would stay checked out until the stream ends; the cursor gets its own
+        await db.close()
+
+        async def rows():
+            async with SessionLocal() as session:
+                result = await session.stream(stmt.execution_options(yield_per=MESSAGE_STREAM_BATCH_SIZE))
+                async for partition in result.partitions():
+                    yield "".join(_message_log_item(row).model_dump_json() + "\n" for row in partition)
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1][0])
+
+    return [_message_log_item(row) for row in rows]
+
+class TriageStatus(BaseModel):
+    degraded: bool # AI triage unavailable, or messages still waiting for re-triage
+    llm_circuit: str # closed, open, half_open (as seen by this API process)
+    pending_retriage: int # Messages held during an outage and not yet re-triaged
+
+@router.get("/status", response_model=TriageStatus)
+async def triage_status(
+    db: AsyncSession = Depends(get_db),
+    current_clinician: User = Depends(get_current_clinician)
+):
+    """
+    Degraded-mode flag for the dashboard. While degraded, new messages that no rule flags
+    are held for re-triage instead of being escalated, so the queue may not show them yet.
+    """
+    query = select(func.count(Job.id)).where(Job.kind == RISK_RETRIAGE, Job.status != "dead")
+    if current_clinician.clinic_id:
+        query = query.where(Job.payload["clinic_id"].as_string() == current_clinician.clinic_id)
+    pending = (await db.execute(query)).scalar()
+    return TriageStatus(
+        degraded=llm_breaker.is_open or pending > 0,
+        llm_circuit=llm_breaker.state,
+        pending_retriage=pending,
+    )
+
+# Idle connections get a comment line this often so proxies keep them open
+FEED_KEEPALIVE_SECONDS = 15
+
+@router.get("/events")
+async def clinician_events(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_clinician: User = Depends(get_current_clinician)
+):
+    """
+    Live clinician feed (Server-Sent Events), scoped like list_escalations.
+    Events: escalation.created, escalation.updated, escalation.resolved, patient.activity, profile.updated
+    (payloads carry ids; the dashboard refetches what it shows). `resync` means
+    notifications may have been missed and everything should be refetched.
+    """
+    topic = clinic_topic(current_clinician.clinic_id) if current_clinician.clinic_id else CLINIC_ALL
+    # Auth used the request-scoped session, which would otherwise stay checked out
+    # (idle in transaction) until the client disconnects
+    await db.close()
+
+    async def feed():
+        async with broker.subscribe(topic) as queue:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await broker.ensure_listening():
+                        yield "event: resync\ndata: {}\n\n"
+                    else:
+                        yield ": keepalive\n\n"
+                    continue
+                name = event.get("event", "message")
+                data = {k: v for k, v in event.items() if k not in ("event", "topic")}
+                if name == "reconnect":
+                    await broker.ensure_listening()
+                    name = "resync"
+                yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        feed(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
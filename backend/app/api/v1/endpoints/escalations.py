@@ -3,22 +3,29 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from app.db.database import get_db
 from app.db.models import Escalation, Message, RiskLevel, User, Conversation
-from app.schemas import MessageResponse, EscalationResponse
+from app.schemas import MessageResponse, EscalationResponse, PatientProfileVersionResponse
 from app.api.deps import get_current_clinician
-from app.core.privacy import redact_pii
+from app.core.privacy import redact_pii_async
+from app.core.events import publish, conversation_topic, clinic_topic
+from app.services.activity import ActivityService
+from app.services.facts import profile_at_version
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
 router = APIRouter()
 
+activity_service = ActivityService()
+
 class EscalationListResponse(BaseModel):
     id: int
     conversation_id: int
     trigger_message_id: int
     status: str
     triage_summary: str
-    patient_profile_snapshot: Optional[dict] = {}
+    patient_profile_snapshot: Optional[dict] = {} # Legacy escalations only; see GET /{id}/profile
+    profile_id: Optional[int] = None
+    profile_version: Optional[int] = None
     created_at: Optional[str] = None # Helper
 
     class Config:
@@ -51,6 +58,35 @@ async def list_escalations(
     escalations = result.scalars().all()
     return escalations
 
+@router.get("/{escalation_id}/profile", response_model=PatientProfileVersionResponse)
+async def get_escalation_profile(
+    escalation_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_clinician: User = Depends(get_current_clinician)
+):
+    """
+    The patient's profile as it was when the escalation was raised,
+    rebuilt from profile history at the referenced version.
+    """
+    query = select(Escalation, User.id)\
+        .join(Conversation, Escalation.conversation_id == Conversation.id)\
+        .join(User, Conversation.user_id == User.id)\
+        .where(Escalation.id == escalation_id)
+
+    # Enforce Clinic Scope
+    if current_clinician.clinic_id:
+        query = query.where(User.clinic_id == current_clinician.clinic_id)
+
+    row = (await db.execute(query)).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Escalation not found or access denied")
+    escalation, patient_id = row
+
+    if escalation.profile_version is None and escalation.patient_profile_snapshot:
+        # Raised before profile history existed: the full copy is all there is
+        return PatientProfileVersionResponse(**escalation.patient_profile_snapshot)
+    return await profile_at_version(db, patient_id, escalation.profile_version)
+
 @router.post("/{escalation_id}/reply", response_model=MessageResponse)
 async def reply_to_escalation(
     escalation_id: int,
@@ -63,22 +99,24 @@ async def reply_to_escalation(
     1. Post message as 'clinician'.
     2. Mark escalation as 'resolved'.
     """
-    # 1. Fetch Escalation
-    query = select(Escalation).where(Escalation.id == escalation_id)
+    # 1. Fetch Escalation (with the patient, for clinician feed events)
+    query = select(Escalation, User.id, User.clinic_id)\
+        .join(Conversation, Escalation.conversation_id == Conversation.id)\
+        .join(User, Conversation.user_id == User.id)\
+        .where(Escalation.id == escalation_id)
     
     # Enforce Clinic Scope
     if current_clinician.clinic_id:
-        query = query.join(Conversation, Escalation.conversation_id == Conversation.id)\
-                     .join(User, Conversation.user_id == User.id)\
-                     .where(User.clinic_id == current_clinician.clinic_id)
+        query = query.where(User.clinic_id == current_clinician.clinic_id)
 
     result = await db.execute(query)
-    escalation = result.scalars().first()
-    if not escalation:
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Escalation not found or access denied")
+    escalation, patient_id, patient_clinic_id = row
     
     # 2. Create Message
-    content_redacted = redact_pii(payload.content)
+    content_redacted = await redact_pii_async(payload.content)
     
     clinician_msg = Message(
         conversation_id=escalation.conversation_id,
@@ -92,7 +130,17 @@ async def reply_to_escalation(
     
     # 3. Update Escalation Status
     escalation.status = "resolved"
+
+    # Keep the dashboard summary in step (same transaction)
+    await activity_service.record_message(db, patient_id, patient_clinic_id, "clinician", clinician_msg.timestamp)
+    await activity_service.record_escalation_resolved(db, patient_id)
     
+    # Push to the patient's open subscription and the clinician feeds (delivered on commit)
+    await publish(db, conversation_topic(escalation.conversation_id), "message.created")
+    await publish(db, clinic_topic(patient_clinic_id), "escalation.resolved",
+                  escalation_id=escalation.id, patient_id=patient_id, conversation_id=escalation.conversation_id)
+    await publish(db, clinic_topic(patient_clinic_id), "patient.activity",
+                  patient_id=patient_id, conversation_id=escalation.conversation_id)
     await db.commit()
     await db.refresh(clinician_msg)
     
@@ -0,0 +1,182 @@
+"""
+Audit log behind `structured_log`: JSON lines written off the request path.
+
+The caller only timestamps the record and puts it on a bounded queue. A writer thread
+takes whatever has accumulated, redacts the metadata (the redaction engine; string values
+at any depth), serializes it and appends the batch with one write
+to AUDIT_LOG_PATH, rotated by size like logging.handlers.RotatingFileHandler (stderr
+when no path is set).
+
+When the queue is full the writer cannot keep up. AUDIT_OVERFLOW then decides:
+- "drop" (default): the record is counted in audit_dropped_total and discarded; the caller never waits.
+- "spill": the caller appends the record to `<path>.spill` itself. Nothing is lost, but that
+  write happens on the caller's thread (the event loop), so only use it where losing an audit
+  record is worse than a slow request.
+"""
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import (
+    AUDIT_BATCH_SIZE, AUDIT_LOG_BACKUPS, AUDIT_LOG_MAX_BYTES, AUDIT_LOG_PATH, AUDIT_OVERFLOW, AUDIT_QUEUE_SIZE,
+)
+from app.core.metrics import metrics
+
+OVERFLOW_POLICIES = ("drop", "spill")
+_STOP = object()
+
+def _dumps(entry: Dict[str, Any]) -> bytes:
+    return json.dumps(entry, default=str, separators=(",", ":")).encode() + b"\n"
+
+class RotatingJsonlFile:
+    """Append-only JSONL file, rolled over to path.1 .. path.N before it would exceed `max_bytes`."""
+    def __init__(self, path: str, max_bytes: int = AUDIT_LOG_MAX_BYTES, backups: int = AUDIT_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = open(path, "ab")
+
+    def write(self, data: bytes):
+        size = self._file.tell()
+        if self.max_bytes and size and size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+
+    def _rotate(self):
+        self._file.close()
+        if self.backups:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+
+    def close(self):
+        self._file.close()
+
+class StderrSink:
+    def write(self, data: bytes):
+        sys.stderr.write(data.decode())
+        sys.stderr.flush()
+
+    def close(self):
+        pass
+
+class AuditLog:
+    """
+    Bounded queue plus one writer thread (started on first use; drained at exit or `close`).
+    `redact` is applied to every string in the metadata before it is written anywhere.
+    """
+    def __init__(self, redact: Callable[[str], str], path: str = AUDIT_LOG_PATH,
+                 queue_size: int = AUDIT_QUEUE_SIZE, overflow: str = AUDIT_OVERFLOW,
+                 batch_size: int = AUDIT_BATCH_SIZE, sink=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid audit overflow policy {overflow!r}; expected one of {', '.join(OVERFLOW_POLICIES)}")
+        self.redact = redact
+        self.path = path
+        self.overflow = overflow
+        self.batch_size = max(1, batch_size)
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._given_sink = sink
+        self.sink = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def log(self, event: str, metadata: Dict[str, Any], level: str = "INFO"):
+        """Never blocks on the writer (unless spilling a record the queue had no room for)."""
+        if self._thread is None:
+            self._start()
+        # Copied: the caller may keep mutating its dict after we return
+        record = (time.time(), event, level, dict(metadata))
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == "drop":
+                metrics.incr("audit_dropped_total")
+                return
+            metrics.incr("audit_spilled_total")
+            self._spill(record)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.sink = self._given_sink or (RotatingJsonlFile(self.path) if self.path else StderrSink())
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def _redact_value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.redact(value)
+        if isinstance(value, dict):
+            return {k: self._redact_value(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple, set)):
+            return [self._redact_value(v) for v in value]
+        return value
+
+    def _serialize(self, record: tuple) -> bytes:
+        created, event, level, metadata = record
+        return _dumps({
+            "event": event,
+            "level": level,
+            "timestamp": datetime.fromtimestamp(created, timezone.utc).isoformat(timespec="milliseconds"),
+            "metadata": self._redact_value(metadata),
+        })
+
+    def _write(self, records: List[tuple], sink):
+        try:
+            sink.write(b"".join(self._serialize(r) for r in records))
+            metrics.incr("audit_written_total", len(records))
+        except Exception as e:
+            metrics.incr("audit_write_errors_total", len(records))
+            print(f"Audit log write failed: {e}")
+
+    def _spill(self, record: tuple):
+        with self._spill_lock:
+            if self.path:
+                with open(f"{self.path}.spill", "ab") as f:
+                    f.write(self._serialize(record))
+            else:
+                self._write([record], StderrSink())
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Whatever piled up while the last batch was written goes out in one write
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = any(r is _STOP for r in batch)
+            records = [r for r in batch if r is not _STOP]
+            if records:
+                self._write(records, self.sink)
+            metrics.set("audit_queue_depth", self.queue.qsize())
+            if stop:
+                return
+
+    def close(self, timeout: float = 5.0):
+        """Write out everything queued so far and stop the writer."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        if not thread.is_alive():
+            self.sink.close()
+            self._thread = None  # a later log() starts a new writer
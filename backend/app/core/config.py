@@ -0,0 +1,86 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# Start ChatService.generate_reply alongside risk analysis; the reply is only used if risk is LOW.
+SPECULATIVE_CHAT_REPLY = _env_bool("SPECULATIVE_CHAT_REPLY", False)
+
+# Texts at least this long are redacted in a worker process instead of on the event loop
+REDACTION_OFFLOAD_CHARS = int(os.getenv("REDACTION_OFFLOAD_CHARS", "20000"))
+REDACTION_WORKERS = int(os.getenv("REDACTION_WORKERS", "2"))
+# Optional word list (one term per line) for the dictionary redaction detector
+REDACTION_DICTIONARY_PATH = os.getenv("REDACTION_DICTIONARY_PATH")
+
+# Cache of LOW risk classifications: "memory" (per worker), "postgres" (shared across workers) or "off"
+RISK_CACHE_BACKEND = os.getenv("RISK_CACHE_BACKEND", "memory").strip().lower()
+RISK_CACHE_MAX_ENTRIES = int(os.getenv("RISK_CACHE_MAX_ENTRIES", "10000"))
+RISK_CACHE_TTL_SECONDS = int(os.getenv("RISK_CACHE_TTL_SECONDS", "3600"))
+
+# Memory extraction jobs run this long after a patient's message; everything that patient
+# sent in the meantime is extracted with it in one LLM call
+MEMORY_COALESCE_SECONDS = float(os.getenv("MEMORY_COALESCE_SECONDS", "2.0"))
+
+# Durable job queue (app/services/jobs.py) and its worker process (python -m app.worker)
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))
+# A running job claimed longer ago than this is assumed lost (worker crash) and claimed again
+JOB_LOCK_TIMEOUT_SECONDS = int(os.getenv("JOB_LOCK_TIMEOUT_SECONDS", "300"))
+# On SIGTERM, in-flight jobs get this long to finish before they are released back to the queue
+JOB_DRAIN_SECONDS = float(os.getenv("JOB_DRAIN_SECONDS", "30"))
+
+# Profile history: a compacted snapshot every N profile versions bounds how many events a
+# point-in-time reconstruction has to replay
+PROFILE_SNAPSHOT_INTERVAL = int(os.getenv("PROFILE_SNAPSHOT_INTERVAL", "25"))
+
+# LLM call scheduler (app/services/llm_scheduler.py), per process: risk > chat > memory
+# Requests per minute this process may send (0 = no rate limit); size it to its share of the quota
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+# Adaptive concurrency: halved on throttling (429), grows back by one per window of successes
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+# Concurrency slots only risk classification may use, so it never queues behind background work
+LLM_PRIORITY_RESERVE = int(os.getenv("LLM_PRIORITY_RESERVE", "2"))
+
+# LLM circuit breaker (per process): open after N consecutive provider failures/timeouts,
+# probe again after the reset window. While open, risk triage falls back to rules + re-triage.
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+# Per-call timeouts (streams: longest wait for the next chunk)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+RISK_LLM_TIMEOUT_SECONDS = float(os.getenv("RISK_LLM_TIMEOUT_SECONDS", "10"))
+# Messages held while triage was unavailable are re-triaged by the worker; a job is only
+# attempted while the circuit is closed, so this bounds failures after recovery, not outage length
+RETRIAGE_MAX_ATTEMPTS = int(os.getenv("RETRIAGE_MAX_ATTEMPTS", "10"))
+
+# LLM provider: "gemini" (needs GOOGLE_API_KEY) or "fake" (offline, app/services/fake_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").strip().lower()
+# Fake provider: latency distribution (all purposes, or "risk=...;chat=...;memory=..."),
+# cyclic risk outcomes, and the share of calls that fail like the provider does (error, throttle, hang)
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "fixed:0")
+FAKE_LLM_RISK_SCRIPT = os.getenv("FAKE_LLM_RISK_SCRIPT", "LOW")
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_LLM_FAILURE_MODE = os.getenv("FAKE_LLM_FAILURE_MODE", "error").strip().lower()
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED")) if os.getenv("FAKE_LLM_SEED") else None
+
+# Requests slower than this are logged with their per-stage breakdown (0 = never)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "5"))
+
+# Audit log (structured_log, app/core/audit.py): JSONL file rotated by size; empty path = stderr
+AUDIT_LOG_PATH = os.getenv("AUDIT_LOG_PATH", "")
+AUDIT_LOG_MAX_BYTES = int(os.getenv("AUDIT_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+AUDIT_LOG_BACKUPS = int(os.getenv("AUDIT_LOG_BACKUPS", "10"))
+# Records waiting for the writer thread; when full: "drop" (counted) or "spill" (caller appends to <path>.spill, blocking)
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "drop").strip().lower()
+# Most records written per batch
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
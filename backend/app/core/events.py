@@ -0,0 +1,149 @@
+import asyncio
+import json
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import metrics
+from app.db.database import DATABASE_URL
+
+# Single Postgres channel; events are routed to subscribers by their 'topic'
+CHANNEL = "nightingale_events"
+
+def conversation_topic(conversation_id: int) -> str:
+    return f"conversation:{conversation_id}"
+
+def clinic_topic(clinic_id: Optional[str]) -> str:
+    """
+    Clinician feed topic. Mirrors list_escalations scoping: clinicians with a clinic_id
+    see their clinic only; clinicians without one subscribe to CLINIC_ALL.
+    """
+    return f"clinic:{clinic_id or ''}"
+
+CLINIC_ALL = "clinic:*"
+
+async def publish(db: AsyncSession, topic: str, event: str, **data: Any):
+    """
+    Queue a NOTIFY in the caller's transaction.
+    Postgres only delivers it on COMMIT (and drops it on rollback), so subscribers
+    never hear about rows they cannot read yet. Payloads carry ids only (8 KB limit);
+    subscribers re-query with their cursor.
+    """
+    payload = json.dumps({"topic": topic, "event": event, **data})
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+async def publish_all(db: AsyncSession, events: List[Tuple[str, str, Dict[str, Any]]]):
+    """Several publish() calls, (topic, event, data) each, in one round trip; delivered in order."""
+    if not events:
+        return
+    params = {"channel": CHANNEL}
+    for i, (topic, event, data) in enumerate(events):
+        params[f"payload_{i}"] = json.dumps({"topic": topic, "event": event, **data})
+    calls = ", ".join(f"pg_notify(:channel, :payload_{i})" for i in range(len(events)))
+    await db.execute(text(f"SELECT {calls}"), params)
+
+class EventBroker:
+    """
+    Per-process fan-out of Postgres notifications.
+    One dedicated asyncpg connection LISTENs on CHANNEL; each subscriber gets a bounded queue,
+    and one that overflows gets a `resync` event in place of its backlog.
+    Works across uvicorn workers because every worker listens to the same channel.
+    """
+    def __init__(self, dsn: str = DATABASE_URL, channel: str = CHANNEL, queue_size: int = 100):
+        self.dsn = dsn
+        self.channel = channel
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._conn: Optional[asyncpg.Connection] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _is_listening(self) -> bool:
+        return (
+            self._conn is not None
+            and not self._conn.is_closed()
+            and self._loop is asyncio.get_running_loop()
+        )
+
+    async def ensure_listening(self) -> bool:
+        """
+        Connect and LISTEN if needed. Returns True if a (re)connect happened,
+        in which case notifications may have been missed and subscribers should catch up.
+        """
+        if self._is_listening():
+            return False
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            # One lock per event loop; _loop only changes once a connection exists
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        async with self._lock:
+            if self._is_listening():
+                return False
+            conn = await asyncpg.connect(self.dsn)
+            await conn.add_listener(self.channel, self._on_notify)
+            conn.add_termination_listener(self._on_terminate)
+            self._conn = conn
+            self._loop = loop
+            return True
+
+    def _on_notify(self, conn, pid, channel, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        self._dispatch(event.get("topic"), event)
+
+    def _on_terminate(self, conn):
+        # Wake every subscriber so it reconnects and catches up from its cursor
+        self._conn = None
+        for topic, queues in list(self._subscribers.items()):
+            for queue in list(queues):
+                self._put(queue, {"topic": topic, "event": "reconnect"})
+
+    def _put(self, queue: asyncio.Queue, event: dict):
+        """
+        Deliver without blocking. A full queue means the subscriber fell behind: its backlog is
+        replaced by a single `resync`, so it refetches everything instead of silently missing
+        events it has no cursor for (the clinician feed).
+        """
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            metrics.incr("events_resync_total")
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"topic": event.get("topic"), "event": "resync"})
+
+    def _dispatch(self, topic: Optional[str], event: dict):
+        targets = list(self._subscribers.get(topic, ()))
+        if topic and ":" in topic:
+            # Wildcard subscribers, e.g. "clinic:*"
+            targets += self._subscribers.get(topic.split(":", 1)[0] + ":*", ())
+        for queue in targets:
+            # Each subscriber gets its own copy; consumers may reshape what they read
+            self._put(queue, dict(event))
+
+    @asynccontextmanager
+    async def subscribe(self, topic: str):
+        await self.ensure_listening()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[topic].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[topic].discard(queue)
+            if not self._subscribers[topic]:
+                del self._subscribers[topic]
+
+    async def close(self):
+        if self._conn is not None and not self._conn.is_closed():
+            await self._conn.close()
+        self._conn = None
+
+broker = EventBroker()
@@ -0,0 +1,118 @@
+import bisect
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Upper bounds in seconds, from a redaction pass to a slow LLM reply
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """Cumulative-bucket histogram for one label set (Prometheus semantics)."""
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        total, out = 0, []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+class Metrics:
+    """
+    Minimal in-process metrics registry: counters (incr), gauges (set) and histograms (observe).
+    Values are per worker process; `render` exposes them in the Prometheus text format.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self._gauges: Dict[str, Dict[LabelKey, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = defaultdict(dict)
+        # Call-site label order -> canonical key; incr() runs on hot paths (e.g. every redaction)
+        self._keys: Dict[tuple, LabelKey] = {}
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        raw = tuple(labels.items())
+        key = self._keys.get(raw)
+        if key is None:
+            key = self._keys[raw] = tuple(sorted((k, str(v)) for k, v in raw))
+        return key
+
+    def incr(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[name][self._key(labels)] += value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[name][self._key(labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+        """Record `value` in histogram `name`; the buckets are fixed by the first observation of each series."""
+        with self._lock:
+            key = self._key(labels)
+            series = self._histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def histogram(self, name: str, **labels) -> Histogram | None:
+        with self._lock:
+            return self._histograms.get(name, {}).get(self._key(labels))
+
+    def get(self, name: str, **labels) -> float:
+        with self._lock:
+            series = self._gauges if name in self._gauges else self._counters
+            return series.get(name, {}).get(self._key(labels), 0)
+
+    def snapshot(self) -> Dict[str, Dict[LabelKey, float]]:
+        with self._lock:
+            return {name: dict(series) for name, series in self._counters.items()}
+
+    def gauges(self) -> Dict[str, Dict[LabelKey, float]]:
+        with self._lock:
+            return {name: dict(series) for name, series in self._gauges.items()}
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for kind, registry in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(registry):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(registry[name].items()):
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+            for name in sorted(self._histograms):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', _format_value(bound)),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
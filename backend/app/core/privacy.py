@@ -1,16 +1,250 @@
+import asyncio
+import multiprocessing
 import re
-from typing import Dict, Any
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from app.core.config import REDACTION_DICTIONARY_PATH, REDACTION_OFFLOAD_CHARS, REDACTION_WORKERS
+from app.core.metrics import metrics
+from app.core.audit import AuditLog
 
 # Simple regex-based patterns for prototype
 PATTERNS = {
     "nric": r"[STFG]\d{7}[A-Z]",
-    "phone": r"(\+?65)?[ -]?\d{4}[ -]?\d{4}",
+    "phone_intl": r"(?<![\w+])(?:\+?\d{1,3}[ .-]?)?\(?\d{3}\)?[ .-]?\d{3}[ .-]?\d{4}\b", # "(555) 123-4567", "+1 555.123.4567", "5551234567"
+    # Not followed by a digit: it must not take 8 digits out of a longer number and leak the rest
+    "phone": r"(\+?65)?[ -]?\d{4}[ -]?\d{4}(?!\d)",
     "email": r"[\w\.-]+@[\w\.-]+\.\w+",
     "name": r"(?<=My name is )[A-Z][a-z]+ [A-Z][a-z]+", # Simple heuristic for "My name is X Y"
     "ssn": r'\b\d{3}-\d{2}-\d{4}\b',
-    "id_generic": r'\bID\d{5,}\b'
+    "id_generic": r'\bID\d{5,}\b',
+    "mrn": r"\b(?i:mrn|id)[:#]?\s{0,2}\d+\b", # "MRN: 12345", "ID #12345"
 }
 
+# Patterns whose every match has a digit within its first N+1 characters (value = N).
+# The engine only tries these next to digits. Keep in sync with PATTERNS; anything
+# not listed here is scanned for everywhere.
+DIGIT_ANCHORED = {"nric": 1, "phone_intl": 1, "phone": 1, "ssn": 0, "id_generic": 2, "mrn": 6}
+
+# Literal a text must contain for the pattern to match anywhere in it
+TRIGGERS = {"email": "@", "name": "My name is "}
+
+def _token(category: str) -> str:
+    return f"[{category.upper()}_REDACTED]"
+
+class Detector:
+    """
+    One step of the redaction pipeline. Detectors run in pipeline order, each on the
+    previous one's output (tokens like [NRIC_REDACTED] never match a later detector).
+    """
+    name = "detector"
+
+    def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
+        """Returns the redacted text and hit counts per category."""
+        raise NotImplementedError
+
+class RegexDetector(Detector):
+    """
+    All PATTERNS compiled into one alternation of named groups; at each position the
+    alternatives are tried in PATTERNS order, which keeps the category priority of the old
+    one-re.sub-per-pattern loop.
+
+    A text is walked once. Python's re tries every alternative at every position, so when
+    no unanchored pattern can match, the walk jumps between digits (a fast charset scan)
+    and only tries the alternation in the few positions before each one.
+    """
+    name = "regex"
+
+    def __init__(self, patterns: Dict[str, str] = PATTERNS, digit_anchored: Dict[str, int] = DIGIT_ANCHORED, triggers: Dict[str, str] = TRIGGERS):
+        self.tokens = {name: _token(name) for name in patterns}
+        self.regex = self._compile(patterns)
+        self.lookback = max(digit_anchored.values(), default=0)
+        # window_regexes[k]: the anchored patterns that can start k characters before a digit
+        self.window_regexes = [
+            self._compile({name: p for name, p in patterns.items() if digit_anchored.get(name, -1) >= k})
+            for k in range(self.lookback + 1)
+        ]
+        self.unanchored = [name for name in patterns if name not in digit_anchored]
+        self.triggers = triggers
+        self._digit = re.compile(r"\d")
+
+    @staticmethod
+    def _compile(patterns: Dict[str, str]) -> re.Pattern:
+        return re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in patterns.items()))
+
+    def _needs_full_scan(self, text: str) -> bool:
+        return any(self.triggers.get(name, "") in text for name in self.unanchored)
+
+    def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
+        hits = {}
+        if self._needs_full_scan(text):
+            def replace(match: re.Match) -> str:
+                # Inner groups (e.g. phone's country code) close before their named group, so lastgroup is the category
+                hits[match.lastgroup] = hits.get(match.lastgroup, 0) + 1
+                return self.tokens[match.lastgroup]
+            return self.regex.sub(replace, text), hits
+        return self._redact_near_digits(text, hits), hits
+
+    def _redact_near_digits(self, text: str, hits: Dict[str, int]) -> str:
+        """
+        Same result as window_regexes[0].sub: the leftmost match is found by trying
+        positions in order, and a match cannot start more than `lookback` before
+        the first digit at or after the scan position. At k characters before the
+        digit only patterns anchored at least that far can match, so the others
+        are not tried there.
+        """
+        parts = []
+        pos = copied = 0
+        while True:
+            digit = self._digit.search(text, pos)
+            if digit is None:
+                break
+            for start in range(max(pos, digit.start() - self.lookback), digit.start() + 1):
+                match = self.window_regexes[digit.start() - start].match(text, start)
+                if match:
+                    hits[match.lastgroup] = hits.get(match.lastgroup, 0) + 1
+                    parts += (text[copied:start], self.tokens[match.lastgroup])
+                    pos = copied = match.end()
+                    break
+            else:
+                pos = digit.start() + 1
+        if not parts:
+            return text
+        parts.append(text[copied:])
+        return "".join(parts)
+
+class NricChecksumDetector(Detector):
+    """
+    NRIC/FIN spellings the strict PATTERNS["nric"] misses (lower case, spaces or dashes,
+    M-series FINs). Loose matches are only redacted if the check letter is valid, so
+    lab codes and order numbers of the same shape are left alone.
+    """
+    name = "nric_checksum"
+    CANDIDATE = re.compile(r"[STFGMstfgm][ -]?[0-9]{7}[ -]?[A-Za-z](?![A-Za-z0-9])")
+    # Cheap precheck: the candidate scan starts at every s/t/f/g/m, which is a lot of English
+    SEVEN_DIGITS = re.compile(r"[0-9][0-9]{6}") # leading single class lets re skip ahead by charset
+    WEIGHTS = (2, 7, 6, 5, 4, 3, 2)
+    OFFSETS = {"S": 0, "T": 4, "F": 0, "G": 4, "M": 3}
+    CHECK_LETTERS = {
+        "S": "JZIHGFEDCBA", "T": "JZIHGFEDCBA",
+        "F": "XWUTRQPNMLK", "G": "XWUTRQPNMLK",
+        "M": "XWUTRQPNJLK",
+    }
+
+    @classmethod
+    def is_valid(cls, nric: str) -> bool:
+        nric = re.sub(r"[ -]", "", nric).upper()
+        prefix, digits, check = nric[0], nric[1:8], nric[8]
+        total = sum(int(d) * w for d, w in zip(digits, cls.WEIGHTS)) + cls.OFFSETS[prefix]
+        return cls.CHECK_LETTERS[prefix][total % 11] == check
+
+    def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
+        hits = {}
+        if not self.SEVEN_DIGITS.search(text):
+            return text, hits
+        parts = []
+        copied = 0
+        for match in self.CANDIDATE.finditer(text):
+            start = match.start()
+            if start and text[start - 1].isalnum():
+                continue
+            if self.is_valid(match.group()):
+                hits["nric"] = hits.get("nric", 0) + 1
+                parts += (text[copied:start], _token("nric"))
+                copied = match.end()
+        if not parts:
+            return text, hits
+        parts.append(text[copied:])
+        return "".join(parts), hits
+
+class DictionaryDetector(Detector):
+    """
+    Deployment-specific terms (staff or ward names, local landmarks) from a word list.
+    Matching is by word sequence, case-insensitive and ignoring punctuation between
+    words, with a set lookup per word so large lists stay cheap.
+    """
+    name = "dictionary"
+    WORD = re.compile(r"\w+")
+
+    def __init__(self, terms: Iterable[str], category: str = "term"):
+        self.category = category
+        self.terms = set()
+        self.first_words = set()
+        self.max_words = 0
+        for term in terms:
+            words = tuple(w.casefold() for w in self.WORD.findall(term))
+            if words:
+                self.terms.add(words)
+                self.first_words.add(words[0])
+                self.max_words = max(self.max_words, len(words))
+
+    @classmethod
+    def from_file(cls, path: str, category: str = "term") -> "DictionaryDetector":
+        # One term per line; blank lines and '#' comments are skipped
+        with open(path, encoding="utf-8") as f:
+            return cls((line.strip() for line in f if line.strip() and not line.startswith("#")), category)
+
+    def redact(self, text: str) -> Tuple[str, Dict[str, int]]:
+        hits = {}
+        if not self.terms:
+            return text, hits
+        words = list(self.WORD.finditer(text))
+        parts = []
+        copied = i = 0
+        while i < len(words):
+            if words[i].group().casefold() in self.first_words:
+                # Longest term starting at this word wins
+                for n in range(min(self.max_words, len(words) - i), 0, -1):
+                    if tuple(w.group().casefold() for w in words[i:i + n]) in self.terms:
+                        hits[self.category] = hits.get(self.category, 0) + 1
+                        parts += (text[copied:words[i].start()], _token(self.category))
+                        copied = words[i + n - 1].end()
+                        i += n
+                        break
+                else:
+                    i += 1
+            else:
+                i += 1
+        if not parts:
+            return text, hits
+        parts.append(text[copied:])
+        return "".join(parts), hits
+
+# Per-detector seconds and hit counts for one text, e.g. {"regex": (0.00001, {"phone": 1})}
+RedactionStats = Dict[str, Tuple[float, Dict[str, int]]]
+
+class RedactionPipeline:
+    """
+    Ordered list of detectors, compiled once. run() returns the stats instead of recording
+    them so it can execute in a worker process; the caller records them into metrics.
+    """
+    def __init__(self, detectors: List[Detector]):
+        self.detectors = detectors
+
+    def run(self, text: str) -> Tuple[str, RedactionStats]:
+        stats = {}
+        for detector in self.detectors:
+            started = time.perf_counter()
+            text, hits = detector.redact(text)
+            stats[detector.name] = (time.perf_counter() - started, hits)
+        return text, stats
+
+def default_detectors() -> List[Detector]:
+    detectors = [RegexDetector(), NricChecksumDetector()]
+    if REDACTION_DICTIONARY_PATH:
+        detectors.append(DictionaryDetector.from_file(REDACTION_DICTIONARY_PATH))
+    return detectors
+
+pipeline = RedactionPipeline(default_detectors())
+
+def _record(stats: RedactionStats):
+    for detector, (seconds, hits) in stats.items():
+        metrics.incr("redaction_detector_seconds_total", seconds, detector=detector)
+        for category, count in hits.items():
+            metrics.incr("redaction_hits_total", count, detector=detector, category=category)
+
 def redact_pii(text: str) -> str:
     """
     Scrub common PII from text.
@@ -18,36 +252,59 @@ def redact_pii(text: str) -> str:
     """
     if not text:
         return text
-        
-    redacted = text
-    for ptype, pattern in PATTERNS.items():
-        redacted = re.sub(pattern, f"[{ptype.upper()}_REDACTED]", redacted)
+    redacted, stats = pipeline.run(text)
+    _record(stats)
     return redacted
 
+def redact_pii_batch(texts: Iterable[str]) -> List[str]:
+    """
+    redact_pii over many texts (backfills, exports, history rendering).
+    """
+    return [redact_pii(text) for text in texts]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and DB connections is not safe
+        _pool = ProcessPoolExecutor(max_workers=REDACTION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def _run_pipeline(text: str) -> Tuple[str, RedactionStats]:
+    # Runs in a pool process, against that process's own import-time pipeline
+    return pipeline.run(text)
+
+async def redact_pii_async(text: str) -> str:
+    """
+    redact_pii for request handlers. Texts of REDACTION_OFFLOAD_CHARS or more (voice
+    transcripts, pasted lab results) run in a process pool: re holds the GIL for a whole
+    scan, so a thread would still stall the event loop.
+    """
+    global _pool
+    if not text or len(text) < REDACTION_OFFLOAD_CHARS:
+        return redact_pii(text)
+    metrics.incr("redaction_offloaded_total")
+    try:
+        redacted, stats = await asyncio.get_running_loop().run_in_executor(_get_pool(), _run_pipeline, text)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); start a fresh pool next time, keep the loop free now
+        _pool = None
+        redacted, stats = await asyncio.to_thread(pipeline.run, text)
+    _record(stats)
+    return redacted
+
+def shutdown_redaction_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+audit_log = AuditLog(redact=redact_pii)
+
 def structured_log(event: str, metadata: Dict[str, Any], level: str = "INFO"):
     """
-    Log event as JSON effectively.
-    """
-    import json
-    import logging
-    
-    # Safe logger
-    logger = logging.getLogger("nightingale.audit")
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(logging.INFO)
-    
-    log_entry = {
-        "event": event,
-        "level": level,
-        "timestamp": str(logging.Formatter().formatTime(logging.LogRecord("",0,"","",0,0,0), "%Y-%m-%dT%H:%M:%S")),
-        "metadata": metadata
-    }
-    
-    # Ensure no PII in metadata (basic shallow check)
-    # Ideally, we pass already safe metadata
-    
-    logger.info(json.dumps(log_entry))
+    Audit-log an event as one JSON line. Returns immediately: redaction of the metadata,
+    serialization and the write happen on the audit writer thread (app/core/audit.py).
+    """
+    audit_log.log(event, metadata, level)
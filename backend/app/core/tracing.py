@@ -0,0 +1,142 @@
+"""
+Per-request timing: where did the time go?
+
+The request middleware starts a RequestTrace for each HTTP request. Pipeline stages (`span`),
+LLM calls (`add_span`) and every database query made while serving the request add to it, and
+to the process-wide histograms served at /metrics:
+- http_request_seconds{method,route,status}: until the last body byte (streams: the first byte)
+- http_request_db_queries{method,route}: queries per request
+- stage_seconds{stage}: pipeline stages (redact, risk, reply, ...)
+- db_query_seconds: every query, in or out of a request
+Slow requests are logged with their breakdown (SLOW_REQUEST_SECONDS).
+"""
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import SLOW_REQUEST_SECONDS
+from app.core.metrics import COUNT_BUCKETS, metrics
+from app.core.privacy import structured_log
+
+class RequestTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = defaultdict(float)
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+# Shared by reference with tasks the request starts (e.g. the speculative reply), so
+# concurrent spans overlap and their sum can exceed the request time
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+def add_span(stage: str, seconds: float):
+    """Add time spent outside a `span` block (e.g. an LLM call timed by its caller) to the current request."""
+    trace = _current.get()
+    if trace is not None:
+        trace.spans[stage] += seconds
+
+@contextmanager
+def span(stage: str):
+    """Time a pipeline stage: stage_seconds{stage} and the current request's breakdown."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe("stage_seconds", seconds, stage=stage)
+        add_span(stage, seconds)
+
+# Registered on the Engine class, so every engine (including test engines) is counted.
+# With asyncpg the sync events run inside the awaiting task's context, so the trace is visible.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+    metrics.observe("db_query_seconds", seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.db_queries += 1
+        trace.db_seconds += seconds
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+def _route_template(scope) -> str:
+    """Path template of the matched route ("/api/v1/chat/{conversation_id}/history"), never the raw path."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # A route in a router included under a prefix only knows its own part of the path. The
+    # request path ends with that part filled in; what comes before it is the static prefix.
+    convertors = getattr(route, "param_convertors", {})
+    params = {
+        key: convertors[key].to_string(value) if key in convertors else value
+        for key, value in (scope.get("path_params") or {}).items()
+    }
+    try:
+        filled = route.path_format.format(**params)
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return template
+    path = scope.get("path", "")
+    return path[:len(path) - len(filled)] + template if path.endswith(filled) else template
+
+class RequestMetricsMiddleware:
+    """ASGI middleware: one RequestTrace per HTTP request, recorded when the response is complete."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = RequestTrace()
+        token = _current.set(trace)
+        status = 500
+        # Background tasks run after the response inside the same call: freeze the numbers then
+        finished: Optional[tuple] = None
+
+        async def send_and_time(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = dict(message.get("headers") or [])
+                if headers.get(b"content-type", b"").startswith(b"text/event-stream"):
+                    # Streams can stay open for minutes; time to first byte is what the client waits for
+                    finished = (time.perf_counter(), trace.db_queries, trace.db_seconds, dict(trace.spans))
+            elif message["type"] == "http.response.body" and not message.get("more_body") and finished is None:
+                finished = (time.perf_counter(), trace.db_queries, trace.db_seconds, dict(trace.spans))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_time)
+        finally:
+            _current.reset(token)
+            ended, db_queries, db_seconds, spans = finished or (time.perf_counter(), trace.db_queries, trace.db_seconds, dict(trace.spans))
+            route = _route_template(scope)
+            seconds = ended - trace.started
+            metrics.observe("http_request_seconds", seconds, method=scope["method"], route=route, status=status)
+            metrics.observe("http_request_db_queries", db_queries, buckets=COUNT_BUCKETS, method=scope["method"], route=route)
+            if SLOW_REQUEST_SECONDS and seconds >= SLOW_REQUEST_SECONDS:
+                structured_log("Slow Request", {
+                    "method": scope["method"], "route": route, "status": status, "seconds": round(seconds, 3),
+                    "db_queries": db_queries, "db_seconds": round(db_seconds, 3),
+                    "stages": {stage: round(s, 3) for stage, s in spans.items()},
+                }, level="WARNING")
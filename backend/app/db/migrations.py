@@ -0,0 +1,36 @@
+import os
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ALEMBIC_INI = os.path.join(BACKEND_DIR, "alembic.ini")
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+def alembic_config() -> Config:
+    return Config(ALEMBIC_INI)
+
+def expected_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+async def check_schema_version(engine: AsyncEngine):
+    """
+    Verify the database is migrated to the code's head revision.
+    Read-only (no DDL, no locks): migrations run out-of-band with `alembic upgrade head`.
+    """
+    expected = expected_revision()
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            current = result.scalar()
+        except Exception:
+            current = None
+
+    if current != expected:
+        raise SchemaVersionError(
+            f"Database schema is at revision {current!r}, code expects {expected!r}. "
+            "Run `alembic upgrade head` from the backend directory."
+        )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON, Boolean, Index, Float, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 import enum
 import datetime
@@ -18,10 +18,14 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     clinic_id = Column(String, nullable=True) # For RBAC scoping
 
+    __table_args__ = (
+        Index("ix_users_role_clinic_id", "role", "clinic_id"),
+    )
+
 class Conversation(Base):
     __tablename__ = "conversations"
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     title = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
@@ -43,27 +47,89 @@ class Message(Base):
     audio_url = Column(String, nullable=True) # S3/Blob URL
 
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    # Bumped by every ORM update (risk fields rewritten by triage/retriage); part of the history ETag
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     
     conversation = relationship("Conversation", back_populates="messages")
 
+    __table_args__ = (
+        Index("ix_messages_conversation_id_timestamp", "conversation_id", "timestamp"),
+    )
+
 Conversation.messages = relationship("Message", back_populates="conversation")
 
 class PatientProfile(Base):
-    """The 'Living Memory' - updates live"""
+    """The 'Living Memory' - updates live. The facts themselves are PatientFact rows."""
     __tablename__ = "patient_profiles"
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("users.id"))
-    
-    # Structured Facts (Stored as JSON with provenance)
-    # Example structure: 
-    # { "value": "Advil", "status": "active", "source_msg_id": 12 }
-    medications = Column(JSON, default=list) 
-    symptoms = Column(JSON, default=list)
-    allergies = Column(JSON, default=list)
-    chief_complaint = Column(JSON, default=list)
+    patient_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     
     last_updated = Column(DateTime, default=datetime.datetime.utcnow)
 
+    # Optimistic concurrency: every ORM UPDATE/DELETE checks and bumps it (StaleDataError on mismatch)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
+class PatientFact(Base):
+    """
+    One Living Memory fact: a medication, symptom, allergy or chief complaint.
+    One row per (patient, category, normalized value); updates are single-row upserts.
+    """
+    __tablename__ = "patient_facts"
+    id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category = Column(String, nullable=False) # medication, symptom, allergy, chief_complaint
+    value = Column(String, nullable=False) # As first extracted, for display
+    normalized_value = Column(String, nullable=False) # Lower-cased, whitespace-collapsed match key
+    status = Column(String, nullable=False) # active, stopped, past, resolved, incorrect, unknown
+    provenance_pointer = Column(Integer, nullable=True) # Message the current status came from
+    stopped_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("patient_id", "category", "normalized_value", name="uq_patient_facts_patient_category_value"),
+        # Cross-patient lookups, e.g. everyone actively on warfarin
+        Index("ix_patient_facts_lookup", "category", "normalized_value", "status"),
+    )
+
+class ProfileEvent(Base):
+    """
+    Append-only log of Living Memory changes, written with each profile version.
+    kind 'fact': the fact's state after the change; kind 'clear': the profile was reset.
+    Replayed on top of the latest ProfileSnapshot to rebuild any past version.
+    """
+    __tablename__ = "profile_events"
+    id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    profile_version = Column(Integer, nullable=False) # PatientProfile.version this change produced
+    kind = Column(String, nullable=False) # fact, clear
+    category = Column(String, nullable=True)
+    normalized_value = Column(String, nullable=True)
+    value = Column(String, nullable=True)
+    status = Column(String, nullable=True)
+    provenance_pointer = Column(Integer, nullable=True)
+    stopped_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_profile_events_patient_version", "patient_id", "profile_version"),
+    )
+
+class ProfileSnapshot(Base):
+    """Compacted profile state at a version (every PROFILE_SNAPSHOT_INTERVAL versions)."""
+    __tablename__ = "profile_snapshots"
+    id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    facts = Column(JSON, nullable=False) # Fact records in display order
+    last_updated = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("patient_id", "version", name="uq_profile_snapshots_patient_version"),
+    )
+
 class Escalation(Base):
     """The Triage Ticket"""
     __tablename__ = "escalations"
@@ -72,4 +138,71 @@ class Escalation(Base):
     trigger_message_id = Column(Integer, ForeignKey("messages.id"))
     status = Column(String, default="pending") # pending, resolved
     triage_summary = Column(String) # 3-5 bullet points
-    patient_profile_snapshot = Column(JSON, nullable=True) # Snapshot at time of escalation
+    patient_profile_snapshot = Column(JSON, nullable=True) # Legacy: full copy, escalations before profile history
+    # Profile at time of escalation, rebuilt from profile history on demand
+    profile_id = Column(Integer, ForeignKey("patient_profiles.id"), nullable=True)
+    profile_version = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_escalations_status_conversation_id", "status", "conversation_id"),
+    )
+
+class PatientActivity(Base):
+    """Per-patient dashboard summary, maintained in the same transaction as each message/escalation write"""
+    __tablename__ = "patient_activity"
+    patient_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    clinic_id = Column(String, nullable=True) # Denormalized from users for scoped, index-ordered listing
+
+    last_message_at = Column(DateTime, nullable=True)
+    last_patient_message_at = Column(DateTime, nullable=True)
+    last_clinician_reply_at = Column(DateTime, nullable=True)
+    unread_count = Column(Integer, default=0, nullable=False) # Patient messages since the last clinician reply
+
+    pending_escalation_count = Column(Integer, default=0, nullable=False)
+    highest_open_risk = Column(Enum(RiskLevel), nullable=True) # Highest risk among pending escalations
+
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_patient_activity_recent", last_message_at.desc().nulls_last(), patient_id.desc()),
+        Index("ix_patient_activity_clinic_recent", clinic_id, last_message_at.desc().nulls_last(), patient_id.desc()),
+    )
+
+class RiskCacheEntry(Base):
+    """
+    Shared cache of LOW risk classifications (RISK_CACHE_BACKEND=postgres).
+    UNLOGGED: no WAL, emptied after a crash, which is fine for a cache.
+    """
+    __tablename__ = "risk_cache"
+    key = Column(String, primary_key=True) # sha256 of normalized message + history fingerprint
+    result = Column(JSON, nullable=False)
+    llm_seconds = Column(Float, nullable=False) # Latency of the LLM call that produced it
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_risk_cache_expires_at", "expires_at"),
+        {"prefixes": ["UNLOGGED"]},
+    )
+
+class Job(Base):
+    """
+    Durable background work (app/services/jobs.py), run by `python -m app.worker`.
+    Completed jobs are deleted; failed ones are retried with backoff and end up 'dead'.
+    """
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False) # e.g. "memory.extract"
+    key = Column(String, nullable=True) # Queued jobs with the same kind and key are claimed and run together
+    payload = Column(JSON, nullable=False)
+    status = Column(String, default="queued", nullable=False) # queued, running, dead
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime, nullable=True) # Claim time; running jobs locked too long ago are reclaimed
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_jobs_queued_run_after", "run_after", "id", postgresql_where=text("status = 'queued'")),
+        Index("ix_jobs_key_status", "key", "status"),
+    )
@@ -0,0 +1,69 @@
+import asyncio
+from sqlalchemy import select, text
+from app.db.database import SessionLocal
+from app.db.models import User
+from app.core.security import get_password_hash, verify_password
+from app.services.activity import ActivityService
+
+async def seed_default_users():
+    """
+    Seed the default patient (id 1) and clinician (id 2). Idempotent.
+    Run after migrations: `python -m app.db.seed`.
+    """
+    async with SessionLocal() as session:
+        result = await session.execute(select(User).where(User.id == 1))
+        user = result.scalars().first()
+        if not user:
+            print("Seeding default user...")
+            default_user = User(
+                id=1, 
+                email="patient@example.com", 
+                hashed_password=get_password_hash("Nightingale@123"),
+                role="patient",
+                is_active=True
+            )
+            session.add(default_user)
+            await session.commit()
+        else:
+            # Backfill password if missing or update if it's the old insecure default
+            # Check if password is the old "password"
+            is_old_password = False
+            if user.hashed_password:
+                try:
+                    is_old_password = verify_password("password", user.hashed_password)
+                except Exception:
+                    pass
+
+            if not user.hashed_password or is_old_password:
+                print("Updating/Backfilling password for default user...")
+                user.hashed_password = get_password_hash("Nightingale@123")
+                user.role = "patient"
+                user.is_active = True
+                await session.commit()
+
+        # Seed default clinician (Check explicitly)
+        result = await session.execute(select(User).where(User.id == 2))
+        clinician = result.scalars().first()
+        if not clinician:
+            print("Seeding default clinician...")
+            default_clinician = User(
+                id=2, 
+                email="clinician@example.com", 
+                hashed_password=get_password_hash("Nightingale@123"),
+                role="clinician",
+                is_active=True
+            )
+            session.add(default_clinician)
+            await session.commit()
+
+        # Explicit ids above do not advance the serial; keep it ahead so later inserts don't collide
+        await session.execute(text("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT max(id) FROM users))"))
+        await session.commit()
+
+        # Give newly seeded patients a row in the dashboard summary
+        if not user:
+            await ActivityService().rebuild(session)
+            await session.commit()
+
+if __name__ == "__main__":
+    asyncio.run(seed_default_users())
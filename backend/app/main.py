@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.db.database import engine, Base, SessionLocal
-from app.db.models import User
-from sqlalchemy import select, text
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import engine, get_db
+from app.db.migrations import check_schema_version
 from app.api.v1.api import api_router
+from app.core.events import broker
+from app.core.privacy import audit_log, shutdown_redaction_pool
+from app.core.metrics import metrics
+from app.core.tracing import RequestMetricsMiddleware
+from app.services.jobs import record_queue_metrics
 
 app = FastAPI(title="Nightingale API", version="0.1.0")
 
@@ -14,89 +20,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(api_router, prefix="/api/v1")
 
 @app.on_event("startup")
 async def startup():
-    # Create tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        
-        # Auto-Migration for chief_complaint
-        try:
-            await conn.execute(text("ALTER TABLE patient_profiles ADD COLUMN IF NOT EXISTS chief_complaint JSON DEFAULT '[]'::json"))
-        except Exception as e:
-            print(f"Migration Note (chief_complaint): {e}")
+    # Schema changes and seeding happen out-of-band (alembic upgrade head / python -m app.db.seed);
+    # workers only refuse to start against a database that is not at the expected revision.
+    await check_schema_version(engine)
 
-    # Auto-Migration for escalation snapshot
-        try:
-            await conn.execute(text("ALTER TABLE escalations ADD COLUMN IF NOT EXISTS patient_profile_snapshot JSON"))
-        except Exception as e:
-            print(f"Migration Note (snapshot): {e}")
 
-        # Auto-Migration: Users & Voice
-        try:
-            await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS hashed_password VARCHAR"))
-            await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS role VARCHAR DEFAULT 'patient'"))
-            await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE"))
-            await conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS clinic_id VARCHAR"))
-            await conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS audio_transcript_id VARCHAR"))
-            await conn.execute(text("ALTER TABLE messages ADD COLUMN IF NOT EXISTS audio_url VARCHAR"))
-            print("Migration Success: Added User & Voice columns")
-        except Exception as e:
-            print(f"Migration Note (Auth/Voice): {e}")
-    
-    # Seed default user
-    async with SessionLocal() as session:
-        result = await session.execute(select(User).where(User.id == 1))
-        user = result.scalars().first()
-        if not user:
-            print("Seeding default user...")
-            from app.core.security import get_password_hash
-            default_user = User(
-                id=1, 
-                email="patient@example.com", 
-                hashed_password=get_password_hash("Nightingale@123"),
-                role="patient",
-                is_active=True
-            )
-            session.add(default_user)
-            await session.commit()
-        else:
-            # Backfill password if missing or update if it's the old insecure default
-            from app.core.security import get_password_hash, verify_password
-            
-            # Check if password is the old "password"
-            is_old_password = False
-            if user.hashed_password:
-                try:
-                    is_old_password = verify_password("password", user.hashed_password)
-                except Exception:
-                    pass
-
-            if not user.hashed_password or is_old_password:
-                print("Updating/Backfilling password for default user...")
-                user.hashed_password = get_password_hash("Nightingale@123")
-                user.role = "patient"
-                user.is_active = True
-                await session.commit()
-
-        # Seed default clinician (Check explicitly)
-        result = await session.execute(select(User).where(User.id == 2))
-        clinician = result.scalars().first()
-        if not clinician:
-            print("Seeding default clinician...")
-            from app.core.security import get_password_hash
-            default_clinician = User(
-                id=2, 
-                email="clinician@example.com", 
-                hashed_password=get_password_hash("Nightingale@123"),
-                role="clinician",
-                is_active=True
-            )
-            session.add(default_clinician)
-            await session.commit()
+@app.on_event("shutdown")
+async def shutdown():
+    await broker.close()
+    shutdown_redaction_pool()
+    audit_log.close()
 
 
 @app.get("/")
@@ -106,3 +45,12 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(db: AsyncSession = Depends(get_db)):
+    """
+    Prometheus scrape endpoint (this process's metrics, plus the shared job queue).
+    Not under /api/v1 and unauthenticated: expose it to the scraper only, not through the public proxy.
+    """
+    await record_queue_metrics(db)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -46,3 +46,7 @@ class PatientProfileResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class PatientProfileVersionResponse(PatientProfileResponse):
+    """A profile as of a past version (None: before any history was recorded)"""
+    version: Optional[int] = None
@@ -0,0 +1,161 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, or_, literal, update
+from sqlalchemy.dialects.postgresql import insert
+from app.db.models import PatientActivity, Message, Conversation, Escalation, User, RiskLevel
+from datetime import datetime
+from typing import Optional
+
+RISK_ORDER = {RiskLevel.LOW: 0, RiskLevel.MEDIUM: 1, RiskLevel.HIGH: 2}
+
+class ActivityService:
+    """
+    Maintains the patient_activity summary the clinician patient list reads from.
+    Methods only stage statements; the caller commits them together with the
+    message/escalation write so the summary never drifts from the source rows.
+    """
+
+    async def record_message(self, db: AsyncSession, patient_id: int, clinic_id: Optional[str], sender_type: str, at: datetime):
+        is_patient = sender_type == "patient"
+        is_clinician = sender_type == "clinician"
+
+        stmt = insert(PatientActivity).values(
+            patient_id=patient_id,
+            clinic_id=clinic_id,
+            last_message_at=at,
+            last_patient_message_at=at if is_patient else None,
+            last_clinician_reply_at=at if is_clinician else None,
+            unread_count=1 if is_patient else 0,
+            pending_escalation_count=0,
+            updated_at=datetime.utcnow(),
+        )
+        table = PatientActivity.__table__.c
+        updates = {
+            "clinic_id": func.coalesce(stmt.excluded.clinic_id, table.clinic_id),
+            "last_message_at": func.greatest(table.last_message_at, stmt.excluded.last_message_at),
+            "updated_at": stmt.excluded.updated_at,
+        }
+        if is_patient:
+            updates["last_patient_message_at"] = func.greatest(table.last_patient_message_at, stmt.excluded.last_patient_message_at)
+            updates["unread_count"] = table.unread_count + 1
+        elif is_clinician:
+            # A clinician reply answers everything the patient sent before it
+            updates["last_clinician_reply_at"] = func.greatest(table.last_clinician_reply_at, stmt.excluded.last_clinician_reply_at)
+            updates["unread_count"] = 0
+
+        await db.execute(stmt.on_conflict_do_update(index_elements=[PatientActivity.patient_id], set_=updates))
+
+    async def record_escalation_opened(self, db: AsyncSession, patient_id: int, clinic_id: Optional[str], risk_level: RiskLevel):
+        stmt = insert(PatientActivity).values(
+            patient_id=patient_id,
+            clinic_id=clinic_id,
+            unread_count=0,
+            pending_escalation_count=1,
+            highest_open_risk=risk_level,
+            updated_at=datetime.utcnow(),
+        )
+        table = PatientActivity.__table__.c
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[PatientActivity.patient_id],
+            set_={
+                "pending_escalation_count": table.pending_escalation_count + 1,
+                # Postgres enums compare in declaration order (LOW < MEDIUM < HIGH); GREATEST skips NULLs
+                "highest_open_risk": func.greatest(table.highest_open_risk, stmt.excluded.highest_open_risk),
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ))
+
+    async def record_escalation_raised(self, db: AsyncSession, patient_id: int, risk_level: RiskLevel):
+        """A pending escalation took on another message (re-triage): raise the open risk, same count."""
+        table = PatientActivity.__table__.c
+        await db.execute(
+            update(PatientActivity)
+            .where(PatientActivity.patient_id == patient_id)
+            .values(highest_open_risk=func.greatest(table.highest_open_risk, risk_level), updated_at=datetime.utcnow())
+        )
+
+    async def record_escalation_resolved(self, db: AsyncSession, patient_id: int):
+        """
+        Must run after the escalation's status change is flushed/staged in the same session,
+        since the open-risk level is recomputed from the remaining pending escalations.
+        """
+        await db.flush()
+        result = await db.execute(
+            select(Message.risk_level)
+            .join(Escalation, Escalation.trigger_message_id == Message.id)
+            .join(Conversation, Conversation.id == Escalation.conversation_id)
+            .where(Conversation.user_id == patient_id)
+            .where(Escalation.status == "pending")
+        )
+        open_levels = [level for level in result.scalars().all() if level is not None]
+        highest = max(open_levels, key=RISK_ORDER.get) if open_levels else None
+
+        activity = await db.get(PatientActivity, patient_id)
+        if activity is None:
+            return
+        activity.pending_escalation_count = len(open_levels)
+        activity.highest_open_risk = highest
+        activity.updated_at = datetime.utcnow()
+
+    async def rebuild(self, db: AsyncSession):
+        """
+        Recompute every patient's summary from messages/escalations (backfill or repair).
+        One set-based INSERT ... SELECT ... ON CONFLICT; the caller commits.
+        """
+        msg_stats = (
+            select(
+                Conversation.user_id.label("patient_id"),
+                func.max(Message.timestamp).label("last_message_at"),
+                func.max(Message.timestamp).filter(Message.sender_type == "patient").label("last_patient_message_at"),
+                func.max(Message.timestamp).filter(Message.sender_type == "clinician").label("last_clinician_reply_at"),
+            )
+            .join(Message, Message.conversation_id == Conversation.id)
+            .group_by(Conversation.user_id)
+            .cte("patient_message_stats")
+        )
+        unread = (
+            select(Conversation.user_id.label("patient_id"), func.count(Message.id).label("unread_count"))
+            .join(Message, Message.conversation_id == Conversation.id)
+            .join(msg_stats, msg_stats.c.patient_id == Conversation.user_id)
+            .where(Message.sender_type == "patient")
+            .where(or_(msg_stats.c.last_clinician_reply_at.is_(None), Message.timestamp > msg_stats.c.last_clinician_reply_at))
+            .group_by(Conversation.user_id)
+            .subquery()
+        )
+        pending = (
+            select(
+                Conversation.user_id.label("patient_id"),
+                func.count(Escalation.id).label("pending_count"),
+                func.max(Message.risk_level).label("highest_open_risk"),
+            )
+            .join(Escalation, Escalation.conversation_id == Conversation.id)
+            .outerjoin(Message, Message.id == Escalation.trigger_message_id)
+            .where(Escalation.status == "pending")
+            .group_by(Conversation.user_id)
+            .subquery()
+        )
+        source = (
+            select(
+                User.id,
+                User.clinic_id,
+                msg_stats.c.last_message_at,
+                msg_stats.c.last_patient_message_at,
+                msg_stats.c.last_clinician_reply_at,
+                func.coalesce(unread.c.unread_count, 0),
+                func.coalesce(pending.c.pending_count, 0),
+                pending.c.highest_open_risk,
+                literal(datetime.utcnow()),
+            )
+            .outerjoin(msg_stats, msg_stats.c.patient_id == User.id)
+            .outerjoin(unread, unread.c.patient_id == User.id)
+            .outerjoin(pending, pending.c.patient_id == User.id)
+            .where(User.role == "patient")
+        )
+        columns = [
+            "patient_id", "clinic_id", "last_message_at", "last_patient_message_at", "last_clinician_reply_at",
+            "unread_count", "pending_escalation_count", "highest_open_risk", "updated_at",
+        ]
+        stmt = insert(PatientActivity).from_select(columns, source)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[PatientActivity.patient_id],
+            set_={name: getattr(stmt.excluded, name) for name in columns if name != "patient_id"},
+        ))
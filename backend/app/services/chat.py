@@ -1,9 +1,9 @@
-from app.db.models import PatientProfile
+from app.services.context import ConversationContext
 from app.services.llm_factory import LLMFactory
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 
 class ChatResponse(BaseModel):
     content: str = Field(description="The empathetic response to the patient.")
@@ -16,7 +16,7 @@ class ChatService:
     Service to generate empathetic conversational replies using Gemini with medical tuning.
     """
     def __init__(self):
-        self.llm = LLMFactory.create_llm(temperature=0.3) # Lower temp for more control
+        self.llm = LLMFactory.create_llm(temperature=0.3, purpose="chat") # Lower temp for more control
         self.parser = JsonOutputParser(pydantic_object=ChatResponse)
         
         self.prompt = ChatPromptTemplate.from_messages([
@@ -45,46 +45,66 @@ class ChatService:
                        "{format_instructions}"),
             ("user", "{message}")
         ])
+        self.format_instructions = self.parser.get_format_instructions()
         self.chain = self.prompt | self.llm | self.parser
 
-    async def generate_reply(self, new_message: str, patient_profile: PatientProfile, history: List[dict]) -> ChatResponse:
+    FALLBACK_CONTENT = "I'm listening, but I'm having trouble processing that right now. Could you tell me more about how you're feeling?"
+
+    def _build_inputs(self, context: ConversationContext) -> dict:
+        return {
+            "message": context.message,
+            "history": context.chat_history,
+            "medications": context.medications,
+            "symptoms": context.symptoms,
+            "format_instructions": self.format_instructions
+        }
+
+    def _fallback(self, content: Optional[str] = None) -> ChatResponse:
+        # Fallback safe response
+        return ChatResponse(
+            content=content or self.FALLBACK_CONTENT,
+            confidence="Low",
+            reason="System error occurred during response generation.",
+            citations=["System Fallback"]
+        )
+
+    async def generate_reply(self, context: ConversationContext) -> ChatResponse:
         """
-        Generates a structured reply based on message, history, and patient profile.
+        Generates a structured reply to the context's message, given its history and the patient profile.
         """
-        # Prepare context strings
-        meds_str = ", ".join([m['value'] for m in patient_profile.medications]) if patient_profile and patient_profile.medications else "None"
-        syms_str = ", ".join([s['value'] for s in patient_profile.symptoms]) if patient_profile and patient_profile.symptoms else "None"
-        
-        # Format history string
-        history_str = ""
-        if history:
-            # History comes in as objects, need to serialize
-            for msg in history:
-                if msg.get("sender_type") == "patient":
-                    role = "Patient"
-                elif msg.get("sender_type") == "clinician":
-                    role = "Verified Nurse"
-                else:
-                    role = "Nightingale"
-                
-                content = msg.get("content_redacted") or msg.get("content")
-                history_str += f"{role}: {content}\n"
-        
         try:
-            response = await self.chain.ainvoke({
-                "message": new_message,
-                "history": history_str,
-                "medications": meds_str,
-                "symptoms": syms_str,
-                "format_instructions": self.parser.get_format_instructions()
-            })
+            response = await self.chain.ainvoke(self._build_inputs(context))
             return ChatResponse(**response)
         except Exception as e:
             print(f"Chat Logic Failed: {e}")
-            # Fallback safe response
-            return ChatResponse(
-                content="I'm listening, but I'm having trouble processing that right now. Could you tell me more about how you're feeling?",
-                confidence="Low",
-                reason="System error occurred during response generation.",
-                citations=["System Fallback"]
-            )
+            return self._fallback()
+
+    async def stream_reply(self, context: ConversationContext) -> AsyncIterator[Tuple[str, Optional[ChatResponse]]]:
+        """
+        Streams the reply as (content_delta, None) tuples while the model generates,
+        then yields ("", ChatResponse) once the full JSON (confidence, reason, citations) is parsed.
+        """
+        # JsonOutputParser emits cumulative partial dicts; diff the 'content' field to get deltas.
+        sent = ""
+        partial = {}
+        try:
+            async for partial in self.chain.astream(self._build_inputs(context)):
+                content = partial.get("content") if isinstance(partial, dict) else None
+                if isinstance(content, str) and len(content) > len(sent) and content.startswith(sent):
+                    delta = content[len(sent):]
+                    sent = content
+                    yield delta, None
+            response = ChatResponse(**partial)
+        except Exception as e:
+            print(f"Chat Logic Failed: {e}")
+            response = self._fallback(content=sent or None)
+
+        if not sent:
+            yield response.content, None
+        elif response.content.startswith(sent):
+            if len(response.content) > len(sent):
+                yield response.content[len(sent):], None
+        else:
+            # Never persist text the patient has not seen
+            response.content = sent
+        yield "", response
@@ -0,0 +1,80 @@
+import time
+from typing import Callable
+
+from app.core.config import LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RESET_SECONDS
+from app.core.metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Call refused without trying: the dependency failed recently. Retry after `retry_after` seconds."""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit is open (retry in {retry_after:.0f}s)")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (per process).
+    - closed: calls go through; `failure_threshold` failures in a row open the circuit.
+    - open: calls are refused (CircuitOpenError) for `reset_seconds`.
+    - half_open: one probe call is let through; success closes the circuit, failure reopens it.
+      A probe that never reports back (cancelled) is replaced after `reset_seconds`.
+    State is exported as the gauge circuit_open{circuit} (1 while open or half-open).
+    """
+    def __init__(self, name: str, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = LLM_BREAKER_RESET_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        metrics.set("circuit_open", 0, circuit=name)
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being refused or probed (the dependency is not known to be healthy)."""
+        return self.state != CLOSED
+
+    def retry_after(self) -> float:
+        if self.state == CLOSED:
+            return 0.0
+        since = self._opened_at if self.state == OPEN else self._probe_at
+        return max(0.0, self.reset_seconds - (self.clock() - since))
+
+    def _transition(self, state: str):
+        self.state = state
+        metrics.incr("circuit_transitions_total", circuit=self.name, state=state)
+        metrics.set("circuit_open", int(state != CLOSED), circuit=self.name)
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not be attempted now."""
+        if self.state == CLOSED:
+            return
+        now = self.clock()
+        if self.state == OPEN and now - self._opened_at >= self.reset_seconds:
+            self._transition(HALF_OPEN)
+            self._probe_at = now
+            return
+        if self.state == HALF_OPEN and now - self._probe_at >= self.reset_seconds:
+            self._probe_at = now
+            return
+        metrics.incr("circuit_rejected_total", circuit=self.name)
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self._opened_at = self.clock()
+            self._transition(OPEN)
+
+llm_breaker = CircuitBreaker("llm")
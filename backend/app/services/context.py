@@ -0,0 +1,92 @@
+"""
+ConversationContext: what the LLM services are told about a conversation, built once per request.
+
+Risk analysis, the chat reply and memory extraction all render the same few messages and
+profile facts into prompt text. Building them here once keeps every service on the same
+view: chronological order, redacted text only, and each rendering computed at most once
+(the speculative reply and risk analysis share one context).
+"""
+from datetime import datetime
+from functools import cached_property
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from app.core.privacy import redact_pii
+from app.db.models import Message
+from app.schemas import PatientProfileResponse
+
+# How the chat prompt labels each sender; clinician messages are ground truth for the model
+CHAT_ROLES = {"patient": "Patient", "clinician": "Verified Nurse"}
+DEFAULT_CHAT_ROLE = "Nightingale"
+
+class ContextMessage(NamedTuple):
+    id: Optional[int]
+    sender_type: str
+    text: str  # redacted
+    timestamp: Optional[datetime] = None
+
+def _values(items: Optional[list]) -> str:
+    return ", ".join(item["value"] for item in items) if items else "None"
+
+class ConversationContext:
+    """
+    `messages` are chronological and end with the one being handled (`message`); the
+    history renderings cover the messages before it. `profile` is the patient's Living Memory.
+    """
+    def __init__(self, messages: Sequence[ContextMessage], profile: Optional[PatientProfileResponse] = None):
+        self.messages = tuple(messages)
+        self.profile = profile
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Message], profile: Optional[PatientProfileResponse] = None) -> "ConversationContext":
+        """From Message rows in any order. Rows saved without redacted text are redacted here."""
+        messages = [
+            ContextMessage(
+                row.id, row.sender_type,
+                row.content_redacted if row.content_redacted is not None else redact_pii(row.content or ""),
+                row.timestamp,
+            )
+            for row in rows
+        ]
+        messages.sort(key=lambda m: (m.timestamp or datetime.min, m.id or 0))
+        return cls(messages, profile)
+
+    @classmethod
+    def for_message(cls, text: str, profile: Optional[PatientProfileResponse] = None) -> "ConversationContext":
+        """A single (already redacted) patient message with no history."""
+        return cls([ContextMessage(None, "patient", text)], profile)
+
+    @property
+    def message(self) -> str:
+        """The (redacted) text of the message being handled."""
+        return self.messages[-1].text if self.messages else ""
+
+    @property
+    def history(self) -> tuple:
+        return self.messages[:-1]
+
+    @cached_property
+    def risk_history(self) -> str:
+        """'sender_type: text' lines, for the risk prompt (and its cache key)."""
+        return "\n".join(f"{m.sender_type}: {m.text}" for m in self.history)
+
+    @cached_property
+    def chat_history(self) -> str:
+        """'Role: text' lines, for the chat prompt."""
+        return "".join(f"{CHAT_ROLES.get(m.sender_type, DEFAULT_CHAT_ROLE)}: {m.text}\n" for m in self.history)
+
+    @cached_property
+    def transcript(self) -> str:
+        """Every message as '[id] text', for memory extraction (facts point back to the id)."""
+        return "\n".join(f"[{m.id}] {m.text}" for m in self.messages)
+
+    @cached_property
+    def medications(self) -> str:
+        return _values(self.profile.medications if self.profile else None)
+
+    @cached_property
+    def symptoms(self) -> str:
+        return _values(self.profile.symptoms if self.profile else None)
+
+    @cached_property
+    def profile_context(self) -> str:
+        return f"Current Medications: {self.medications}\nCurrent Symptoms: {self.symptoms}"
@@ -0,0 +1,250 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import PROFILE_SNAPSHOT_INTERVAL
+from app.db.models import PatientFact, PatientProfile, ProfileEvent, ProfileSnapshot, User
+from app.schemas import PatientProfileResponse, PatientProfileVersionResponse
+
+# Fact category -> PatientProfileResponse field
+CATEGORY_FIELDS = {
+    "medication": "medications",
+    "symptom": "symptoms",
+    "allergy": "allergies",
+    "chief_complaint": "chief_complaint",
+}
+
+def normalize_value(value: str) -> str:
+    """Match key for a fact: 'Ibuprofen ' and 'ibuprofen' are the same medication."""
+    return " ".join(value.split()).lower()
+
+async def upsert_facts(db: AsyncSession, patient_id: int, items: List[dict], now: Optional[datetime] = None) -> list:
+    """
+    Insert or update one row per (patient, category, normalized value) in a single statement.
+    `items` are extracted facts (value, category, status, source_message_id), oldest first.
+    A row is only overwritten by a fact from the same or a newer message, so extractions
+    that commit out of order cannot roll a fact back. Returns the rows actually written.
+    """
+    now = now or datetime.utcnow()
+    rows: Dict[tuple, dict] = {}
+    for item in items:
+        normalized = normalize_value(item["value"])
+        if item["category"] not in CATEGORY_FIELDS or not normalized:
+            continue
+        # The same fact twice in one batch: the later message wins (one row per conflict target)
+        rows[(item["category"], normalized)] = {
+            "patient_id": patient_id,
+            "category": item["category"],
+            "value": item["value"].strip(),
+            "normalized_value": normalized,
+            "status": item["status"],
+            "provenance_pointer": item["source_message_id"],
+            "stopped_at": now if item["status"] == "stopped" else None,
+            "created_at": now,
+            "updated_at": now,
+        }
+    if not rows:
+        return []
+
+    stmt = insert(PatientFact).values(list(rows.values()))
+    current = PatientFact.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PatientFact.patient_id, PatientFact.category, PatientFact.normalized_value],
+        set_={
+            "status": stmt.excluded.status,
+            "provenance_pointer": stmt.excluded.provenance_pointer,
+            "updated_at": stmt.excluded.updated_at,
+            # Stopping stamps stopped_at, restarting clears it, anything else keeps it
+            "stopped_at": case(
+                (stmt.excluded.status == "stopped", stmt.excluded.stopped_at),
+                (stmt.excluded.status == "active", None),
+                else_=current.stopped_at,
+            ),
+        },
+        where=or_(
+            current.provenance_pointer.is_(None),
+            stmt.excluded.provenance_pointer >= current.provenance_pointer,
+        ),
+    )
+    stmt = stmt.returning(
+        PatientFact.category, PatientFact.normalized_value, PatientFact.value, PatientFact.status,
+        PatientFact.provenance_pointer, PatientFact.stopped_at,
+    )
+    return (await db.execute(stmt)).all()
+
+def _fact_dict(fact: PatientFact) -> dict:
+    # Same shape the JSON profile columns used to hold
+    record = {
+        "value": fact.value,
+        "status": fact.status,
+        "provenance_pointer": fact.provenance_pointer,
+        "updated_at": fact.updated_at.isoformat() if fact.updated_at else None,
+    }
+    if fact.stopped_at:
+        record["stopped_at"] = fact.stopped_at.isoformat()
+    return record
+
+async def get_profile(db: AsyncSession, patient_id: int) -> PatientProfileResponse:
+    """The patient's Living Memory, assembled from patient_facts (empty if nothing is known yet)."""
+    facts = (await db.execute(
+        select(PatientFact).where(PatientFact.patient_id == patient_id).order_by(PatientFact.id)
+    )).scalars().all()
+    last_updated = (await db.execute(
+        select(PatientProfile.last_updated).where(PatientProfile.patient_id == patient_id)
+    )).scalar()
+
+    fields: Dict[str, List[dict]] = {field: [] for field in CATEGORY_FIELDS.values()}
+    for fact in facts:
+        fields[CATEGORY_FIELDS[fact.category]].append(_fact_dict(fact))
+    return PatientProfileResponse(**fields, last_updated=last_updated or datetime.utcnow())
+
+async def delete_profile(db: AsyncSession, patient_id: int):
+    """
+    Forget everything known about the patient (caller commits).
+    History is kept: the reset is a new profile version, so escalations taken
+    before it still show what the clinician saw.
+    """
+    profile = (await db.execute(
+        select(PatientProfile).where(PatientProfile.patient_id == patient_id)
+    )).scalars().first()
+    if profile is not None:
+        # Versioned profile row first, in the same lock order as MemoryService writes
+        profile.last_updated = datetime.utcnow()
+        await db.flush()
+    await db.execute(PatientFact.__table__.delete().where(PatientFact.patient_id == patient_id))
+    if profile is None:
+        return
+    db.add(ProfileEvent(patient_id=patient_id, profile_version=profile.version, kind="clear",
+                        created_at=profile.last_updated))
+
+async def find_facts(db: AsyncSession, category: str, value: str, status: Optional[str] = None,
+                     clinic_id: Optional[str] = None, limit: int = 100, after_id: Optional[int] = None):
+    """
+    Patients with a given fact, e.g. every patient actively on warfarin.
+    Served by ix_patient_facts_lookup (category, normalized_value, status); keyset-paginated by fact id.
+    Returns (fact, email) rows.
+    """
+    query = (
+        select(PatientFact, User.email)
+        .join(User, User.id == PatientFact.patient_id)
+        .where(PatientFact.category == category, PatientFact.normalized_value == normalize_value(value))
+    )
+    if status:
+        query = query.where(PatientFact.status == status)
+    if clinic_id:
+        query = query.where(User.clinic_id == clinic_id)
+    if after_id is not None:
+        query = query.where(PatientFact.id > after_id)
+    return (await db.execute(query.order_by(PatientFact.id).limit(limit))).all()
+
+
+# --- Profile history -------------------------------------------------------------------
+# Every profile version appends the facts it changed to profile_events; every
+# PROFILE_SNAPSHOT_INTERVAL versions the whole state is also written to profile_snapshots.
+# A past version is the nearest snapshot at or below it plus the events after it.
+
+def _state_record(category: str, normalized_value: str, value: str, status: str,
+                  provenance_pointer: Optional[int], stopped_at: Optional[datetime], updated_at: Optional[datetime]) -> dict:
+    return {
+        "category": category,
+        "normalized_value": normalized_value,
+        "value": value,
+        "status": status,
+        "provenance_pointer": provenance_pointer,
+        "stopped_at": stopped_at.isoformat() if stopped_at else None,
+        "updated_at": updated_at.isoformat() if updated_at else None,
+    }
+
+async def record_changes(db: AsyncSession, profile: PatientProfile, written: list, now: datetime):
+    """
+    Append the facts written at the profile's (already flushed) version to the event log,
+    and compact a snapshot when the version is due for one. Same transaction as the write.
+    """
+    if written:
+        await db.execute(insert(ProfileEvent).values([
+            {
+                "patient_id": profile.patient_id, "profile_version": profile.version, "kind": "fact",
+                "category": row.category, "normalized_value": row.normalized_value, "value": row.value,
+                "status": row.status, "provenance_pointer": row.provenance_pointer,
+                "stopped_at": row.stopped_at, "created_at": now,
+            } for row in written
+        ]))
+    if profile.version % PROFILE_SNAPSHOT_INTERVAL == 0:
+        await write_snapshot(db, profile)
+
+async def write_snapshot(db: AsyncSession, profile: PatientProfile):
+    facts = (await db.execute(
+        select(PatientFact).where(PatientFact.patient_id == profile.patient_id).order_by(PatientFact.id)
+    )).scalars().all()
+    db.add(ProfileSnapshot(
+        patient_id=profile.patient_id,
+        version=profile.version,
+        facts=[
+            _state_record(f.category, f.normalized_value, f.value, f.status, f.provenance_pointer, f.stopped_at, f.updated_at)
+            for f in facts
+        ],
+        last_updated=profile.last_updated,
+    ))
+
+async def version_at(db: AsyncSession, patient_id: int, when: datetime) -> Optional[int]:
+    """The profile version in effect at `when` (None if no history was recorded yet)."""
+    event_version = (await db.execute(
+        select(func.max(ProfileEvent.profile_version))
+        .where(ProfileEvent.patient_id == patient_id, ProfileEvent.created_at <= when)
+    )).scalar()
+    snapshot_version = (await db.execute(
+        select(func.max(ProfileSnapshot.version))
+        .where(ProfileSnapshot.patient_id == patient_id, ProfileSnapshot.created_at <= when)
+    )).scalar()
+    versions = [v for v in (event_version, snapshot_version) if v is not None]
+    return max(versions) if versions else None
+
+async def profile_at_version(db: AsyncSession, patient_id: int, version: Optional[int]) -> PatientProfileVersionResponse:
+    """Rebuild the profile as it was at `version`: nearest snapshot, then replay the events after it."""
+    state: Dict[tuple, dict] = {}
+    last_updated = None
+    since = 0
+    if version is not None:
+        snapshot = (await db.execute(
+            select(ProfileSnapshot)
+            .where(ProfileSnapshot.patient_id == patient_id, ProfileSnapshot.version <= version)
+            .order_by(ProfileSnapshot.version.desc()).limit(1)
+        )).scalars().first()
+        if snapshot:
+            state = {(f["category"], f["normalized_value"]): f for f in snapshot.facts}
+            last_updated = snapshot.last_updated
+            since = snapshot.version
+
+        events = (await db.execute(
+            select(ProfileEvent)
+            .where(ProfileEvent.patient_id == patient_id,
+                   ProfileEvent.profile_version > since, ProfileEvent.profile_version <= version)
+            .order_by(ProfileEvent.profile_version, ProfileEvent.id)
+        )).scalars().all()
+        for event in events:
+            if event.kind == "clear":
+                state = {}
+            else:
+                state[(event.category, event.normalized_value)] = _state_record(
+                    event.category, event.normalized_value, event.value, event.status,
+                    event.provenance_pointer, event.stopped_at, event.created_at,
+                )
+            last_updated = event.created_at
+
+    fields: Dict[str, List[dict]] = {field: [] for field in CATEGORY_FIELDS.values()}
+    for record in state.values():
+        fact = {k: record[k] for k in ("value", "status", "provenance_pointer", "updated_at")}
+        if record["stopped_at"]:
+            fact["stopped_at"] = record["stopped_at"]
+        fields[CATEGORY_FIELDS[record["category"]]].append(fact)
+    return PatientProfileVersionResponse(**fields, last_updated=last_updated or datetime.utcnow(), version=version)
+
+async def profile_reference(db: AsyncSession, patient_id: int) -> tuple:
+    """(profile_id, version) of the patient's current profile, or (None, None); what escalations store."""
+    row = (await db.execute(
+        select(PatientProfile.id, PatientProfile.version).where(PatientProfile.patient_id == patient_id)
+    )).first()
+    return tuple(row) if row else (None, None)
@@ -0,0 +1,202 @@
+"""
+Offline stand-in for the Gemini chat model (LLM_PROVIDER=fake): no network, no API key.
+
+Answers in the JSON each service expects, after a latency drawn from a configurable
+distribution, so the whole pipeline can be tested and load-tested on a laptop:
+- risk: the next level of a cyclic script ("LOW*8,MEDIUM,HIGH"); a message containing
+  `#risk=HIGH` (or LOW/MEDIUM) gets that level instead.
+- chat: a fixed, schema-complete reply (streamed in small chunks).
+- memory: medications found by a few phrase patterns ("I take X", "stopped taking X").
+A share of calls can be made to fail like the provider does (error, 429, or hang).
+Token usage is reported like Gemini does, estimated at four characters per token.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from app.core.config import (
+    FAKE_LLM_FAILURE_MODE, FAKE_LLM_FAILURE_RATE, FAKE_LLM_LATENCY, FAKE_LLM_RISK_SCRIPT, FAKE_LLM_SEED,
+)
+
+FAILURE_MODES = ("error", "throttle", "hang")
+RISK_DIRECTIVE = re.compile(r"#risk=(LOW|MEDIUM|HIGH)\b", re.IGNORECASE)
+# "[42] I take Advil daily" -> message 42
+MESSAGE_LINE = re.compile(r"^\[(\d+)\]\s*(.*)$")
+STOPPED_MED = re.compile(r"\b(?:stopped|quit|no longer take|no longer taking)\s+(?:taking\s+)?(?:my\s+)?([A-Z][a-zA-Z]+)")
+ACTIVE_MED = re.compile(r"\b(?:take|taking|started)\s+(?:my\s+)?([A-Z][a-zA-Z]+)")
+CHAT_REPLY = {
+    "content": "Thank you for letting me know. How long have you been feeling this way?",
+    "confidence": "Medium",
+    "reason": "Offline fake model reply.",
+    "citations": ["Fake LLM"],
+}
+STREAM_CHUNK_CHARS = 16
+CHARS_PER_TOKEN = 4
+
+def _usage(messages: List[BaseMessage], text: str) -> dict:
+    input_tokens = sum(len(str(m.content)) for m in messages) // CHARS_PER_TOKEN
+    output_tokens = len(text) // CHARS_PER_TOKEN
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+class LatencyDistribution:
+    """
+    Parsed from 'fixed:MS', 'uniform:LOW_MS:HIGH_MS', 'normal:MEAN_MS:STD_MS' or
+    'lognormal:MEDIAN_MS:SIGMA'. Samples are in seconds and never negative.
+    """
+    def __init__(self, spec: str):
+        kind, *params = spec.strip().split(":")
+        try:
+            values = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec {spec!r}")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Invalid latency spec {spec!r}; expected e.g. fixed:50, uniform:20:80, normal:300:50, lognormal:300:0.4")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.values[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.values)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.values)
+        else:
+            median, sigma = self.values
+            ms = median * rng.lognormvariate(0, sigma)
+        return max(0.0, ms) / 1000
+
+def latency_for(purpose: str, spec: str = FAKE_LLM_LATENCY) -> LatencyDistribution:
+    """`spec` is one distribution for every purpose, or 'risk=...;chat=...;memory=...' (missing ones: fixed:0)."""
+    if "=" not in spec:
+        return LatencyDistribution(spec)
+    specs = dict(part.split("=", 1) for part in spec.split(";") if part.strip())
+    return LatencyDistribution(specs.get(purpose, "fixed:0").strip())
+
+def parse_risk_script(script: str) -> List[str]:
+    """'LOW*8,MEDIUM,HIGH' -> 8 x LOW, then MEDIUM, then HIGH (cycled)."""
+    levels = []
+    for part in script.split(","):
+        level, _, count = part.strip().partition("*")
+        level = level.strip().upper()
+        if level not in ("LOW", "MEDIUM", "HIGH"):
+            raise ValueError(f"Invalid risk script entry {part!r}")
+        levels.extend([level] * int(count or 1))
+    return levels
+
+class FakeChatModel(BaseChatModel):
+    purpose: str = "chat"
+    latency: str = "fixed:0"
+    risk_script: str = "LOW"
+    failure_rate: float = 0.0
+    failure_mode: str = "error"
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr()
+    _latency: LatencyDistribution = PrivateAttr()
+    _script: List[str] = PrivateAttr()
+    _risk_calls: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any):
+        if self.failure_mode not in FAILURE_MODES:
+            raise ValueError(f"Invalid failure mode {self.failure_mode!r}; expected one of {', '.join(FAILURE_MODES)}")
+        self._rng = random.Random(self.seed)
+        self._latency = latency_for(self.purpose, self.latency)
+        self._script = parse_risk_script(self.risk_script)
+
+    @classmethod
+    def from_config(cls, purpose: str) -> "FakeChatModel":
+        """Model configured from the FAKE_LLM_* settings."""
+        return cls(purpose=purpose, latency=FAKE_LLM_LATENCY, risk_script=FAKE_LLM_RISK_SCRIPT,
+                   failure_rate=FAKE_LLM_FAILURE_RATE, failure_mode=FAKE_LLM_FAILURE_MODE, seed=FAKE_LLM_SEED)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _inject_failure(self) -> Optional[str]:
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            return self.failure_mode
+        return None
+
+    @staticmethod
+    def _raise(mode: str):
+        if mode == "throttle":
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: fake quota exceeded")
+        raise RuntimeError("503 Service Unavailable: fake provider error")
+
+    def _risk(self, text: str) -> dict:
+        directive = RISK_DIRECTIVE.search(text)
+        if directive:
+            level = directive.group(1).upper()
+        else:
+            level = self._script[self._risk_calls % len(self._script)]
+            self._risk_calls += 1
+        return {"risk_level": level, "reason": f"Fake triage: {level}", "summary": f"- Fake triage rated this {level}."}
+
+    @staticmethod
+    def _memory(text: str) -> dict:
+        items: Dict[tuple, dict] = {}
+        for line in text.splitlines():
+            match = MESSAGE_LINE.match(line.strip())
+            if not match:
+                continue
+            message_id, content = int(match.group(1)), match.group(2)
+            for pattern, status in ((ACTIVE_MED, "active"), (STOPPED_MED, "stopped")):
+                for med in pattern.findall(content):
+                    # Later statements about the same medication win
+                    items.pop(("medication", med.lower()), None)
+                    items[("medication", med.lower())] = {
+                        "value": med, "category": "medication", "status": status, "source_message_id": message_id,
+                    }
+        return {"items": list(items.values())}
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        # The user turn is last; system prompts carry instructions, not the patient's text
+        text = messages[-1].content if messages else ""
+        if not isinstance(text, str):
+            text = json.dumps(text)
+        if self.purpose == "risk":
+            return json.dumps(self._risk(text))
+        if self.purpose == "memory":
+            return json.dumps(self._memory(text))
+        return json.dumps(CHAT_REPLY)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        failure = self._inject_failure()
+        time.sleep(self._latency.sample(self._rng))
+        if failure:
+            self._raise(failure)
+        text = self._respond(messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=_usage(messages, text)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        failure = self._inject_failure()
+        if failure == "hang":
+            await asyncio.Event().wait()  # until the caller's timeout cancels it
+        await asyncio.sleep(self._latency.sample(self._rng))
+        if failure:
+            self._raise(failure)
+        text = self._respond(messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=_usage(messages, text)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        result = await self._agenerate(messages, stop=stop, **kwargs)
+        message = result.generations[0].message
+        text = message.content
+        for start in range(0, len(text), STREAM_CHUNK_CHARS):
+            await asyncio.sleep(0)
+            last = start + STREAM_CHUNK_CHARS >= len(text)
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=text[start:start + STREAM_CHUNK_CHARS], usage_metadata=message.usage_metadata if last else None,
+            ))
@@ -0,0 +1,273 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, exists, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import (
+    JOB_DRAIN_SECONDS, JOB_LOCK_TIMEOUT_SECONDS, JOB_MAX_ATTEMPTS, JOB_POLL_SECONDS,
+    JOB_RETRY_BASE_SECONDS, JOB_WORKER_CONCURRENCY,
+)
+from app.core.metrics import metrics
+from app.db.database import SessionLocal
+from app.db.models import Job
+
+MEMORY_EXTRACT = "memory.extract"
+RISK_RETRIAGE = "risk.retriage"
+
+# Most queued jobs with the same key handed to one handler call
+MAX_GROUP_SIZE = 50
+# Retry backoff never waits longer than this
+MAX_BACKOFF_SECONDS = 600
+# First key of the two-key advisory locks taken while claiming a key ("JOB" in ASCII)
+ADVISORY_LOCK_CLASS = 0x4A4F42
+# (kind, status) pairs exported by record_queue_metrics
+_reported_queues: set = set()
+
+Handler = Callable[[List[Job]], Awaitable[None]]
+
+class RetryLater(Exception):
+    """
+    Raised by a handler when a dependency is known to be down (e.g. an open circuit):
+    the jobs are requeued after `delay` seconds without using up an attempt.
+    """
+    def __init__(self, message: str, delay: float):
+        super().__init__(message)
+        self.delay = delay
+
+async def enqueue(db: AsyncSession, kind: str, payload: Dict[str, Any], key: Optional[str] = None,
+                  delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Job:
+    """
+    Add a job in the caller's transaction: it exists if and only if the caller commits,
+    so work is never lost between "row saved" and "job scheduled".
+    """
+    job = Job(kind=kind, key=key, payload=payload, status="queued", attempts=0, max_attempts=max_attempts,
+              run_after=datetime.utcnow() + timedelta(seconds=delay))
+    db.add(job)
+    return job
+
+async def record_queue_metrics(db: AsyncSession):
+    """
+    Export the queue as gauges: jobs{kind,status} (queued also counts delayed and deferred jobs)
+    and jobs_ready_age_seconds{kind}, how long the oldest ready job has been waiting to run.
+    """
+    now = datetime.utcnow()
+    rows = (await db.execute(
+        select(Job.kind, Job.status, func.count(Job.id),
+               func.min(Job.run_after).filter(Job.status == "queued", Job.run_after <= now))
+        .group_by(Job.kind, Job.status)
+    )).all()
+    counts = {(kind, status): 0 for kind, status in _reported_queues}
+    ages = {kind: 0.0 for kind, _ in _reported_queues}
+    for kind, status, count, oldest_ready in rows:
+        counts[(kind, status)] = count
+        ages.setdefault(kind, 0.0)
+        if oldest_ready is not None:
+            ages[kind] = max(ages[kind], (now - oldest_ready).total_seconds())
+    for (kind, status), count in counts.items():
+        metrics.set("jobs", count, kind=kind, status=status)
+    for kind, age in ages.items():
+        metrics.set("jobs_ready_age_seconds", age, kind=kind)
+    # Series seen once keep being reported (as 0) after the queue empties
+    _reported_queues.update(counts)
+
+async def _try_lock(db: AsyncSession, name: str) -> bool:
+    """Transaction-scoped advisory lock: released by the claim's commit/rollback."""
+    return (await db.execute(
+        select(func.pg_try_advisory_xact_lock(ADVISORY_LOCK_CLASS, func.hashtext(name)))
+    )).scalar()
+
+async def claim(db: AsyncSession, kinds: List[str], lock_timeout: float = JOB_LOCK_TIMEOUT_SECONDS,
+                key: Optional[str] = None) -> List[Job]:
+    """
+    Claim the oldest ready job plus every other queued job with its key (even ones whose
+    run_after is still ahead: that is the coalescing), and commit them as running.
+    Rows are locked FOR UPDATE SKIP LOCKED, so a claimer never waits on rows another
+    transaction holds (another claim, or a fail()/defer() in flight) and moves on instead.
+    SKIP LOCKED alone would let two claimers split one key's jobs (each locks the rows the
+    other skipped, and neither sees the other's uncommitted "running"), so keyed jobs also
+    take a non-blocking advisory lock on the key, held until the claim commits; a key that
+    already has a live running job is left alone so its jobs run in order.
+    `key` restricts the claim to one key. Returns [] when nothing is ready.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=lock_timeout)
+    running = aliased(Job)
+    key_busy = exists().where(
+        running.key == Job.key, running.id != Job.id,
+        running.status == "running", running.locked_at >= stale,
+    )
+    claimable = or_(Job.status == "queued", and_(Job.status == "running", Job.locked_at < stale))
+    ready = or_(
+        and_(Job.status == "queued", Job.run_after <= now),
+        and_(Job.status == "running", Job.locked_at < stale),
+    )
+    skipped_keys: List[str] = []
+    skipped_ids: List[int] = []
+    while True:
+        query = select(Job.id, Job.kind, Job.key).where(Job.kind.in_(kinds), ready, ~key_busy)
+        if key is not None:
+            query = query.where(Job.key == key)
+        if skipped_keys:
+            query = query.where(or_(Job.key.is_(None), Job.key.notin_(skipped_keys)))
+        if skipped_ids:
+            query = query.where(Job.id.notin_(skipped_ids))
+        candidate = (await db.execute(query.order_by(Job.run_after, Job.id).limit(1))).first()
+        if candidate is None:
+            await db.rollback()
+            return []
+
+        if candidate.key is None:
+            group = (await db.execute(
+                select(Job).where(Job.id == candidate.id, claimable).with_for_update(skip_locked=True)
+            )).scalars().all()
+            if group:
+                break
+            skipped_ids.append(candidate.id)
+            continue
+
+        if await _try_lock(db, candidate.key):
+            # New snapshot: sees anything another claimer committed before releasing the key
+            group = (await db.execute(
+                select(Job).where(Job.kind == candidate.kind, Job.key == candidate.key, claimable, ~key_busy)
+                .order_by(Job.id).limit(MAX_GROUP_SIZE)
+                .with_for_update(skip_locked=True)
+            )).scalars().all()
+            if group:
+                break
+        skipped_keys.append(candidate.key)
+
+    for job in group:
+        job.status = "running"
+        job.locked_at = now
+        job.attempts += 1
+    await db.commit()
+    return group
+
+def backoff_seconds(attempts: int, base: float = JOB_RETRY_BASE_SECONDS) -> float:
+    """Exponential backoff with jitter for the retry after `attempts` failed attempts."""
+    delay = min(MAX_BACKOFF_SECONDS, base * 2 ** (attempts - 1))
+    return delay + random.uniform(0, base)
+
+async def complete(db: AsyncSession, jobs: List[Job]):
+    await db.execute(delete(Job).where(Job.id.in_([job.id for job in jobs])))
+    await db.commit()
+
+async def fail(db: AsyncSession, jobs: List[Job], error: str):
+    """Schedule a retry with backoff, or move to the dead-letter state after max_attempts."""
+    now = datetime.utcnow()
+    for job in jobs:
+        job = await db.merge(job)
+        job.last_error = error[:2000]
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = "dead"
+            metrics.incr("jobs_failed_total", kind=job.kind, outcome="dead")
+        else:
+            job.status = "queued"
+            job.run_after = now + timedelta(seconds=backoff_seconds(job.attempts))
+            metrics.incr("jobs_failed_total", kind=job.kind, outcome="retry")
+    await db.commit()
+
+async def release(db: AsyncSession, jobs: List[Job]):
+    """Hand interrupted jobs back to the queue without counting the attempt."""
+    for job in jobs:
+        job = await db.merge(job)
+        job.status = "queued"
+        job.locked_at = None
+        job.attempts = max(0, job.attempts - 1)
+    await db.commit()
+
+async def defer(db: AsyncSession, jobs: List[Job], delay: float, reason: str):
+    """Requeue jobs that could not be attempted, without counting the attempt."""
+    run_after = datetime.utcnow() + timedelta(seconds=delay)
+    for job in jobs:
+        job = await db.merge(job)
+        job.status = "queued"
+        job.locked_at = None
+        job.run_after = run_after
+        job.attempts = max(0, job.attempts - 1)
+        job.last_error = reason[:2000]
+    await db.commit()
+    metrics.incr("jobs_deferred_total", len(jobs), kind=jobs[0].kind)
+
+class JobWorker:
+    """
+    Runs `concurrency` claim/execute loops against the jobs table.
+    stop() stops claiming; run() returns once in-flight jobs have finished, or after
+    drain_seconds, in which case the jobs still running are released to the queue.
+    """
+    def __init__(self, handlers: Dict[str, Handler], concurrency: int = JOB_WORKER_CONCURRENCY,
+                 poll_seconds: float = JOB_POLL_SECONDS, drain_seconds: float = JOB_DRAIN_SECONDS,
+                 session_factory=SessionLocal):
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.drain_seconds = drain_seconds
+        self.session_factory = session_factory
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        loops = [asyncio.create_task(self._loop()) for _ in range(self.concurrency)]
+        await self._stopping.wait()
+        done, pending = await asyncio.wait(loops, timeout=self.drain_seconds)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+
+    async def run_pending(self, key: Optional[str] = None) -> int:
+        """
+        Claim and execute ready jobs one group at a time until none are left (one-off drains,
+        tests). Returns the number of jobs run.
+        """
+        count = 0
+        while True:
+            async with self.session_factory() as session:
+                group = await claim(session, list(self.handlers), key=key)
+            if not group:
+                return count
+            await self._execute(group)
+            count += len(group)
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                async with self.session_factory() as session:
+                    group = await claim(session, list(self.handlers))
+            except Exception as e:
+                print(f"Job Claim Failed: {e}")
+                group = []
+            if not group:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(group)
+
+    async def _execute(self, group: List[Job]):
+        kind = group[0].kind
+        try:
+            await self.handlers[kind](group)
+        except asyncio.CancelledError:
+            # Drain timed out: give the jobs back rather than waiting for the lock timeout
+            async with self.session_factory() as session:
+                await asyncio.shield(release(session, group))
+            raise
+        except RetryLater as e:
+            async with self.session_factory() as session:
+                await defer(session, group, e.delay, str(e))
+        except Exception as e:
+            print(f"Job Failed ({kind}, ids={[job.id for job in group]}): {e}")
+            async with self.session_factory() as session:
+                await fail(session, group, f"{type(e).__name__}: {e}")
+        else:
+            async with self.session_factory() as session:
+                await complete(session, group)
+            metrics.incr("jobs_completed_total", len(group), kind=kind)
@@ -2,21 +2,35 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 from dotenv import load_dotenv
 
+from app.core.config import LLM_PROVIDER, LLM_TIMEOUT_SECONDS
+from app.services.circuit_breaker import llm_breaker
+from app.services.fake_llm import FakeChatModel
+from app.services.llm_scheduler import ScheduledLLM, scheduler
+
 load_dotenv()
 
 class LLMFactory:
     @staticmethod
-    def create_llm(model_name: str = "gemini-2.0-flash", temperature: float = 0.0):
+    def create_llm(model_name: str = "gemini-2.0-flash", temperature: float = 0.0, purpose: str = "chat",
+                   timeout: float = LLM_TIMEOUT_SECONDS):
         """
-        Creates a Gemini Chat Model instance.
+        Creates the chat model for LLM_PROVIDER: Gemini, or the offline fake (no API key needed).
+        Calls go through the shared LLM scheduler; `purpose` (risk, chat, memory) sets their priority.
+        They share one circuit breaker and time out after `timeout` seconds (raising LLMUnavailable).
         """
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables.")
-            
-        return ChatGoogleGenerativeAI(
-            model=model_name,
-            temperature=temperature,
-            google_api_key=api_key,
-            convert_system_message_to_human=True # Sometimes needed for certain frameworks, mainly harmless
-        )
+        if LLM_PROVIDER == "fake":
+            llm = FakeChatModel.from_config(purpose)
+        elif LLM_PROVIDER == "gemini":
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
+            llm = ChatGoogleGenerativeAI(
+                model=model_name,
+                temperature=temperature,
+                google_api_key=api_key,
+                convert_system_message_to_human=True # Sometimes needed for certain frameworks, mainly harmless
+            )
+        else:
+            raise ValueError(f"Unknown LLM_PROVIDER {LLM_PROVIDER!r}; expected 'gemini' or 'fake'.")
+        return ScheduledLLM(llm, scheduler, purpose, breaker=llm_breaker, timeout=timeout)
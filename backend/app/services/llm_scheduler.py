@@ -0,0 +1,317 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.core.config import (
+    LLM_BURST, LLM_MAX_CONCURRENCY, LLM_MIN_CONCURRENCY, LLM_PRIORITY_RESERVE, LLM_REQUESTS_PER_MINUTE,
+    LLM_TIMEOUT_SECONDS,
+)
+from app.core.metrics import metrics
+from app.core.tracing import add_span
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+# Lower runs first: safety triage, then the reply the patient is waiting for, then background work
+PRIORITIES = {"risk": 0, "chat": 1, "memory": 2}
+
+class LLMUnavailable(Exception):
+    """
+    The provider could not answer: call failed, timed out, or was refused by the open circuit.
+    `retry_after` > 0 means the circuit is open and no call will be attempted before then.
+    """
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def is_throttled(error: BaseException) -> bool:
+    """Quota / rate-limit errors from the provider (HTTP 429, gRPC RESOURCE_EXHAUSTED)."""
+    text = f"{type(error).__name__} {error}"
+    return any(marker in text for marker in ("429", "ResourceExhausted", "RESOURCE_EXHAUSTED", "Too Many Requests"))
+
+# Provider failures that say nothing about the request itself: 5xx, dropped connections, deadlines
+TRANSIENT_MARKERS = (
+    "500", "502", "503", "504", "Internal Server Error", "Bad Gateway", "Service Unavailable", "Gateway Timeout",
+    "InternalServerError", "ServiceUnavailable", "DeadlineExceeded", "DEADLINE_EXCEEDED", "UNAVAILABLE",
+    "Timeout", "Connect", "Connection",
+)
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Timeouts, throttling (429), provider 5xx and connection errors: the provider is struggling,
+    not the request. Anything else (bad input, auth, parsing) would fail the same way on retry.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)) or is_throttled(error):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status >= 500
+    text = f"{type(error).__name__} {error}"
+    return any(marker in text for marker in TRANSIENT_MARKERS)
+
+def call_outcome(error: BaseException) -> str:
+    """Metric label for a failed LLM call."""
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    return "throttled" if is_throttled(error) else "error"
+
+class LLMScheduler:
+    """
+    Per-process gate in front of every LLM call.
+    - Priority queue: when calls have to wait, the highest-priority class goes first.
+    - Token bucket: at most `requests_per_minute` call starts (bursts up to `burst`).
+    - Adaptive concurrency (AIMD): the in-flight limit halves when the provider throttles
+      and grows back by one after `limit` successful calls.
+    - The last `reserve` slots are kept for risk classification.
+    Queue depth per class, in-flight calls and the current limit are exported as gauges.
+    """
+    def __init__(self, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE, burst: int = LLM_BURST,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, min_concurrency: int = LLM_MIN_CONCURRENCY,
+                 reserve: int = LLM_PRIORITY_RESERVE):
+        self.rate = requests_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.reserve = reserve
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publish()
+
+    def queue_depth(self, purpose: Optional[str] = None) -> int:
+        return sum(1 for _, _, p, fut in self._waiters if not fut.done() and (purpose is None or p == purpose))
+
+    def _bind_loop(self):
+        # Futures and timers belong to one event loop; start clean on a new one
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiters = []
+            self._timer = None
+            self.in_flight = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _has_slot(self, purpose: str) -> bool:
+        limit = int(self.limit)
+        if PRIORITIES[purpose] > 0:
+            limit -= min(self.reserve, limit - 1)
+        return self.in_flight < limit
+
+    def _has_token(self) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        return self._tokens >= 1
+
+    def _start(self):
+        self.in_flight += 1
+        if self.rate > 0:
+            self._tokens -= 1
+
+    def _dispatch(self):
+        self._timer = None
+        while self._waiters:
+            _, _, purpose, fut = self._waiters[0]
+            if fut.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if not self._has_slot(purpose):
+                break
+            if not self._has_token():
+                # Wake up when the next token is due
+                delay = (1 - self._tokens) / self.rate
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                break
+            heapq.heappop(self._waiters)
+            self._start()
+            fut.set_result(None)
+        self._publish()
+
+    async def acquire(self, purpose: str):
+        self._bind_loop()
+        if not self.queue_depth() and self._has_slot(purpose) and self._has_token():
+            self._start()
+            self._publish()
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES[purpose], next(self._seq), purpose, fut))
+        metrics.incr("llm_queued_total", purpose=purpose)
+        if self._timer is None:
+            self._dispatch()
+        waited_from = time.perf_counter()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Granted just as the caller gave up
+                self.release()
+            else:
+                self._publish()
+            raise
+        finally:
+            waited = time.perf_counter() - waited_from
+            metrics.incr("llm_queue_wait_seconds_total", waited, purpose=purpose)
+            add_span(f"llm_queue.{purpose}", waited)
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        if self._timer is None:
+            self._dispatch()
+        else:
+            self._publish()
+
+    def on_success(self):
+        if self.limit < self.max_concurrency:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def on_throttled(self):
+        self.limit = max(self.min_concurrency, self.limit / 2)
+        metrics.incr("llm_throttled_total")
+
+    def _publish(self):
+        for purpose in PRIORITIES:
+            metrics.set("llm_queue_depth", self.queue_depth(purpose), purpose=purpose)
+        metrics.set("llm_in_flight", self.in_flight)
+        metrics.set("llm_concurrency_limit", int(self.limit))
+
+    @asynccontextmanager
+    async def slot(self, purpose: str):
+        """Hold one scheduled slot for the duration of an LLM call (or stream)."""
+        await self.acquire(purpose)
+        try:
+            yield
+        except Exception as e:
+            if is_throttled(e):
+                self.on_throttled()
+            raise
+        else:
+            self.on_success()
+        finally:
+            self.release()
+
+class ScheduledLLM(Runnable):
+    """
+    Chat model wrapper that runs every call through the scheduler; composes like the model itself.
+    With a circuit breaker, calls time out after `timeout` seconds (streams: per chunk) and
+    transient provider failures (is_transient) are raised as LLMUnavailable and counted against
+    the breaker, so callers can tell them apart from bad output; other errors propagate unchanged.
+    Every call is recorded as llm_calls_total / llm_call_seconds{purpose,outcome} (provider time,
+    excluding the scheduler queue) and llm_tokens_total{purpose,kind} where the provider reports usage.
+    """
+    def __init__(self, llm: Runnable, scheduler: LLMScheduler, purpose: str,
+                 breaker: Optional[CircuitBreaker] = None, timeout: float = LLM_TIMEOUT_SECONDS):
+        if purpose not in PRIORITIES:
+            raise ValueError(f"Unknown LLM purpose {purpose!r}; expected one of {', '.join(PRIORITIES)}")
+        self.llm = llm
+        self.scheduler = scheduler
+        self.purpose = purpose
+        self.breaker = breaker
+        self.timeout = timeout
+
+    def _before_call(self):
+        if self.breaker is None:
+            return
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            metrics.incr("llm_calls_total", purpose=self.purpose, outcome="rejected")
+            raise LLMUnavailable(str(e), retry_after=e.retry_after) from e
+
+    def _unavailable(self, error: Exception) -> Optional[LLMUnavailable]:
+        """
+        LLMUnavailable for a transient provider failure, counted against the breaker; None for
+        anything else (the caller re-raises it unchanged and the circuit is not charged for it).
+        """
+        if self.breaker is None or not is_transient(error):
+            return None
+        self.breaker.record_failure()
+        if isinstance(error, asyncio.TimeoutError):
+            return LLMUnavailable(f"LLM call timed out after {self.timeout:.0f}s")
+        return LLMUnavailable(f"{type(error).__name__}: {error}")
+
+    def _record(self, started: float, outcome: str, usage: Optional[dict] = None):
+        seconds = time.perf_counter() - started
+        metrics.incr("llm_calls_total", purpose=self.purpose, outcome=outcome)
+        metrics.observe("llm_call_seconds", seconds, purpose=self.purpose, outcome=outcome)
+        add_span(f"llm.{self.purpose}", seconds)
+        for kind in ("input", "output"):
+            if usage and usage.get(f"{kind}_tokens"):
+                metrics.incr("llm_tokens_total", usage[f"{kind}_tokens"], purpose=self.purpose, kind=kind)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        # Synchronous calls are not scheduled (the app only uses the async API)
+        return self.llm.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        self._before_call()
+        try:
+            async with self.scheduler.slot(self.purpose):
+                started = time.perf_counter()
+                try:
+                    if self.breaker is None:
+                        result = await self.llm.ainvoke(input, config, **kwargs)
+                    else:
+                        result = await asyncio.wait_for(self.llm.ainvoke(input, config, **kwargs), self.timeout)
+                except BaseException as e:
+                    self._record(started, call_outcome(e))
+                    raise
+                self._record(started, "ok", getattr(result, "usage_metadata", None))
+        except Exception as e:
+            unavailable = self._unavailable(e)
+            if unavailable is None:
+                raise
+            raise unavailable from e
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return result
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        self._before_call()
+        try:
+            async with self.scheduler.slot(self.purpose):
+                started = time.perf_counter()
+                usage = {"input_tokens": 0, "output_tokens": 0}
+                try:
+                    stream = self.llm.astream(input, config, **kwargs).__aiter__()
+                    while True:
+                        try:
+                            if self.breaker is None:
+                                chunk = await stream.__anext__()
+                            else:
+                                chunk = await asyncio.wait_for(stream.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        # Providers report usage on (some) chunks as deltas
+                        for kind, count in (getattr(chunk, "usage_metadata", None) or {}).items():
+                            if kind in usage:
+                                usage[kind] += count
+                        yield chunk
+                except BaseException as e:
+                    self._record(started, "cancelled" if isinstance(e, GeneratorExit) else call_outcome(e), usage)
+                    raise
+                self._record(started, "ok", usage)
+        except Exception as e:
+            unavailable = self._unavailable(e)
+            if unavailable is None:
+                raise
+            raise unavailable from e
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+scheduler = LLMScheduler()
@@ -1,17 +1,36 @@
+import asyncio
+import random
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.db.models import PatientProfile
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from app.db.models import PatientProfile, User
+from app.core.events import publish, clinic_topic
+from app.core.metrics import metrics
+from app.services.context import ContextMessage, ConversationContext
+from app.services.facts import get_profile, record_changes, upsert_facts
 from app.services.llm_factory import LLMFactory
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 from datetime import datetime
 
+class PendingMessage(NamedTuple):
+    """A saved patient message awaiting extraction (content is the redacted text)"""
+    message_id: int
+    content: str
+
+# Conflicting concurrent writes retried before giving up (the job is then retried)
+PROFILE_UPDATE_ATTEMPTS = 10
+# Upper bound of the random pause before a retry, per attempt so far
+PROFILE_RETRY_JITTER_SECONDS = 0.02
+
 class ExtractedItem(BaseModel):
     value: str
     category: str = Field(description="Must be 'medication', 'symptom', 'allergy', or 'chief_complaint'")
     status: str = Field(description="active, past, stopped, or unknown")
+    source_message_id: Optional[int] = Field(None, description="The bracketed id of the message this fact comes from")
 
 class ExtractionResult(BaseModel):
     items: List[ExtractedItem]
@@ -21,7 +40,7 @@ class MemoryService:
     Service to extract medical facts from messages using Gemini.
     """
     def __init__(self):
-        self.llm = LLMFactory.create_llm(temperature=0.0) 
+        self.llm = LLMFactory.create_llm(temperature=0.0, purpose="memory") 
         self.parser = JsonOutputParser(pydantic_object=ExtractionResult)
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", "You are a medical scribe that extracts structured medical facts.\n"
@@ -35,117 +54,92 @@ class MemoryService:
                        "4. If a patient says they are taking a med, status is 'active'.\n"
                        "5. If a symptom is resolved, set status to 'resolved'.\n"
                        "6. Chief Complaint: Identify the PRIMARY reason the patient is seeking help (e.g., 'Headache', 'Chest Pain') and extract it as 'chief_complaint'.\n"
+                       "7. Messages are in chronological order, each prefixed with its id in brackets (e.g. '[42] ...'). Set 'source_message_id' to the id of the message each fact comes from; if later messages change a fact, output it once with the final status and the later message's id.\n"
                        "Output JSON matching the schema.\n"
                        "{format_instructions}"),
             ("user", "{message}")
         ])
+        self.format_instructions = self.parser.get_format_instructions()
         self.chain = self.prompt | self.llm | self.parser
 
-    async def extract_and_update_memory(self, session: AsyncSession, patient_id: int, message_content: str, message_id: int):
+    async def extract_and_update_memory(self, session: AsyncSession, patient_id: int, messages: List[PendingMessage]):
         """
-        Extracts entities and updates PatientProfile with proper mutation handling.
+        Extracts entities from one or more consecutive patient messages (one LLM call)
+        and updates PatientProfile with proper mutation handling.
+        Each fact's provenance_pointer is the message it came from.
+        Errors propagate: the memory.extract job is retried by the worker.
         """
-        try:
-            # 1. Fetch Profile First
-            stmt = select(PatientProfile).where(PatientProfile.patient_id == patient_id)
-            db_result = await session.execute(stmt)
-            profile = db_result.scalars().first()
-            
-            if not profile:
-                profile = PatientProfile(patient_id=patient_id)
-                session.add(profile)
-            
-            # Prepare Context
-            current_meds = ", ".join([m['value'] for m in profile.medications]) if profile.medications else "None"
-            current_syms = ", ".join([s['value'] for s in profile.symptoms]) if profile.symptoms else "None"
-            profile_context = f"Current Medications: {current_meds}\nCurrent Symptoms: {current_syms}"
+        if not messages:
+            return
+        message_ids = {m.message_id for m in messages}
+        latest_id = messages[-1].message_id
 
-            # 2. Invoke LLM with Context
-            result = await self.chain.ainvoke({
-                "message": message_content,
-                "profile_context": profile_context,
-                "format_instructions": self.parser.get_format_instructions()
-            })
-            
-            items = result.get("items", [])
-            if not items:
-                return
-            
-            # Mutation Helper
-            import copy
-            def upsert_items(current_list, new_items):
-                # FORCE DEEP COPY
-                current = copy.deepcopy(list(current_list)) if current_list else []
-                utc_now = datetime.utcnow().isoformat()
-                
-                for item in new_items:
-                    # Find existing item (Case-insensitive match)
-                    found = False
-                    for existing in current:
-                        if existing.get('value', '').lower() == item['value'].lower():
-                            # Update existing (Mutation)
-                            # Handle Negations/Corrections
-                            # if item['status'] == 'incorrect':
-                            #     # PREVIOUSLY: Remove the item if it was added by mistake or denied
-                            #     # NEW: Retain it but mark as incorrect
-                            #     pass 
-                            
-                            # Update Status and timestamps
-                            existing['status'] = item['status']
-                            existing['provenance_pointer'] = message_id
-                            existing['updated_at'] = utc_now
-                            
-                            if item['status'] == 'stopped':
-                                # Add stop timestamp if stopping
-                                existing['stopped_at'] = utc_now
-                            elif item['status'] == 'active' and 'stopped_at' in existing:
-                                # If restarting, clear stopped_at
-                                del existing['stopped_at']
-                            elif item['status'] == 'incorrect' and 'stopped_at' in existing:
-                                # If marking as incorrect, maybe clear stopped_at? Or keep it?
-                                # Let's keep it simple: just update validation fields
-                                pass
+        # 1. Fetch Profile First
+        profile = await self._load_profile(session, patient_id)
+        
+        # Prepare Context
+        context = ConversationContext(
+            [ContextMessage(m.message_id, "patient", m.content) for m in messages],
+            profile=await get_profile(session, patient_id),
+        )
 
-                            found = True
-                            break
-                    
-                    if not found:
-                        # Append new (even if incorrect/refuted, we store it as a record of denial)
-                        new_record = {
-                            "value": item['value'],
-                            "status": item['status'],
-                            "provenance_pointer": message_id,
-                            "updated_at": utc_now
-                        }
-                        if item['status'] == 'stopped':
-                            new_record['stopped_at'] = utc_now
-                            
-                        current.append(new_record)
-                
-                return current
+        # 2. Invoke LLM with Context
+        result = await self.chain.ainvoke({
+            "message": context.transcript,
+            "profile_context": context.profile_context,
+            "format_instructions": self.format_instructions
+        })
+        
+        items = result.get("items", [])
+        if not items:
+            return
+        for item in items:
+            # Unknown or missing ids (model slip) fall back to the newest message in the batch
+            if item.get("source_message_id") not in message_ids:
+                item["source_message_id"] = latest_id
+        # Oldest first, so a later message's status for the same fact wins
+        items.sort(key=lambda i: i["source_message_id"])
+        
+        # 3. Write. The LLM call above can take seconds, so another extraction may have
+        # committed in the meantime: the version check turns that into a conflict, and the
+        # same extracted items are reapplied to the fresh profile (no second LLM call).
+        # Fact upserts are idempotent, so reapplying them is safe.
+        clinic_result = await session.execute(select(User.clinic_id).where(User.id == patient_id))
+        clinic_id = clinic_result.scalar()
+        for attempt in range(PROFILE_UPDATE_ATTEMPTS):
+            try:
+                await self._apply_items(session, profile, items)
+                # Notify clinician feeds (delivered on commit)
+                await publish(session, clinic_topic(clinic_id), "profile.updated", patient_id=patient_id)
+                await session.commit()
+                return
+            except (StaleDataError, IntegrityError):
+                # StaleDataError: updated since we read it; IntegrityError: created since we read it
+                await session.rollback()
+                metrics.incr("profile_update_conflicts_total")
+                if attempt == PROFILE_UPDATE_ATTEMPTS - 1:
+                    raise
+                # Writers that collided once tend to collide again; spread them out
+                await asyncio.sleep(random.uniform(0, PROFILE_RETRY_JITTER_SECONDS * (attempt + 1)))
+                profile = await self._load_profile(session, patient_id)
 
-            # Split by category and apply upsert
-            new_meds = [i for i in items if i['category'] == 'medication']
-            new_symptoms = [i for i in items if i['category'] == 'symptom']
-            new_allergies = [i for i in items if i['category'] == 'allergy']
-            new_cc = [i for i in items if i['category'] == 'chief_complaint']
+    async def _load_profile(self, session: AsyncSession, patient_id: int) -> PatientProfile:
+        stmt = (select(PatientProfile).where(PatientProfile.patient_id == patient_id)
+                .execution_options(populate_existing=True))
+        # A new profile is only added to the session when it is written
+        return (await session.execute(stmt)).scalars().first() or PatientProfile(patient_id=patient_id)
 
-            if new_meds:
-                profile.medications = upsert_items(profile.medications, new_meds)
-            if new_symptoms:
-                profile.symptoms = upsert_items(profile.symptoms, new_symptoms)
-            if new_allergies:
-                profile.allergies = upsert_items(profile.allergies, new_allergies)
-            if new_cc:
-                profile.chief_complaint = upsert_items(profile.chief_complaint, new_cc)
-            
-            profile.last_updated = datetime.utcnow()
-            
-            # Explicitly flag modified for SQLAlchemy JSON columns if needed, 
-            # though re-assignment usually handles it.
-            
-            await session.commit()
-            
-        except Exception as e:
-            print(f"Memory Extraction Failed: {e}")
-            # Non-critical 
+    @staticmethod
+    async def _apply_items(session: AsyncSession, profile: PatientProfile, items: List[dict]):
+        """
+        Bump the profile's version, upsert the extracted items (oldest first) as fact rows
+        and log what changed under the new version.
+        The versioned UPDATE comes first: a stale writer fails before touching any fact, and the
+        profile row lock it takes orders concurrent writers (no deadlocks between fact rows).
+        """
+        now = datetime.utcnow()
+        profile.last_updated = now
+        session.add(profile)
+        await session.flush()
+        written = await upsert_facts(session, profile.patient_id, items, now)
+        await record_changes(session, profile, written, now)
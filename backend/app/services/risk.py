@@ -1,7 +1,12 @@
 from app.schemas import RiskAnalysisResult, RiskLevel
-from app.db.models import Message
-from typing import List
+import time
+from app.services.context import ConversationContext
 from app.services.llm_factory import LLMFactory
+from app.services.llm_scheduler import LLMUnavailable
+from app.services.risk_rules import RiskRuleClassifier
+from app.services.risk_cache import build_risk_cache, cache_key
+from app.core.metrics import metrics
+from app.core.config import RISK_LLM_TIMEOUT_SECONDS
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
@@ -11,7 +16,7 @@ class RiskAnalysisService:
     Service to analyze the risk of a user message using Gemini.
     """
     def __init__(self):
-        self.llm = LLMFactory.create_llm(temperature=0.0) # Low temp for deterministic classification
+        self.llm = LLMFactory.create_llm(temperature=0.0, purpose="risk", timeout=RISK_LLM_TIMEOUT_SECONDS) # Low temp for deterministic classification
         
         # Define Parser
         self.parser = JsonOutputParser(pydantic_object=RiskAnalysisResult)
@@ -29,31 +34,63 @@ class RiskAnalysisService:
             ("user", "History: {history}\n\nNew Message: {message}")
         ])
         
+        self.format_instructions = self.parser.get_format_instructions()
         self.chain = self.prompt | self.llm | self.parser
+        self.cache = build_risk_cache()
+        self.rules = RiskRuleClassifier()
     
-    async def analyze_risk(self, history: List[Message], new_message_content: str) -> RiskAnalysisResult:
+    async def analyze_risk(self, context: ConversationContext, fallback_to_rules: bool = True) -> RiskAnalysisResult:
         """
-        Analyzes the risk of the new message given the conversation history.
+        Analyzes the risk of the context's message given the conversation history before it.
+        If the LLM is unavailable (down, timing out, circuit open) the rule classifier decides
+        instead; when it finds no emergency, LLMUnavailable is raised so the caller can hold the
+        message for re-triage rather than escalate it. Unusable LLM output still fails safe to HIGH.
+        `fallback_to_rules=False` raises LLMUnavailable even on a rule match, for callers that
+        only want the LLM's opinion (the rules have already decided).
         """
-        # Format history string
-        history_str = "\n".join([f"{msg.sender_type}: {msg.content}" for msg in history[-5:]])
-        
+        key = None
+        if self.cache:
+            key = cache_key(context.message, context.risk_history)
+            cached = await self.cache.get(key)
+            if cached:
+                result, llm_seconds = cached
+                metrics.incr("risk_cache_total", result="hit")
+                metrics.incr("risk_cache_saved_seconds_total", llm_seconds)
+                return result
+            metrics.incr("risk_cache_total", result="miss")
+
         try:
+            started = time.perf_counter()
             result = await self.chain.ainvoke({
-                "history": history_str, 
-                "message": new_message_content,
-                "format_instructions": self.parser.get_format_instructions()
+                "history": context.risk_history,
+                "message": context.message,
+                "format_instructions": self.format_instructions
             })
             
             # Map string to Enum if needed, though Pydantic parser should handle it if prompt is good.
             # But let's be safe and validate via Pydantic model again.
-            return RiskAnalysisResult(**result)
+            analysis = RiskAnalysisResult(**result)
             
+        except LLMUnavailable as e:
+            # Degraded mode: escalating every message during an outage would bury real emergencies
+            print(f"Risk Analysis Failed: {e}")
+            if not fallback_to_rules:
+                raise
+            metrics.incr("risk_degraded_total")
+            rule_result = self.rules.classify(context.message)
+            if rule_result is None:
+                raise
+            return rule_result
         except Exception as e:
-            # Fallback for parsing errors or API errors
+            # Fallback for parsing errors
             print(f"Risk Analysis Failed: {e}")
             return RiskAnalysisResult(
                 risk_level=RiskLevel.HIGH, # Fail safe
                 reason="AI Analysis Failed. Defaulting to High Risk for safety.",
                 summary="System Error during triage."
             )
+
+        if self.cache:
+            # Only LOW results are kept (RiskCache.put), so escalations always re-evaluate
+            await self.cache.put(key, analysis, time.perf_counter() - started)
+        return analysis
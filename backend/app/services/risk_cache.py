@@ -0,0 +1,119 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import RISK_CACHE_BACKEND, RISK_CACHE_MAX_ENTRIES, RISK_CACHE_TTL_SECONDS
+from app.db.database import SessionLocal
+from app.db.models import RiskCacheEntry
+from app.schemas import RiskAnalysisResult, RiskLevel
+
+# A cached classification and how long the LLM took to produce it (reported as saved latency on hits)
+CachedRisk = Tuple[RiskAnalysisResult, float]
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize(text: str) -> str:
+    # Case, spacing and trailing full stops do not change a triage decision; '?' may
+    return _WHITESPACE.sub(" ", text).strip().rstrip(".! ").lower()
+
+def cache_key(message: str, history: str) -> str:
+    """Normalized redacted message plus a fingerprint of the history the prompt includes."""
+    return hashlib.sha256(f"{normalize(message)}\x1f{normalize(history)}".encode()).hexdigest()
+
+class LRUTTLCache:
+    """Bounded in-process LRU; entries also expire after ttl_seconds."""
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, CachedRisk]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CachedRisk]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: CachedRisk, ttl_seconds: Optional[float] = None):
+        self._entries[key] = (self.clock() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RiskCache:
+    """
+    Cache in front of RiskAnalysisService.analyze_risk. Only LOW results are stored, so
+    anything that could escalate is always re-evaluated by the LLM.
+    With shared=True the in-process LRU sits in front of the risk_cache table, so hits
+    carry across workers; table errors degrade to a miss, never to a failed analysis.
+    """
+    # Expired rows are deleted every this many shared writes
+    PRUNE_EVERY = 500
+
+    def __init__(self, max_entries: int = RISK_CACHE_MAX_ENTRIES, ttl_seconds: float = RISK_CACHE_TTL_SECONDS, shared: bool = False):
+        self.local = LRUTTLCache(max_entries, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._writes = 0
+
+    async def get(self, key: str) -> Optional[CachedRisk]:
+        value = self.local.get(key)
+        if value is not None or not self.shared:
+            return value
+        try:
+            async with SessionLocal() as session:
+                row = (await session.execute(
+                    select(RiskCacheEntry.result, RiskCacheEntry.llm_seconds, RiskCacheEntry.expires_at)
+                    .where(RiskCacheEntry.key == key, RiskCacheEntry.expires_at > datetime.utcnow())
+                )).first()
+        except Exception as e:
+            print(f"Risk Cache Read Failed: {e}")
+            return None
+        if row is None:
+            return None
+        result, llm_seconds, expires_at = row
+        value = (RiskAnalysisResult(**result), llm_seconds)
+        self.local.set(key, value, ttl_seconds=(expires_at - datetime.utcnow()).total_seconds())
+        return value
+
+    async def put(self, key: str, result: RiskAnalysisResult, llm_seconds: float):
+        if result.risk_level != RiskLevel.LOW:
+            return
+        self.local.set(key, (result, llm_seconds))
+        if not self.shared:
+            return
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+        stmt = insert(RiskCacheEntry).values(
+            key=key, result=result.model_dump(mode="json"), llm_seconds=llm_seconds, expires_at=expires_at,
+        )
+        try:
+            async with SessionLocal() as session:
+                await session.execute(stmt.on_conflict_do_update(
+                    index_elements=[RiskCacheEntry.key],
+                    set_={"result": stmt.excluded.result, "llm_seconds": stmt.excluded.llm_seconds, "expires_at": stmt.excluded.expires_at},
+                ))
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    await session.execute(delete(RiskCacheEntry).where(RiskCacheEntry.expires_at <= datetime.utcnow()))
+                await session.commit()
+        except Exception as e:
+            print(f"Risk Cache Write Failed: {e}")
+
+def build_risk_cache() -> Optional[RiskCache]:
+    if RISK_CACHE_BACKEND == "off":
+        return None
+    return RiskCache(shared=RISK_CACHE_BACKEND == "postgres")
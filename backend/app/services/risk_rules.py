@@ -0,0 +1,145 @@
+import re
+from typing import Optional, Tuple
+from app.schemas import RiskAnalysisResult, RiskLevel
+
+# Phrases that, stated by the patient about themselves and not negated, are emergencies
+# on their own. Deliberately narrow: anything else goes to the LLM, which still escalates.
+HIGH_RISK_PHRASES = {
+    "chest_pain": [
+        r"chest (?:pain|pains|tightness|pressure)",
+        r"(?:crushing|squeezing|heavy|tight) (?:pain|pressure|feeling) (?:in|on|across) (?:my |the )?chest",
+        r"pain in (?:my |the )?chest",
+        r"having a heart attack",
+    ],
+    "breathing": [
+        r"can(?:no|')?t breathe(?! (?:through|out of|with) (?:my|the|one) nos(?:e|tril))",
+        r"unable to breathe",
+        r"(?:severe |extreme )?difficulty breathing",
+        r"struggling to breathe",
+        r"gasping for (?:air|breath)",
+        r"(?:lips|face) (?:are |is )?(?:turning )?blue",
+    ],
+    "self_harm": [
+        r"suicidal",
+        r"(?:kill|killing|hurt|hurting|harm|harming) myself",
+        r"end(?:ing)? my (?:own )?life",
+        r"(?:want|wanting) to die(?! (?:laughing|of (?:laughter|embarrassment|boredom|shame)))",
+        r"(?:don'?t|do not) want to (?:live|be alive)",
+        r"took an overdose",
+        r"overdosed",
+    ],
+    "stroke": [
+        r"face (?:is )?(?:drooping|droopy)",
+        r"slurred speech",
+        r"slurring (?:my )?words",
+        r"(?:sudden )?(?:numbness|weakness) (?:on|in|down) one side",
+        r"can'?t (?:move|feel) (?:my )?(?:left|right) (?:arm|leg|side)",
+        r"having a stroke",
+    ],
+    "bleeding": [
+        r"(?:heavy|severe|uncontrollable|uncontrolled) bleeding",
+        r"bleeding (?:heavily|a lot|won'?t stop|that won'?t stop)",
+        r"(?:coughing|vomiting|throwing) up blood",
+        r"vomiting blood",
+    ],
+    "consciousness": [
+        r"passed out",
+        r"unconscious",
+        r"(?:is|are|went|gone|became|becoming) (?:completely |totally )?unresponsive(?! to)",
+        r"having a seizure",
+    ],
+    "anaphylaxis": [
+        r"throat (?:is )?(?:closing|swelling)",
+        r"tongue (?:is )?swelling",
+        r"anaphyla(?:xis|ctic)",
+    ],
+}
+
+# Clause boundaries: negation and hypothetical cues only apply within the clause of the match
+CLAUSE_BREAK = re.compile(r"[.,;:!?\n]|\bbut\b|\bhowever\b|\balthough\b")
+
+# NegEx-style cues in the few words before a match ("no chest pain", "I don't have ...")
+NEGATION = re.compile(r"\b(?:no|not|never|without|denies|denied|deny|none|negative for|free of|\w+n't)\b")
+NEGATION_WINDOW_WORDS = 5
+
+# The patient is asking about, or reporting someone else's / a past / a second-hand symptom
+# (read online, a lab report): leave it to the LLM. Only first-person, present-tense reports fast-path.
+# "had" is past only on its own ("I had chest pain"), not in "I've had chest pain for an hour".
+HYPOTHETICAL_BEFORE = re.compile(
+    r"\b(?:if|whether|in case|what if|signs? of|symptoms? of|risk of|history of|worried about|"
+    r"afraid of|scared of|side effects?|(?<!'ve )(?<!have )(?<!has )had|used to|asked (?:me )?about|"
+    r"i was|(?:worried|afraid|scared|thought|convinced) (?:that )?i|(?:read|heard|learned|searched|watched) (?:about|up|that|online)|"
+    r"(?:said|says|showed|shows|report(?:ed|s)?|results?)|"
+    r"(?:my|his|her|our|their) (?:mom|mum|mother|dad|father|husband|wife|son|daughter|child|kid|baby|friend|"
+    r"brother|sister|grand\w+|partner|neighbou?r|colleague|aunt|uncle|cousin))\b"
+)
+HYPOTHETICAL_AFTER = re.compile(r"\b(?:(?:weeks?|months?|years?) ago|last (?:week|month|year)|(?<!since )yesterday|in the past|went away|has gone|is gone|resolved|side effects?)\b")
+# Refills, appointments and paperwork name the symptom as a reason, not a report of it happening now
+ADMIN_REQUEST = re.compile(
+    r"\b(?:refills?|renew(?:al)?|prescriptions?|repeat (?:script|medication)|appointment|referral|"
+    r"(?:medication|medicine|meds|pills?|tablets?|spray|inhaler|nitro\w*) for)\b"
+)
+# Anywhere later in the message: the patient says they are well now ("..., feeling fine now")
+RESOLVED_AFTER = re.compile(r"\b(?:doing|feeling|i'?m|i am) (?:well|fine|better|ok(?:ay)?|good|alright) now\b|\ball better now\b")
+# Questions without a question mark ("is chest pain normal after ..."); not "can't breathe"
+QUESTION_START = re.compile(r"^\s*(?:is|are|was|can|could|does|do|did|what|how|why|when|should|would|will)\b(?!')")
+
+class RiskRuleClassifier:
+    """
+    Deterministic pre-classifier that runs before the LLM on the redacted message.
+    All phrases are compiled into one alternation scanned once; a hit only counts if it is
+    not negated, not hypothetical, past, second-hand or resolved, not an admin request, and not
+    phrased as a question. It never lowers risk:
+    no match means "ask the LLM", not LOW.
+    """
+    def __init__(self, phrases=HIGH_RISK_PHRASES):
+        alternatives = "|".join(
+            f"(?P<{rule}>{'|'.join(patterns)})" for rule, patterns in phrases.items()
+        )
+        self.regex = re.compile(rf"\b(?:{alternatives})\b")
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return text.lower().replace("’", "'")
+
+    def _clause(self, text: str, start: int, end: int) -> Tuple[str, str, str]:
+        """Text of the match's clause before and after it, and the character closing the clause."""
+        clause_start = 0
+        for brk in CLAUSE_BREAK.finditer(text, 0, start):
+            clause_start = brk.end()
+        brk = CLAUSE_BREAK.search(text, end)
+        clause_end = brk.start() if brk else len(text)
+        closer = brk.group() if brk else ""
+        return text[clause_start:start], text[end:clause_end], closer
+
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """First affirmed HIGH-risk phrase as (rule, phrase), or None."""
+        if not text:
+            return None
+        text = self._normalize(text)
+        for m in self.regex.finditer(text):
+            before, after, closer = self._clause(text, m.start(), m.end())
+            if closer == "?" or QUESTION_START.search(before):
+                continue
+            window = " ".join(before.split()[-NEGATION_WINDOW_WORDS:])
+            if NEGATION.search(window):
+                continue
+            if HYPOTHETICAL_BEFORE.search(before) or HYPOTHETICAL_AFTER.search(after):
+                continue
+            if ADMIN_REQUEST.search(before) or ADMIN_REQUEST.search(after):
+                continue
+            if RESOLVED_AFTER.search(text, m.end()):
+                continue
+            return m.lastgroup, m.group()
+        return None
+
+    def classify(self, text: str) -> Optional[RiskAnalysisResult]:
+        hit = self.match(text)
+        if hit is None:
+            return None
+        rule, phrase = hit
+        return RiskAnalysisResult(
+            risk_level=RiskLevel.HIGH,
+            reason=f"Rule pre-classifier: {rule.replace('_', ' ')} ('{phrase}')",
+            summary=f"- Patient reported '{phrase}' ({rule.replace('_', ' ')}).\n- Escalated immediately by rule; AI triage summary pending.",
+        )
@@ -0,0 +1,75 @@
+"""
+Background job worker: `python -m app.worker [--concurrency N]`.
+
+Runs the durable jobs queued by the API (app/services/jobs.py) in its own process, so
+LLM-heavy background work neither shares the API's event loop nor dies with an API
+restart. Any number of worker processes can run side by side. SIGTERM/SIGINT stop
+claiming new jobs and let in-flight ones finish (JOB_DRAIN_SECONDS).
+"""
+import argparse
+import asyncio
+import signal
+from functools import wraps
+from typing import List
+
+from sqlalchemy import select
+
+from app.core.config import JOB_WORKER_CONCURRENCY
+from app.db.database import SessionLocal, engine
+from app.db.migrations import check_schema_version
+from app.db.models import Job, Message
+from app.api.v1.endpoints.chat import retriage_messages
+from app.services.jobs import MEMORY_EXTRACT, RISK_RETRIAGE, Handler, JobWorker, RetryLater
+from app.services.llm_scheduler import LLMUnavailable
+from app.services.memory import MemoryService, PendingMessage
+
+memory_service = MemoryService()
+
+# Shortest deferral while the LLM circuit is open (it can report 0s left just before its probe)
+MIN_DEFER_SECONDS = 1.0
+
+def defer_while_circuit_open(handler: Handler) -> Handler:
+    """LLM jobs wait out an open circuit instead of burning their attempts during an outage."""
+    @wraps(handler)
+    async def run(jobs: List[Job]):
+        try:
+            await handler(jobs)
+        except LLMUnavailable as e:
+            if e.retry_after <= 0:
+                raise
+            raise RetryLater(str(e), max(e.retry_after, MIN_DEFER_SECONDS)) from e
+    return run
+
+@defer_while_circuit_open
+async def extract_memory(jobs: List[Job]):
+    """One extraction for all of a patient's coalesced messages."""
+    patient_id = jobs[0].payload["patient_id"]
+    message_ids = [job.payload["message_id"] for job in jobs]
+    async with SessionLocal() as session:
+        rows = (await session.execute(
+            select(Message.id, Message.content_redacted).where(Message.id.in_(message_ids)).order_by(Message.id)
+        )).all()
+        messages = [PendingMessage(message_id, content or "") for message_id, content in rows]
+        await memory_service.extract_and_update_memory(session, patient_id, messages)
+
+HANDLERS = {
+    MEMORY_EXTRACT: extract_memory,
+    RISK_RETRIAGE: defer_while_circuit_open(retriage_messages),
+}
+
+async def main(concurrency: int):
+    await check_schema_version(engine)
+    worker = JobWorker(HANDLERS, concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    print(f"Job worker started ({concurrency} concurrent jobs: {', '.join(HANDLERS)})")
+    await worker.run()
+    await engine.dispose()
+    print("Job worker stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
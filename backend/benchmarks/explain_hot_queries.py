@@ -0,0 +1,138 @@
+"""
+Query plans for the hot-path queries, with and without their migration-managed indexes.
+
+Everything runs inside one transaction that is rolled back: synthetic rows are
+inserted, tables are ANALYZEd, plans are captured with the indexes, the indexes
+are dropped (DDL is transactional in Postgres), plans are captured again.
+Nothing is left behind.
+
+Usage (from backend/, against a migrated database):
+    python -m benchmarks.explain_hot_queries --patients 2000 --messages-per-patient 50
+"""
+import argparse
+import asyncio
+import re
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.database import ASYNC_DATABASE_URL
+
+HOT_INDEXES = [
+    "ix_messages_conversation_id_timestamp",
+    "ix_conversations_user_id",
+    "ix_escalations_status_conversation_id",
+    "ix_patient_profiles_patient_id",
+    "ix_users_role_clinic_id",
+    "ix_patient_facts_lookup",
+]
+
+QUERIES = {
+    "chat history (last 5)": """
+        SELECT * FROM messages WHERE conversation_id = :conversation_id
+        ORDER BY timestamp DESC LIMIT 5
+    """,
+    "conversations for patient": """
+        SELECT * FROM conversations WHERE user_id = :patient_id
+    """,
+    "pending escalations for conversation": """
+        SELECT * FROM escalations WHERE status = 'pending' AND conversation_id = :conversation_id
+    """,
+    "patient profile": """
+        SELECT * FROM patient_profiles WHERE patient_id = :patient_id
+    """,
+    "patient facts": """
+        SELECT * FROM patient_facts WHERE patient_id = :patient_id ORDER BY id
+    """,
+    "patients active on a medication": """
+        SELECT * FROM patient_facts
+        WHERE category = 'medication' AND normalized_value = 'warfarin' AND status = 'active'
+    """,
+    "clinic patients": """
+        SELECT id, email FROM users WHERE role = 'patient' AND clinic_id = 'bench-clinic-7'
+    """,
+}
+
+SEED = """
+WITH new_users AS (
+    INSERT INTO users (email, hashed_password, role, is_active, clinic_id)
+    SELECT 'bench-' || g || '@example.com', 'x', 'patient', true, 'bench-clinic-' || (g % 20)
+    FROM generate_series(1, :patients) g
+    RETURNING id
+), new_conversations AS (
+    INSERT INTO conversations (user_id, created_at)
+    SELECT id, now() FROM new_users
+    RETURNING id, user_id
+), new_messages AS (
+    INSERT INTO messages (conversation_id, sender_type, content, content_redacted, risk_level, timestamp)
+    SELECT c.id, CASE WHEN g % 2 = 0 THEN 'patient' ELSE 'ai' END, 'bench', 'bench', 'LOW',
+           now() - (g || ' minutes')::interval
+    FROM new_conversations c, generate_series(1, :messages) g
+    RETURNING id, conversation_id
+), new_profiles AS (
+    INSERT INTO patient_profiles (patient_id, last_updated)
+    SELECT user_id, now() FROM new_conversations
+), new_facts AS (
+    INSERT INTO patient_facts (patient_id, category, value, normalized_value, status, created_at, updated_at)
+    SELECT user_id, 'medication', m, lower(m), CASE WHEN user_id % 3 = 0 THEN 'stopped' ELSE 'active' END, now(), now()
+    FROM new_conversations,
+         LATERAL (VALUES ('Ibuprofen'), ('Metformin'), (CASE WHEN user_id % 50 = 0 THEN 'Warfarin' ELSE 'Lisinopril' END)) meds(m)
+)
+INSERT INTO escalations (conversation_id, trigger_message_id, status, triage_summary)
+SELECT conversation_id, min(id), CASE WHEN conversation_id % 10 = 0 THEN 'pending' ELSE 'resolved' END, 'bench'
+FROM new_messages GROUP BY conversation_id
+"""
+
+async def explain_all(conn, params):
+    plans = {}
+    for name, sql in QUERIES.items():
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) {sql}"), params)
+        plans[name] = [row[0] for row in result]
+    return plans
+
+def summarize(plan_lines):
+    top = plan_lines[0].strip()
+    exec_time = next((l for l in plan_lines if l.strip().startswith("Execution Time")), "")
+    scans = sorted(set(re.findall(r"(Seq Scan|Index Scan|Index Only Scan|Bitmap Heap Scan)", "\n".join(plan_lines))))
+    return top, ", ".join(scans), exec_time.strip()
+
+async def main(patients: int, messages: int, verbose: bool):
+    engine = create_async_engine(ASYNC_DATABASE_URL)
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            await conn.execute(text(SEED), {"patients": patients, "messages": messages})
+            for table in ("users", "conversations", "messages", "escalations", "patient_profiles", "patient_facts"):
+                await conn.execute(text(f"ANALYZE {table}"))
+
+            sample = (await conn.execute(text(
+                "SELECT c.id, c.user_id FROM conversations c JOIN users u ON u.id = c.user_id "
+                "WHERE u.email LIKE 'bench-%' ORDER BY c.id DESC LIMIT 1"
+            ))).one()
+            params = {"conversation_id": sample[0], "patient_id": sample[1]}
+
+            after = await explain_all(conn, params)
+            for index in HOT_INDEXES:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            before = await explain_all(conn, params)
+        finally:
+            await trans.rollback()
+    await engine.dispose()
+
+    print(f"Synthetic data: {patients} patients x {messages} messages\n")
+    for name in QUERIES:
+        print(f"== {name}")
+        for label, plans in (("before (no hot-path indexes)", before), ("after", after)):
+            top, scans, exec_time = summarize(plans[name])
+            print(f"  {label:30} {scans:40} {exec_time}")
+            if verbose:
+                print("\n".join("      " + line for line in plans[name]))
+        print()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--messages-per-patient", type=int, default=50)
+    parser.add_argument("--verbose", action="store_true", help="Print full plans")
+    args = parser.parse_args()
+    asyncio.run(main(args.patients, args.messages_per_patient, args.verbose))
@@ -0,0 +1,306 @@
+"""
+End-to-end load test: patients chatting and polling their history, clinicians watching the
+dashboard and replying to escalations, at a target concurrency. Reports latency percentiles
+(p50/p95/p99) and throughput per endpoint.
+
+By default the app runs in-process with the offline fake LLM (LLM_PROVIDER=fake) and
+realistic per-purpose latencies, plus an in-process job worker, so the numbers measure our
+own pipeline (DB, locking, scheduling) rather than the network. With --base-url it drives
+a running server instead (start it with LLM_PROVIDER=fake for the same setup); seeding
+still goes to the local database. Seeded users and everything they created are deleted
+afterwards unless --keep-data is given.
+
+Regression gate: --json writes the results; --baseline compares p95 per endpoint against
+an earlier --json file and exits 1 if any got slower by more than --max-regression.
+
+Usage (from backend/, against a migrated database):
+    python -m benchmarks.load_test --concurrency 50 --duration 60
+    python -m benchmarks.load_test --duration 30 --json after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Per-purpose model latency (ms); see app/services/fake_llm.py for the spec format
+DEFAULT_FAKE_LATENCY = "risk=lognormal:600:0.35;chat=lognormal:1500:0.4;memory=lognormal:2000:0.5"
+# One message in ten escalates (MEDIUM); emergencies also come from the rule corpus below
+DEFAULT_RISK_SCRIPT = "LOW*9,MEDIUM"
+
+# Share of each virtual user's actions
+SCENARIO_WEIGHTS = {"chat": 45, "history": 30, "dashboard": 15, "reply": 10}
+
+PATIENT_MESSAGES = [
+    "I need a refill for my metformin.",
+    "Can I book an appointment for next week?",
+    "I take Ibuprofen for my knee, is that okay with my blood pressure tablets?",
+    "My cough is a bit better today.",
+    "I stopped taking Lisinopril because it made me dizzy.",
+    "The rash on my arm is itchy but not spreading.",
+    "Thank you, that helps.",
+    "I have crushing chest pain and can't breathe.",  # Rule pre-classifier: immediate escalation
+]
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+class Recorder:
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = None
+        self.finished = None
+
+    def record(self, endpoint: str, started: float, ok: bool):
+        now = time.perf_counter()
+        if started < self.warmup_until:
+            return
+        self.started = min(self.started or started, started)
+        self.finished = max(self.finished or now, now)
+        if ok:
+            self.latencies[endpoint].append(now - started)
+        else:
+            self.errors[endpoint] += 1
+
+    def results(self) -> Dict[str, dict]:
+        elapsed = max(1e-9, (self.finished or 0) - (self.started or 0))
+        results = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[endpoint])
+            results[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "throughput_rps": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": (values[-1] * 1000) if values else 0.0,
+            }
+        return results
+
+class VirtualPatient:
+    def __init__(self, client, token: str, rng: random.Random):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = rng
+        self.conversation_id = 0
+        self.etag: Optional[str] = None
+
+    async def chat(self, recorder: Recorder):
+        started = time.perf_counter()
+        resp = await self.client.post("/api/v1/chat/", headers=self.headers, json={
+            "conversation_id": self.conversation_id, "content": self.rng.choice(PATIENT_MESSAGES),
+        })
+        recorder.record("POST /chat/", started, resp.status_code == 200)
+        if resp.status_code == 200:
+            self.conversation_id = resp.json()["conversation_id"]
+
+    async def history(self, recorder: Recorder):
+        if not self.conversation_id:
+            return await self.chat(recorder)
+        headers = dict(self.headers)
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        started = time.perf_counter()
+        resp = await self.client.get(f"/api/v1/chat/{self.conversation_id}/history", headers=headers)
+        recorder.record("GET /chat/{id}/history", started, resp.status_code in (200, 304))
+        self.etag = resp.headers.get("etag", self.etag)
+
+class VirtualClinician:
+    def __init__(self, client, token: str, rng: random.Random):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = rng
+        self.pending: List[int] = []
+
+    async def dashboard(self, recorder: Recorder):
+        started = time.perf_counter()
+        resp = await self.client.get("/api/v1/clinician/patients", headers=self.headers)
+        recorder.record("GET /clinician/patients", started, resp.status_code == 200)
+        started = time.perf_counter()
+        resp = await self.client.get("/api/v1/escalations/?status=pending", headers=self.headers)
+        recorder.record("GET /escalations/", started, resp.status_code == 200)
+        if resp.status_code == 200:
+            self.pending = [esc["id"] for esc in resp.json()]
+
+    async def reply(self, recorder: Recorder):
+        if not self.pending:
+            return await self.dashboard(recorder)
+        escalation_id = self.pending.pop(self.rng.randrange(len(self.pending)))
+        started = time.perf_counter()
+        resp = await self.client.post(f"/api/v1/escalations/{escalation_id}/reply", headers=self.headers,
+                                      json={"content": "A nurse has reviewed your message. Please call the clinic if it gets worse."})
+        # 404: another clinician got there first
+        recorder.record("POST /escalations/{id}/reply", started, resp.status_code in (200, 404))
+
+async def seed(run_id: str, patients: int):
+    from app.db.database import SessionLocal
+    from app.db.models import User
+
+    async with SessionLocal() as db:
+        clinic_id = f"load-{run_id}"
+        users = [User(email=f"load-{run_id}-p{i}@example.com", hashed_password="!", role="patient", clinic_id=clinic_id)
+                 for i in range(patients)]
+        clinician = User(email=f"load-{run_id}-clinician@example.com", hashed_password="!", role="clinician", clinic_id=clinic_id)
+        db.add_all(users + [clinician])
+        await db.commit()
+        return [u.id for u in users], clinician.id
+
+CLEANUP = [
+    "DELETE FROM jobs WHERE key IN (SELECT 'patient:' || id FROM users WHERE email LIKE :pattern)"
+    " OR key IN (SELECT 'conversation:' || c.id FROM conversations c JOIN users u ON u.id = c.user_id WHERE u.email LIKE :pattern)",
+    "DELETE FROM escalations WHERE conversation_id IN (SELECT c.id FROM conversations c JOIN users u ON u.id = c.user_id WHERE u.email LIKE :pattern)",
+    "DELETE FROM messages WHERE conversation_id IN (SELECT c.id FROM conversations c JOIN users u ON u.id = c.user_id WHERE u.email LIKE :pattern)",
+    "DELETE FROM conversations WHERE user_id IN (SELECT id FROM users WHERE email LIKE :pattern)",
+    "DELETE FROM patient_activity WHERE patient_id IN (SELECT id FROM users WHERE email LIKE :pattern)",
+    "DELETE FROM patient_facts WHERE patient_id IN (SELECT id FROM users WHERE email LIKE :pattern)",
+    "DELETE FROM profile_events WHERE patient_id IN (SELECT id FROM users WHERE email LIKE :pattern)",
+    "DELETE FROM profile_snapshots WHERE patient_id IN (SELECT id FROM users WHERE email LIKE :pattern)",
+    "DELETE FROM patient_profiles WHERE patient_id IN (SELECT id FROM users WHERE email LIKE :pattern)",
+    "DELETE FROM users WHERE email LIKE :pattern",
+]
+
+async def cleanup(run_id: str):
+    from sqlalchemy import text
+    from app.db.database import SessionLocal
+
+    async with SessionLocal() as db:
+        for statement in CLEANUP:
+            await db.execute(text(statement), {"pattern": f"load-{run_id}-%"})
+        await db.commit()
+
+async def virtual_user(actor_patient: VirtualPatient, actor_clinician: VirtualClinician, recorder: Recorder,
+                       deadline: float, rng: random.Random, think_ms: float):
+    scenarios, weights = zip(*SCENARIO_WEIGHTS.items())
+    while time.perf_counter() < deadline:
+        scenario = rng.choices(scenarios, weights)[0]
+        try:
+            if scenario == "chat":
+                await actor_patient.chat(recorder)
+            elif scenario == "history":
+                await actor_patient.history(recorder)
+            elif scenario == "dashboard":
+                await actor_clinician.dashboard(recorder)
+            else:
+                await actor_clinician.reply(recorder)
+        except Exception as e:
+            print(f"Load Test Request Failed ({scenario}): {type(e).__name__}: {e}", file=sys.stderr)
+            recorder.record(scenario, time.perf_counter(), False)
+        if think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / think_ms))
+
+def print_report(results: Dict[str, dict], concurrency: int, duration: float):
+    print(f"\n{concurrency} virtual users, {duration:.0f}s measured\n")
+    print(f"{'endpoint':<30} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for endpoint, r in results.items():
+        print(f"{endpoint:<30} {r['requests']:>9} {r['errors']:>7} {r['throughput_rps']:>8.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    regressions = []
+    for endpoint, r in results.items():
+        before = baseline.get(endpoint)
+        if not before or not before["p95_ms"]:
+            continue
+        change = r["p95_ms"] / before["p95_ms"] - 1
+        marker = "REGRESSION" if change > max_regression else "ok"
+        print(f"{endpoint:<30} p95 {before['p95_ms']:>8.1f} -> {r['p95_ms']:>8.1f} ms ({change:+.0%}) {marker}")
+        if change > max_regression:
+            regressions.append(endpoint)
+    return regressions
+
+async def main(args) -> int:
+    # Imported after the LLM settings are in the environment
+    import httpx
+    from app.core.security import create_access_token
+    from app.db.database import engine
+
+    # Statement logging would dominate the in-process numbers
+    engine.sync_engine.echo = args.sql_echo
+    run_id = uuid.uuid4().hex[:8]
+    patient_ids, clinician_id = await seed(run_id, args.patients)
+    worker = worker_task = None
+    try:
+        if args.base_url:
+            transport, base_url = None, args.base_url
+        else:
+            from app.main import app
+            from app.worker import HANDLERS
+            from app.services.jobs import JobWorker
+            transport, base_url = httpx.ASGITransport(app=app), "http://load-test"
+            if args.worker_concurrency:
+                worker = JobWorker(HANDLERS, concurrency=args.worker_concurrency, poll_seconds=0.2)
+                worker_task = asyncio.create_task(worker.run())
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=60) as client:
+            rng = random.Random(args.seed)
+            clinician_token = create_access_token(subject=str(clinician_id))
+            started = time.perf_counter()
+            recorder = Recorder(warmup_until=started + args.warmup)
+            deadline = started + args.warmup + args.duration
+            users = []
+            for i in range(args.concurrency):
+                user_rng = random.Random(rng.random())
+                patient = VirtualPatient(client, create_access_token(subject=str(patient_ids[i % len(patient_ids)])), user_rng)
+                clinician = VirtualClinician(client, clinician_token, user_rng)
+                users.append(virtual_user(patient, clinician, recorder, deadline, user_rng, args.think_ms))
+            await asyncio.gather(*users)
+    finally:
+        if worker:
+            worker.stop()
+            await worker_task
+        if not args.keep_data:
+            await cleanup(run_id)
+
+    results = recorder.results()
+    print_report(results, args.concurrency, args.duration)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"concurrency": args.concurrency, "duration": args.duration, "endpoints": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["endpoints"]
+        print()
+        if compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds before measuring")
+    parser.add_argument("--patients", type=int, default=20, help="Seeded patients (virtual users share them round-robin)")
+    parser.add_argument("--think-ms", type=float, default=200, help="Mean pause between a user's actions (0 = none)")
+    parser.add_argument("--base-url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--worker-concurrency", type=int, default=2, help="In-process job worker loops (0 = none)")
+    parser.add_argument("--fake-latency", default=DEFAULT_FAKE_LATENCY, help="FAKE_LLM_LATENCY for the in-process app")
+    parser.add_argument("--risk-script", default=DEFAULT_RISK_SCRIPT, help="FAKE_LLM_RISK_SCRIPT for the in-process app")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="FAKE_LLM_FAILURE_RATE for the in-process app")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sql-echo", action="store_true", help="Keep SQL statement logging on")
+    parser.add_argument("--keep-data", action="store_true", help="Leave the seeded users and their data in place")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Results file (--json) of an earlier run to compare p95 against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        os.environ["LLM_PROVIDER"] = "fake"
+        os.environ["FAKE_LLM_LATENCY"] = args.fake_latency
+        os.environ["FAKE_LLM_RISK_SCRIPT"] = args.risk_script
+        os.environ["FAKE_LLM_FAILURE_RATE"] = str(args.failure_rate)
+        os.environ["FAKE_LLM_SEED"] = str(args.seed)
+    sys.exit(asyncio.run(main(args)))
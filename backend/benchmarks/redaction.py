@@ -0,0 +1,100 @@
+"""
+Micro-benchmark: the redaction pipeline (redact_pii) vs the original one-re.sub-per-pattern loop.
+
+Messages are synthetic but shaped like real traffic: mostly PII-free clinical chatter
+of chat-message length, some carrying phone numbers, emails, NRICs, names or IDs.
+Also checks that both produce the same output on the corpus (which only carries PII the
+original patterns knew about).
+
+Usage (from backend/):
+    python -m benchmarks.redaction --messages 5000 --repeat 5
+"""
+import argparse
+import random
+import re
+import timeit
+
+from app.core.privacy import redact_pii, redact_pii_batch
+
+SENTENCES = [
+    "I have had a mild headache since yesterday evening.",
+    "The pain in my left knee gets worse when I climb stairs.",
+    "I took two tablets of paracetamol this morning.",
+    "Can I take ibuprofen together with my blood pressure medication?",
+    "My blood sugar reading was 7.8 before breakfast.",
+    "I have been feeling more tired than usual this week.",
+    "The rash on my arm is itchy but not spreading.",
+    "I missed my metformin dose last night, what should I do?",
+    "Sleeping has been difficult because of the cough.",
+    "Thank you, that is helpful.",
+]
+
+PII_SNIPPETS = [
+    "You can reach me at +65 9123 4567.",
+    "My number is 8123 4567 if the nurse needs to call.",
+    "Please email me at tan.mei.ling@example.com.",
+    "My IC is S1234567A.",
+    "My name is Alice Tan and I am a new patient.",
+    "My SSN is 123-45-6789.",
+    "My patient ID is ID204518.",
+]
+
+# The patterns as they were when the loop below was replaced; frozen so the comparison
+# stays against that implementation as PATTERNS grows
+LEGACY_PATTERNS = {
+    "nric": r"[STFG]\d{7}[A-Z]",
+    "phone": r"(\+?65)?[ -]?\d{4}[ -]?\d{4}",
+    "email": r"[\w\.-]+@[\w\.-]+\.\w+",
+    "name": r"(?<=My name is )[A-Z][a-z]+ [A-Z][a-z]+",
+    "ssn": r'\b\d{3}-\d{2}-\d{4}\b',
+    "id_generic": r'\bID\d{5,}\b',
+}
+
+def legacy_redact_pii(text: str) -> str:
+    """The implementation the single-pass pipeline replaced."""
+    if not text:
+        return text
+    redacted = text
+    for ptype, pattern in LEGACY_PATTERNS.items():
+        redacted = re.sub(pattern, f"[{ptype.upper()}_REDACTED]", redacted)
+    return redacted
+
+def build_corpus(size: int, pii_ratio: float, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        parts = rng.sample(SENTENCES, rng.randint(1, 6))
+        if rng.random() < pii_ratio:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(PII_SNIPPETS))
+        corpus.append(" ".join(parts))
+    return corpus
+
+def bench(label: str, fn, repeat: int, count: int):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"{label:<28} {best * 1e3:9.2f} ms total   {best / count * 1e6:7.2f} us/message")
+    return best
+
+def main(messages: int, repeat: int, pii_ratio: float):
+    corpus = build_corpus(messages, pii_ratio)
+    avg_len = sum(map(len, corpus)) / len(corpus)
+    print(f"{messages} messages, avg {avg_len:.0f} chars, ~{pii_ratio:.0%} with PII\n")
+
+    mismatches = [t for t in corpus if legacy_redact_pii(t) != redact_pii(t)]
+    print(f"output parity: {len(corpus) - len(mismatches)}/{len(corpus)} identical")
+    for text in mismatches[:5]:
+        print(f"  legacy: {legacy_redact_pii(text)!r}\n  engine: {redact_pii(text)!r}")
+    assert redact_pii_batch(corpus) == [redact_pii(t) for t in corpus]
+    print()
+
+    legacy = bench("legacy (re.sub per pattern)", lambda: [legacy_redact_pii(t) for t in corpus], repeat, messages)
+    single = bench("redact_pii (single pass)", lambda: [redact_pii(t) for t in corpus], repeat, messages)
+    batch = bench("redact_pii_batch", lambda: redact_pii_batch(corpus), repeat, messages)
+    print(f"\nspeedup: single pass {legacy / single:.1f}x, batch {legacy / batch:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pii-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    main(args.messages, args.repeat, args.pii_ratio)
@@ -0,0 +1,85 @@
+"""
+Precision/recall and latency of the rule pre-classifier vs the LLM risk path,
+on the labeled corpus in tests/data/risk_corpus.jsonl.
+
+"Positive" means HIGH for the rule fast path (it only ever escalates as HIGH), and
+both HIGH and "escalated" (HIGH or MEDIUM) are reported for the LLM. The LLM pass
+needs GOOGLE_API_KEY and makes one call per corpus message.
+
+Usage (from backend/):
+    python -m benchmarks.risk_rules            # rules only
+    python -m benchmarks.risk_rules --llm      # rules and LLM
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from app.services.risk_rules import RiskRuleClassifier
+
+CORPUS = Path(__file__).resolve().parent.parent / "tests" / "data" / "risk_corpus.jsonl"
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def precision_recall(predicted, actual):
+    tp = sum(1 for p, a in zip(predicted, actual) if p and a)
+    fp = sum(1 for p, a in zip(predicted, actual) if p and not a)
+    fn = sum(1 for p, a in zip(predicted, actual) if not p and a)
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return precision, recall, tp, fp, fn
+
+def report(label, predicted, actual, latencies):
+    precision, recall, tp, fp, fn = precision_recall(predicted, actual)
+    print(f"{label:<34} precision {precision:6.1%}  recall {recall:6.1%}  (tp={tp} fp={fp} fn={fn})"
+          f"  p50 {statistics.median(latencies) * 1e3:8.2f} ms  max {max(latencies) * 1e3:8.2f} ms")
+
+async def llm_levels(rows):
+    # Imported here so the rules-only run works without GOOGLE_API_KEY
+    from app.services.context import ConversationContext
+    from app.services.risk import RiskAnalysisService
+    service = RiskAnalysisService()
+    levels, latencies = [], []
+    for row in rows:
+        started = time.perf_counter()
+        result = await service.analyze_risk(ConversationContext.for_message(row["text"]))
+        latencies.append(time.perf_counter() - started)
+        levels.append(result.risk_level.value)
+    return levels, latencies
+
+def main(with_llm: bool):
+    rows = load_corpus()
+    is_high = [row["label"] == "HIGH" for row in rows]
+    is_escalated = [row["label"] in ("HIGH", "MEDIUM") for row in rows]
+    print(f"{len(rows)} messages: {sum(is_high)} HIGH, {sum(is_escalated) - sum(is_high)} MEDIUM, "
+          f"{len(rows) - sum(is_escalated)} LOW\n")
+
+    classifier = RiskRuleClassifier()
+    rule_hits, rule_latencies = [], []
+    for row in rows:
+        started = time.perf_counter()
+        rule_hits.append(classifier.match(row["text"]) is not None)
+        rule_latencies.append(time.perf_counter() - started)
+    report("rules: fast-path HIGH", rule_hits, is_high, rule_latencies)
+    for row, hit in zip(rows, rule_hits):
+        if hit and row["label"] != "HIGH":
+            print(f"  false positive: {row['text']!r} ({row['label']})")
+
+    if not with_llm:
+        return
+
+    levels, llm_latencies = asyncio.run(llm_levels(rows))
+    report("llm: HIGH", [level == "HIGH" for level in levels], is_high, llm_latencies)
+    report("llm: escalated (HIGH|MEDIUM)", [level in ("HIGH", "MEDIUM") for level in levels], is_escalated, llm_latencies)
+    agree = sum(1 for hit, level in zip(rule_hits, levels) if hit and level == "HIGH")
+    print(f"\nLLM agrees (HIGH) on {agree}/{sum(rule_hits)} rule fast-path escalations")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm", action="store_true", help="Also run the LLM path (needs GOOGLE_API_KEY)")
+    args = parser.parse_args()
+    main(args.llm)
@@ -1,20 +1,28 @@
-
 import asyncio
+from alembic import command
 from app.db.database import engine, Base
-from app.main import startup
+from app.db.migrations import alembic_config
+from app.db.seed import seed_default_users
 from sqlalchemy import text
 
-async def reset_db():
+async def drop_all():
     print("🗑️  Dropping all tables...")
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
-        # Drop migration table if exists (alembic) though we aren't using it explicitly here yet
         await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
-    
-    print("✨ Creating tables and seeding data...")
-    # Re-run the startup logic from main.py which handles creation and seeding
-    await startup()
+        await conn.execute(text("DROP TYPE IF EXISTS risklevel"))
+    await engine.dispose()
+
+def reset_db():
+    asyncio.run(drop_all())
+
+    print("✨ Running migrations...")
+    # Alembic's env.py runs its own event loop, so this must be called outside asyncio.run
+    command.upgrade(alembic_config(), "head")
+
+    print("🌱 Seeding data...")
+    asyncio.run(seed_default_users())
     print("✅ Database reset complete.")
 
 if __name__ == "__main__":
-    asyncio.run(reset_db())
+    reset_db()
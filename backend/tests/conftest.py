@@ -1,3 +1,8 @@
+import os
+# Offline by default: the fake LLM answers in milliseconds without network or API key.
+# Set LLM_PROVIDER=gemini (and GOOGLE_API_KEY) to run against the real model.
+os.environ.setdefault("LLM_PROVIDER", "fake")
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
@@ -6,6 +11,9 @@ from app.main import app
 from app.db.database import Base, get_db, SessionLocal
 from app.core.security import create_access_token
 import asyncio
+import uuid
+from sqlalchemy import delete
+from app.db.models import PatientFact, PatientProfile, ProfileEvent, ProfileSnapshot, User
 
 # Use an in-memory SQLite database for testing, or a separate test DB
 # For simplicity with asyncpg/postgres dependencies, we might mock DB or use a test postgres URL.
@@ -41,9 +49,13 @@ async def override_get_db():
     app.dependency_overrides[get_db] = _get_test_db
     # Also patch SessionLocal in the endpoint if it's imported directly
     chat_endpoint.SessionLocal = TestSessionLocal
+    clinician_endpoint.SessionLocal = TestSessionLocal
+    worker_module.SessionLocal = TestSessionLocal
     yield
     app.dependency_overrides.clear()
     chat_endpoint.SessionLocal = SessionLocal # Restore
+    clinician_endpoint.SessionLocal = SessionLocal
+    worker_module.SessionLocal = SessionLocal
     await test_engine.dispose()
 
 from unittest.mock import MagicMock
@@ -51,6 +63,9 @@ from app.services.chat import ChatService
 from app.services.risk import RiskAnalysisService
 from app.services.memory import MemoryService
 from app.api.v1.endpoints import chat as chat_endpoint
+from app.api.v1.endpoints import clinician as clinician_endpoint
+from app import worker as worker_module
+from app.services.jobs import JobWorker
 
 @pytest.fixture(autouse=True)
 async def patch_services():
@@ -67,17 +82,46 @@ async def patch_services():
     # Monkeypatch the module variables
     chat_endpoint.chat_service = new_chat_service
     chat_endpoint.risk_service = new_risk_service
-    chat_endpoint.memory_service = new_memory_service
+    worker_module.memory_service = new_memory_service
     
     yield
     # Cleanup? Not strictly necessary as next test will overwrite.
 
+@pytest.fixture
+def run_jobs(override_get_db, monkeypatch):
+    """
+    Runs the queued background jobs in-process (what `python -m app.worker` does).
+    Jobs are enqueued without the coalescing delay so they are ready immediately.
+    """
+    monkeypatch.setattr(chat_endpoint, "MEMORY_COALESCE_SECONDS", 0)
+    worker = JobWorker(worker_module.HANDLERS, session_factory=chat_endpoint.SessionLocal)
+
+    async def _run(key: str | None = None) -> int:
+        return await worker.run_pending(key=key)
+    return _run
+
 @pytest.fixture
 async def client(override_get_db):
     # Function scoped client, ensuring new loop
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
         yield c
 
+@pytest.fixture
+async def scratch_patient(override_get_db):
+    """A throwaway patient (and their profile) for tests that write Living Memory."""
+    async with chat_endpoint.SessionLocal() as db:
+        patient = User(email=f"memory-{uuid.uuid4().hex}@example.com", hashed_password="!", role="patient")
+        db.add(patient)
+        await db.commit()
+    yield patient.id
+    async with chat_endpoint.SessionLocal() as db:
+        await db.execute(delete(PatientFact).where(PatientFact.patient_id == patient.id))
+        await db.execute(delete(ProfileEvent).where(ProfileEvent.patient_id == patient.id))
+        await db.execute(delete(ProfileSnapshot).where(ProfileSnapshot.patient_id == patient.id))
+        await db.execute(delete(PatientProfile).where(PatientProfile.patient_id == patient.id))
+        await db.execute(delete(User).where(User.id == patient.id))
+        await db.commit()
+
 @pytest.fixture
 def patient_token():
     return create_access_token(subject="1") # User 1 is patient
@@ -1,6 +1,12 @@
+import uuid
+from datetime import datetime
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import delete
+from app.api.v1.endpoints import chat as chat_endpoint
 from app.core.security import create_access_token
+from app.db.models import PatientActivity, User
+from app.services.activity import ActivityService
 
 # 4. Test Access Control
 @pytest.mark.asyncio
@@ -44,3 +50,65 @@ async def test_conversation_isolation(client: AsyncClient):
     
     # Expect 403 Forbidden (if user exists) or 401 (if user 999 doesn't exist)
     assert resp_bad.status_code in [401, 403, 404]
+
+@pytest.fixture
+async def second_patient(override_get_db):
+    # The seed has one patient; pagination needs at least two on the list
+    async with chat_endpoint.SessionLocal() as db:
+        clinician = await db.get(User, 2)
+        patient = User(email=f"pagination-{uuid.uuid4().hex}@example.com", hashed_password="!", role="patient",
+                       clinic_id=clinician.clinic_id)
+        db.add(patient)
+        await db.flush()
+        await ActivityService().record_message(db, patient.id, patient.clinic_id, "patient", datetime.utcnow())
+        await db.commit()
+    yield patient.id
+    async with chat_endpoint.SessionLocal() as db:
+        await db.execute(delete(PatientActivity).where(PatientActivity.patient_id == patient.id))
+        await db.execute(delete(User).where(User.id == patient.id))
+        await db.commit()
+
+@pytest.mark.asyncio
+async def test_patient_list_is_clinician_only_and_paginated(client: AsyncClient, patient_token: str, clinician_token: str, second_patient: int):
+    resp = await client.get("/api/v1/clinician/patients", headers={"Authorization": f"Bearer {patient_token}"})
+    assert resp.status_code == 403
+
+    headers = {"Authorization": f"Bearer {clinician_token}"}
+    first = await client.get("/api/v1/clinician/patients", params={"limit": 1}, headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()) == 1
+
+    seen = [p["id"] for p in first.json()]
+    cursor = first.headers.get("x-next-cursor")
+    assert cursor
+    while cursor:
+        page = await client.get("/api/v1/clinician/patients", params={"limit": 1, "cursor": cursor}, headers=headers)
+        assert page.status_code == 200
+        seen += [p["id"] for p in page.json()]
+        cursor = page.headers.get("x-next-cursor")
+    assert len(seen) == len(set(seen)) >= 2
+    assert {1, second_patient} <= set(seen)
+
+    # Same order as one unpaginated page
+    full = await client.get("/api/v1/clinician/patients", headers=headers)
+    assert [p["id"] for p in full.json()] == seen
+
+@pytest.mark.asyncio
+async def test_patient_without_activity_is_listed(client: AsyncClient, clinician_token: str):
+    # Registered but never messaged: no patient_activity row yet
+    async with chat_endpoint.SessionLocal() as db:
+        clinician = await db.get(User, 2)
+        patient = User(email=f"quiet-{uuid.uuid4().hex}@example.com", hashed_password="!", role="patient",
+                       clinic_id=clinician.clinic_id)
+        db.add(patient)
+        await db.commit()
+    try:
+        resp = await client.get("/api/v1/clinician/patients", params={"limit": 500},
+                                headers={"Authorization": f"Bearer {clinician_token}"})
+        listed = {p["id"]: p for p in resp.json()}
+        assert listed[patient.id] == {"id": patient.id, "email": patient.email, "last_active": None,
+                                      "unread_count": 0, "risk_status": "normal", "highest_risk": None}
+    finally:
+        async with chat_endpoint.SessionLocal() as db:
+            await db.execute(delete(User).where(User.id == patient.id))
+            await db.commit()
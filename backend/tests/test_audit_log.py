@@ -0,0 +1,74 @@
+import json
+import threading
+from app.core.audit import AuditLog, RotatingJsonlFile
+from app.core.metrics import metrics
+from app.core.privacy import redact_pii
+
+class BlockedSink:
+    """Holds the writer thread inside its first write until released."""
+    def __init__(self):
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.lines = []
+
+    def write(self, data: bytes):
+        self.writing.set()
+        self.release.wait(5)
+        self.lines.extend(data.splitlines())
+
+    def close(self):
+        pass
+
+def _read(path) -> list:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_records_are_batched_to_jsonl_with_metadata_redacted(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    audit = AuditLog(redact=redact_pii, path=str(path))
+    audit.log("Message Received", {"user_id": 1, "note": "email me at bob@example.com", "tags": ["S1234567D"]})
+    audit.log("Slow Request", {"route": "/api/v1/chat/", "stages": {"risk": 1.5}}, level="WARNING")
+    audit.close()
+
+    received, slow = _read(path)
+    assert received["event"] == "Message Received"
+    assert received["metadata"] == {"user_id": 1, "note": "email me at [EMAIL_REDACTED]", "tags": ["[NRIC_REDACTED]"]}
+    assert received["timestamp"].endswith("+00:00")
+    assert slow["level"] == "WARNING"
+    assert slow["metadata"]["stages"] == {"risk": 1.5}
+
+def test_file_rotates_by_size(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    sink = RotatingJsonlFile(str(path), max_bytes=100, backups=2)
+    for i in range(5):
+        sink.write(f'{{"n": {i}, "pad": "{"x" * 60}"}}\n'.encode())
+    sink.close()
+    assert [json.loads(l)["n"] for l in path.read_text().splitlines()] == [4]
+    assert [json.loads(l)["n"] for l in (tmp_path / "audit.jsonl.1").read_text().splitlines()] == [3]
+    assert (tmp_path / "audit.jsonl.2").exists()
+    assert not (tmp_path / "audit.jsonl.3").exists()
+
+def test_full_queue_drops_by_default_or_spills_to_disk(tmp_path):
+    sink = BlockedSink()
+    path = tmp_path / "audit.jsonl"
+    audit = AuditLog(redact=redact_pii, path=str(path), queue_size=1, overflow="spill", sink=sink)
+    audit.log("first", {})
+    assert sink.writing.wait(5)
+    audit.log("queued", {})
+    audit.log("spilled", {"email": "bob@example.com"})
+    spilled = _read(tmp_path / "audit.jsonl.spill")
+    assert [(r["event"], r["metadata"]) for r in spilled] == [("spilled", {"email": "[EMAIL_REDACTED]"})]
+    sink.release.set()
+    audit.close()
+    assert [json.loads(l)["event"] for l in sink.lines] == ["first", "queued"]
+
+    sink = BlockedSink()
+    audit = AuditLog(redact=redact_pii, queue_size=1, sink=sink)  # drop is the default
+    dropped = metrics.get("audit_dropped_total")
+    audit.log("first", {})
+    assert sink.writing.wait(5)
+    audit.log("queued", {})
+    audit.log("dropped", {})
+    assert metrics.get("audit_dropped_total") == dropped + 1
+    sink.release.set()
+    audit.close()
+    assert [json.loads(l)["event"] for l in sink.lines] == ["first", "queued"]
@@ -0,0 +1,70 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.core.metrics import metrics
+from app.core.tracing import current_trace
+
+class StubRiskChain:
+    def __init__(self, level: str):
+        self.level = level
+
+    async def ainvoke(self, inputs):
+        return {"risk_level": self.level, "reason": f"stub {self.level}", "summary": f"- stub {self.level}"}
+
+class CannedChatChain:
+    async def ainvoke(self, inputs):
+        return {"content": "Sure.", "confidence": "High", "reason": "stub", "citations": []}
+
+def _triage(level: str):
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.risk_service.chain = StubRiskChain(level)
+    chat_endpoint.chat_service.chain = CannedChatChain()
+
+ROUTE = dict(method="POST", route="/api/v1/chat/")
+
+class RoundTrips:
+    """Statements (from the request metrics) and commits made while serving one chat request."""
+    def __init__(self):
+        self.commits = 0
+
+    def _on_commit(self, conn):
+        if current_trace() is not None:
+            self.commits += 1
+
+    async def post(self, client: AsyncClient, token: str, conversation_id: int, content: str):
+        before = metrics.histogram("http_request_db_queries", **ROUTE)
+        before = before.sum if before else 0
+        self.commits = 0
+        event.listen(Engine, "commit", self._on_commit)
+        try:
+            resp = await client.post("/api/v1/chat/", json={"conversation_id": conversation_id, "content": content},
+                                     headers={"Authorization": f"Bearer {token}"})
+        finally:
+            event.remove(Engine, "commit", self._on_commit)
+        assert resp.status_code == 200
+        self.queries = metrics.histogram("http_request_db_queries", **ROUTE).sum - before
+        return resp.json()
+
+# Budgets for the whole request, auth included. Raise them only for a new query that is worth it.
+@pytest.mark.asyncio
+async def test_low_risk_message_round_trips(client: AsyncClient, patient_token: str):
+    _triage("LOW")
+    trips = RoundTrips()
+    first = await trips.post(client, patient_token, 0, "Can I book an appointment?")
+    # auth, profile (2), conversation + message + job + activity, notify | risk update + reply + activity, notify
+    assert (trips.queries, trips.commits) == (12, 2)
+
+    await trips.post(client, patient_token, first["conversation_id"], "And what about Tuesday?")
+    # An existing conversation is looked up, and its history read, instead of created
+    assert (trips.queries, trips.commits) == (13, 2)
+
+@pytest.mark.asyncio
+async def test_escalation_round_trips(client: AsyncClient, patient_token: str):
+    _triage("MEDIUM")
+    trips = RoundTrips()
+    data = await trips.post(client, patient_token, 0, "I feel strange")
+    assert "escalation_id" in data
+    # ... | risk update, profile reference, escalation + notice + activity (2), notify
+    assert (trips.queries, trips.commits) == (15, 2)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import pytest
+from fastapi import BackgroundTasks
+from httpx import AsyncClient
+from sqlalchemy import select
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.db.models import Message, User
+from app.schemas import MessageCreate
+
+REPLY = "Sorry to hear that. Rest and fluids usually help."
+
+class StubRiskChain:
+    def __init__(self, level: str, timeline: list):
+        self.level = level
+        self.timeline = timeline
+
+    async def ainvoke(self, inputs):
+        self.timeline.append("risk")
+        return {"risk_level": self.level, "reason": "stub triage", "summary": "- stub triage"}
+
+class StubStreamingChatChain:
+    """Emits cumulative partial dicts, like JsonOutputParser.astream."""
+    def __init__(self, timeline: list):
+        self.timeline = timeline
+
+    async def astream(self, inputs):
+        self.timeline.append("chat")
+        words = REPLY.split(" ")
+        for i in range(1, len(words) + 1):
+            await asyncio.sleep(0)
+            yield {"content": " ".join(words[:i])}
+        yield {"content": REPLY, "confidence": "High", "reason": "stub", "citations": ["General Medical Knowledge"]}
+
+@pytest.fixture
+def timeline():
+    events = []
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.chat_service.chain = StubStreamingChatChain(events)
+    return events
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+async def _ai_messages(conversation_id: int):
+    async with chat_endpoint.SessionLocal() as session:
+        result = await session.execute(
+            select(Message).where(Message.conversation_id == conversation_id, Message.sender_type == "ai")
+        )
+        return result.scalars().all()
+
+# Streaming chat: risk gate first, then tokens, then the saved reply
+@pytest.mark.asyncio
+async def test_stream_low_risk_reply(client: AsyncClient, patient_token: str, timeline: list):
+    chat_endpoint.risk_service.chain = StubRiskChain("LOW", timeline)
+    resp = await client.post("/api/v1/chat/stream", json={"conversation_id": 0, "content": "I have a mild cold"},
+                             headers={"Authorization": f"Bearer {patient_token}"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(resp.text)
+    names = [name for name, _ in events]
+    assert timeline == ["risk", "chat"]
+    assert names[-1] == "final" and set(names[:-1]) == {"token"}
+    assert "".join(data["content"] for name, data in events if name == "token") == REPLY
+
+    final = events[-1][1]
+    assert final["content"] == REPLY
+    assert final["risk_level"] == "LOW"
+    saved = await _ai_messages(final["conversation_id"])
+    assert [(m.id, m.content) for m in saved] == [(final["id"], REPLY)]
+
+@pytest.mark.asyncio
+async def test_stream_escalation_sends_only_escalation_event(client: AsyncClient, patient_token: str, timeline: list):
+    chat_endpoint.risk_service.chain = StubRiskChain("MEDIUM", timeline)
+    resp = await client.post("/api/v1/chat/stream", json={"conversation_id": 0, "content": "My fever is getting worse"},
+                             headers={"Authorization": f"Bearer {patient_token}"})
+    assert resp.status_code == 200
+
+    events = _parse_sse(resp.text)
+    assert [name for name, _ in events] == ["escalation"]
+    assert "escalation_id" in events[0][1]
+    assert timeline == ["risk"]
+    saved = await _ai_messages(events[0][1]["conversation_id"])
+    assert [m.content for m in saved] == [chat_endpoint.ESCALATION_MESSAGE]
+
+@pytest.mark.asyncio
+async def test_stream_reply_saved_after_disconnect(override_get_db, timeline: list):
+    chat_endpoint.risk_service.chain = StubRiskChain("LOW", timeline)
+    async with chat_endpoint.SessionLocal() as db:
+        patient = await db.get(User, 1)
+        response = await chat_endpoint.chat_stream_endpoint(
+            MessageCreate(conversation_id=0, content="I have a mild cold"), BackgroundTasks(), db, patient
+        )
+        conversation_id = (await db.execute(
+            select(Message.conversation_id).where(Message.sender_type == "patient").order_by(Message.id.desc()).limit(1)
+        )).scalar()
+
+    # The patient reads one token, then the connection drops
+    body = response.body_iterator
+    first = await body.__anext__()
+    assert first.startswith("event: token")
+    await body.aclose()
+
+    await asyncio.gather(*chat_endpoint._reply_tasks)
+    saved = await _ai_messages(conversation_id)
+    assert [m.content for m in saved] == [REPLY]
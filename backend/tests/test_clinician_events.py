@@ -0,0 +1,66 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from app.api.v1.endpoints.clinician import clinician_events
+from app.core.events import broker, clinic_topic, CHANNEL, CLINIC_ALL
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+class RequestSession:
+    closed = False
+
+    async def close(self):
+        self.closed = True
+
+# Every clinician feed on a worker receives each event, not just the first reader
+@pytest.mark.asyncio
+async def test_feed_delivers_event_to_every_subscriber():
+    sessions = [RequestSession(), RequestSession()]
+    feeds = []
+    for session, clinic_id in zip(sessions, ["c1", None]):
+        response = await clinician_events(ConnectedRequest(), session, SimpleNamespace(clinic_id=clinic_id))
+        feeds.append(response.body_iterator)
+    # The request-scoped session is released before streaming
+    assert all(session.closed for session in sessions)
+
+    reads = [asyncio.create_task(feed.__anext__()) for feed in feeds]
+    try:
+        for _ in range(100):
+            if clinic_topic("c1") in broker._subscribers and CLINIC_ALL in broker._subscribers:
+                break
+            await asyncio.sleep(0.01)
+
+        payload = {"topic": clinic_topic("c1"), "event": "escalation.created", "escalation_id": 7, "risk_level": "HIGH"}
+        broker._on_notify(None, 0, CHANNEL, json.dumps(payload))
+        chunks = await asyncio.wait_for(asyncio.gather(*reads), timeout=5)
+        expected = 'event: escalation.created\ndata: {"escalation_id": 7, "risk_level": "HIGH"}\n\n'
+        assert chunks == [expected, expected]
+    finally:
+        for feed in feeds:
+            await feed.aclose()
+        await broker.close()
+
+# A feed that falls behind is told to refetch rather than silently losing events
+@pytest.mark.asyncio
+async def test_overflowing_feed_gets_resync():
+    response = await clinician_events(ConnectedRequest(), RequestSession(), SimpleNamespace(clinic_id="c1"))
+    feed = response.body_iterator
+    read = asyncio.create_task(feed.__anext__())
+    try:
+        for _ in range(100):
+            if clinic_topic("c1") in broker._subscribers:
+                break
+            await asyncio.sleep(0.01)
+
+        for i in range(broker.queue_size + 1):
+            payload = {"topic": clinic_topic("c1"), "event": "patient.activity", "patient_id": i}
+            broker._on_notify(None, 0, CHANNEL, json.dumps(payload))
+        assert await asyncio.wait_for(read, timeout=5) == "event: resync\ndata: {}\n\n"
+        queue, = broker._subscribers[clinic_topic("c1")]
+        assert queue.empty()
+    finally:
+        await feed.aclose()
+        await broker.close()
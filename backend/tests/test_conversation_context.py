@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+from httpx import AsyncClient
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.db.models import Message
+from app.schemas import PatientProfileResponse
+from app.services.context import ConversationContext
+
+class RecordingRiskChain:
+    def __init__(self):
+        self.inputs = []
+
+    async def ainvoke(self, inputs):
+        self.inputs.append(inputs)
+        return {"risk_level": "LOW", "reason": "stub", "summary": "- stub"}
+
+class RecordingChatChain:
+    def __init__(self):
+        self.inputs = []
+
+    async def ainvoke(self, inputs):
+        self.inputs.append(inputs)
+        return {"content": "Noted.", "confidence": "High", "reason": "stub", "citations": []}
+
+def test_rows_are_ordered_redacted_and_rendered_once():
+    start = datetime(2026, 1, 1)
+    rows = [  # newest first, as queried
+        Message(id=3, sender_type="patient", content="Is 5mg ok?", content_redacted="Is 5mg ok?", timestamp=start + timedelta(minutes=2)),
+        Message(id=2, sender_type="clinician", content="Take it with food", content_redacted=None, timestamp=start + timedelta(minutes=1)),
+        Message(id=1, sender_type="patient", content="I'm S1234567D", content_redacted="I'm [NRIC_REDACTED]", timestamp=start),
+    ]
+    profile = PatientProfileResponse(medications=[{"value": "Metformin"}], last_updated=start)
+    context = ConversationContext.from_rows(rows, profile)
+
+    assert [m.id for m in context.messages] == [1, 2, 3]
+    assert context.message == "Is 5mg ok?"
+    assert context.risk_history == "patient: I'm [NRIC_REDACTED]\nclinician: Take it with food"
+    assert context.chat_history == "Patient: I'm [NRIC_REDACTED]\nVerified Nurse: Take it with food\n"
+    assert context.transcript.splitlines()[0] == "[1] I'm [NRIC_REDACTED]"
+    assert (context.medications, context.symptoms) == ("Metformin", "None")
+    assert context.chat_history is context.chat_history
+
+    # Saved without redacted text: redacted on the way in, never sent raw
+    assert "S1234567D" not in ConversationContext.from_rows([
+        Message(id=4, sender_type="patient", content="I'm S1234567D", content_redacted=None, timestamp=start),
+    ]).transcript
+
+@pytest.mark.asyncio
+async def test_risk_and_reply_see_the_same_redacted_chronological_history(client: AsyncClient, patient_token: str):
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.risk_service.chain = risk = RecordingRiskChain()
+    chat_endpoint.chat_service.chain = reply = RecordingChatChain()
+    headers = {"Authorization": f"Bearer {patient_token}"}
+
+    first = (await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "My email is pat@example.com"},
+                               headers=headers)).json()
+    await client.post("/api/v1/chat/", json={"conversation_id": first["conversation_id"], "content": "Any update?"},
+                      headers=headers)
+
+    risk_inputs, reply_inputs = risk.inputs[-1], reply.inputs[-1]
+    assert risk_inputs["message"] == reply_inputs["message"] == "Any update?"
+    assert risk_inputs["history"] == "patient: My email is [EMAIL_REDACTED]\nai: Noted."
+    assert reply_inputs["history"] == "Patient: My email is [EMAIL_REDACTED]\nNightingale: Noted.\n"
@@ -0,0 +1,260 @@
+import asyncio
+from datetime import datetime
+import pytest
+from httpx import AsyncClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from sqlalchemy import delete, func, select
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.api.v1.endpoints import clinician as clinician_endpoint
+from app.core.metrics import metrics
+from app.db.models import Escalation, Job, Message, PatientActivity, RiskLevel
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.context import ConversationContext
+from app.services.fake_llm import FakeChatModel
+from app.services.jobs import RISK_RETRIAGE
+from app.services.llm_scheduler import LLMScheduler, LLMUnavailable, ScheduledLLM
+from app.services.risk import RiskAnalysisService
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class DownChain:
+    """The provider is down: every call fails fast with the circuit open."""
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        raise LLMUnavailable("llm circuit is open", retry_after=30)
+
+class StubRiskChain:
+    def __init__(self, level: str):
+        self.level = level
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        return {"risk_level": self.level, "reason": f"stub {self.level}", "summary": f"- stub {self.level}"}
+
+class CannedChatChain:
+    async def ainvoke(self, inputs):
+        return {"content": "Thanks for waiting.", "confidence": "High", "reason": "stub", "citations": []}
+
+class SlowModel(FakeListChatModel):
+    async def _agenerate(self, *args, **kwargs):
+        await asyncio.sleep(1)
+        return await super()._agenerate(*args, **kwargs)
+
+def test_breaker_opens_after_consecutive_failures_and_probes_after_reset():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=30, clock=clock)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.record_success()  # not consecutive
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as refused:
+        breaker.before_call()
+    assert refused.value.retry_after == 30
+
+    clock.now = 30
+    breaker.before_call()  # the probe
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 60
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+@pytest.mark.asyncio
+async def test_scheduled_llm_times_out_and_stops_calling_an_open_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=60)
+    llm = ScheduledLLM(SlowModel(responses=["late"]), LLMScheduler(), "risk", breaker=breaker, timeout=0.05)
+    with pytest.raises(LLMUnavailable, match="timed out"):
+        await llm.ainvoke("hi")
+    assert breaker.state == "open"
+
+    with pytest.raises(LLMUnavailable) as refused:
+        await llm.ainvoke("hi")
+    assert refused.value.retry_after > 0
+
+class BadRequestModel(FakeListChatModel):
+    """The provider rejects the request itself (HTTP 400): not an outage."""
+    async def ainvoke(self, input, config=None, **kwargs):
+        raise ValueError("400 INVALID_ARGUMENT: request contains an invalid argument")
+
+@pytest.mark.asyncio
+async def test_only_transient_failures_count_against_the_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=60)
+    llm = ScheduledLLM(BadRequestModel(responses=[]), LLMScheduler(), "risk", breaker=breaker)
+    with pytest.raises(ValueError, match="INVALID_ARGUMENT"):
+        await llm.ainvoke("hi")
+    assert breaker.state == "closed" and breaker.failures == 0
+
+    throttled = ScheduledLLM(FakeChatModel(purpose="risk", failure_rate=1.0, failure_mode="throttle"),
+                             LLMScheduler(), "risk", breaker=breaker)
+    with pytest.raises(LLMUnavailable, match="429"):
+        await throttled.ainvoke("hi")
+    assert breaker.state == "open"
+
+@pytest.mark.asyncio
+async def test_risk_falls_back_to_rules_while_the_llm_is_down():
+    service = RiskAnalysisService()
+    service.cache = None
+    service.chain = DownChain()
+    result = await service.analyze_risk(ConversationContext.for_message("I have crushing chest pain right now"))
+    assert result.risk_level == "HIGH"
+    assert result.reason.startswith("Rule pre-classifier")
+
+    # No rule match: not escalated, left to the caller to hold for re-triage
+    with pytest.raises(LLMUnavailable):
+        await service.analyze_risk(ConversationContext.for_message("Can I take my metformin with food?"))
+
+# A rule escalation's background LLM summary is skipped, not filled with the rule's own verdict
+@pytest.mark.asyncio
+async def test_rule_escalation_keeps_its_summary_while_the_llm_is_down(client: AsyncClient, patient_token: str):
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.risk_service.chain = DownChain()
+    summaries = metrics.get("risk_fast_path_llm_total", llm_level="HIGH")
+    resp = await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "I have crushing chest pain right now"},
+                             headers={"Authorization": f"Bearer {patient_token}"})
+    escalation_id = resp.json()["escalation_id"]
+
+    async with chat_endpoint.SessionLocal() as db:
+        escalation = await db.get(Escalation, escalation_id)
+    assert "AI triage summary pending" in escalation.triage_summary
+    assert metrics.get("risk_fast_path_llm_total", llm_level="HIGH") == summaries
+
+@pytest.fixture
+async def retriage_jobs(override_get_db):
+    yield
+    async with chat_endpoint.SessionLocal() as db:
+        await db.execute(delete(Job).where(Job.kind == RISK_RETRIAGE))
+        await db.commit()
+
+async def _conversation_rows(conversation_id: int):
+    async with chat_endpoint.SessionLocal() as db:
+        messages = (await db.execute(
+            select(Message).where(Message.conversation_id == conversation_id).order_by(Message.id)
+        )).scalars().all()
+        escalations = (await db.execute(
+            select(func.count(Escalation.id)).where(Escalation.conversation_id == conversation_id)
+        )).scalar()
+        jobs = (await db.execute(
+            select(Job).where(Job.kind == RISK_RETRIAGE, Job.key == f"conversation:{conversation_id}")
+        )).scalars().all()
+    return messages, escalations, jobs
+
+async def _post_while_down(client: AsyncClient, patient_token: str, *contents: str) -> int:
+    headers = {"Authorization": f"Bearer {patient_token}"}
+    conversation_id = 0
+    for content in contents:
+        resp = await client.post("/api/v1/chat/", json={"conversation_id": conversation_id, "content": content}, headers=headers)
+        assert resp.status_code == 200
+        data = resp.json()
+        assert "escalation_id" not in data
+        assert data["content"] == chat_endpoint.DEGRADED_MESSAGE
+        conversation_id = data["conversation_id"]
+    return conversation_id
+
+# Outage: no escalation per message; held messages are re-triaged into one escalation
+@pytest.mark.asyncio
+async def test_outage_holds_messages_then_retriage_escalates_once(client: AsyncClient, patient_token: str,
+                                                                  clinician_token: str, run_jobs, retriage_jobs):
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.risk_service.chain = DownChain()
+    conversation_id = await _post_while_down(client, patient_token, "My head feels odd", "and now my vision is blurry")
+
+    messages, escalations, jobs = await _conversation_rows(conversation_id)
+    assert escalations == 0
+    assert len(jobs) == 2
+    assert [m.risk_reason for m in messages if m.sender_type == "patient"] == [chat_endpoint.HELD_FOR_RETRIAGE] * 2
+
+    status = (await client.get("/api/v1/clinician/status", headers={"Authorization": f"Bearer {clinician_token}"})).json()
+    assert status["degraded"] is True
+    assert status["pending_retriage"] >= 2
+
+    # Still down when the worker gets to them: deferred, no attempt used
+    key = f"conversation:{conversation_id}"
+    assert await run_jobs(key) == 2
+    _, escalations, jobs = await _conversation_rows(conversation_id)
+    assert escalations == 0
+    assert [(j.status, j.attempts) for j in jobs] == [("queued", 0)] * 2
+
+    # Recovered
+    async with chat_endpoint.SessionLocal() as db:
+        await db.execute(Job.__table__.update().where(Job.key == key).values(run_after=datetime.utcnow()))
+        await db.commit()
+    chat_endpoint.risk_service.chain = StubRiskChain("MEDIUM")
+    assert await run_jobs(key) == 2
+    messages, escalations, jobs = await _conversation_rows(conversation_id)
+    assert escalations == 1
+    assert jobs == []
+    assert [m.risk_level.value for m in messages if m.sender_type == "patient"] == ["MEDIUM", "MEDIUM"]
+    assert messages[-1].content == chat_endpoint.ESCALATION_MESSAGE
+
+# A worse held message joins the pending escalation and raises the dashboard's open risk
+@pytest.mark.asyncio
+async def test_retriage_into_pending_escalation_raises_open_risk(client: AsyncClient, patient_token: str,
+                                                                 run_jobs, retriage_jobs):
+    headers = {"Authorization": f"Bearer {patient_token}"}
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.risk_service.chain = StubRiskChain("MEDIUM")
+    first = (await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "I feel strange"}, headers=headers)).json()
+    conversation_id = first["conversation_id"]
+    assert "escalation_id" in first
+
+    chat_endpoint.risk_service.chain = DownChain()
+    held = await client.post("/api/v1/chat/", json={"conversation_id": conversation_id, "content": "and now it is worse"},
+                             headers=headers)
+    assert held.json()["content"] == chat_endpoint.DEGRADED_MESSAGE
+    async with chat_endpoint.SessionLocal() as db:
+        # Only this escalation is open as far as the summary is concerned
+        activity = await db.get(PatientActivity, 1)
+        activity.highest_open_risk = RiskLevel.MEDIUM
+        pending_count = activity.pending_escalation_count
+        await db.commit()
+
+    chat_endpoint.risk_service.chain = StubRiskChain("HIGH")
+    assert await run_jobs(f"conversation:{conversation_id}") == 1
+    _, escalations, _ = await _conversation_rows(conversation_id)
+    assert escalations == 1
+    async with chat_endpoint.SessionLocal() as db:
+        activity = await db.get(PatientActivity, 1)
+    assert (activity.highest_open_risk, activity.pending_escalation_count) == (RiskLevel.HIGH, pending_count)
+
+@pytest.mark.asyncio
+async def test_low_retriage_answers_the_held_message(client: AsyncClient, patient_token: str, run_jobs, retriage_jobs):
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.risk_service.chain = DownChain()
+    conversation_id = await _post_while_down(client, patient_token, "Can I book an appointment?")
+
+    chat_endpoint.risk_service.chain = StubRiskChain("LOW")
+    chat_endpoint.chat_service.chain = CannedChatChain()
+    assert await run_jobs(f"conversation:{conversation_id}") == 1
+    messages, escalations, jobs = await _conversation_rows(conversation_id)
+    assert escalations == 0
+    assert jobs == []
+    assert [m.content for m in messages if m.sender_type == "ai"] == [chat_endpoint.DEGRADED_MESSAGE, "Thanks for waiting."]
+
+@pytest.mark.asyncio
+async def test_status_reports_open_circuit(client: AsyncClient, clinician_token: str, monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    breaker.record_failure()
+    monkeypatch.setattr(clinician_endpoint, "llm_breaker", breaker)
+    resp = await client.get("/api/v1/clinician/status", headers={"Authorization": f"Bearer {clinician_token}"})
+    assert resp.status_code == 200
+    assert resp.json()["degraded"] is True
+    assert resp.json()["llm_circuit"] == "open"
@@ -0,0 +1,60 @@
+import random
+import pytest
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.context import ContextMessage, ConversationContext
+from app.services.fake_llm import FakeChatModel, LatencyDistribution, latency_for, parse_risk_script
+from app.services.llm_scheduler import LLMScheduler, LLMUnavailable, ScheduledLLM
+from app.services.memory import MemoryService
+from app.services.risk import RiskAnalysisService
+
+def test_latency_specs():
+    rng = random.Random(1)
+    assert LatencyDistribution("fixed:250").sample(rng) == 0.25
+    assert all(0.02 <= LatencyDistribution("uniform:20:80").sample(rng) <= 0.08 for _ in range(100))
+    assert LatencyDistribution("normal:10:1000").sample(rng) >= 0
+    samples = sorted(LatencyDistribution("lognormal:300:0.4").sample(rng) for _ in range(1001))
+    assert 0.25 < samples[500] < 0.35
+    assert latency_for("chat", "risk=fixed:5;chat=fixed:7").sample(rng) == 0.007
+    assert latency_for("memory", "risk=fixed:5;chat=fixed:7").sample(rng) == 0
+    with pytest.raises(ValueError):
+        LatencyDistribution("gamma:1:2")
+
+def test_risk_script_cycles():
+    assert parse_risk_script("LOW*2, high") == ["LOW", "LOW", "HIGH"]
+    with pytest.raises(ValueError):
+        parse_risk_script("LOW,SEVERE")
+
+@pytest.mark.asyncio
+async def test_scripted_risk_and_directive():
+    service = RiskAnalysisService()
+    service.cache = None
+    service.llm.llm = FakeChatModel(purpose="risk", risk_script="LOW,MEDIUM")
+    service.chain = service.prompt | service.llm | service.parser
+    levels = [(await service.analyze_risk(ConversationContext.for_message(f"message {i}"))).risk_level.value for i in range(3)]
+    assert levels == ["LOW", "MEDIUM", "LOW"]
+    assert (await service.analyze_risk(ConversationContext.for_message("anything #risk=HIGH"))).risk_level.value == "HIGH"
+
+@pytest.mark.asyncio
+async def test_fake_memory_extraction_follows_the_latest_statement():
+    service = MemoryService()
+    result = await service.chain.ainvoke({
+        "message": ConversationContext([
+            ContextMessage(11, "patient", "I take Advil every day."),
+            ContextMessage(12, "patient", "Actually I stopped taking Advil, and started Metformin."),
+        ]).transcript,
+        "profile_context": "",
+        "format_instructions": "",
+    })
+    assert sorted((i["value"], i["status"], i["source_message_id"]) for i in result["items"]) == [
+        ("Advil", "stopped", 12), ("Metformin", "active", 12),
+    ]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode,match", [("error", "503"), ("throttle", "429"), ("hang", "timed out")])
+async def test_injected_failures_surface_as_provider_errors(mode, match):
+    model = FakeChatModel(purpose="chat", failure_rate=1.0, failure_mode=mode)
+    breaker = CircuitBreaker("test", failure_threshold=10)
+    llm = ScheduledLLM(model, LLMScheduler(), "chat", breaker=breaker, timeout=0.05)
+    with pytest.raises(LLMUnavailable, match=match):
+        await llm.ainvoke("hi")
+    assert breaker.failures == 1
@@ -0,0 +1,74 @@
+import pytest
+from httpx import AsyncClient
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.db.models import Conversation, Message, User
+
+# Incremental history polling (since cursor + ETag)
+@pytest.mark.asyncio
+async def test_history_since_cursor_and_etag(client: AsyncClient, patient_token: str):
+    headers = {"Authorization": f"Bearer {patient_token}"}
+
+    resp = await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "I need a refill for my ibuprofen."}, headers=headers)
+    assert resp.status_code == 200
+    convo_id = resp.json()["conversation_id"]
+
+    # Full history
+    full = await client.get(f"/api/v1/chat/{convo_id}/history", headers=headers)
+    assert full.status_code == 200
+    etag = full.headers["etag"]
+    messages = full.json()
+    ids = [m["id"] for m in messages]
+    assert ids == sorted(ids)
+
+    # Unchanged conversation -> 304
+    not_modified = await client.get(f"/api/v1/chat/{convo_id}/history", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    # Exact tags from a list, or "*"; a tag merely containing ours is not a match
+    listed = await client.get(f"/api/v1/chat/{convo_id}/history", headers={**headers, "If-None-Match": f'"other", {etag}'})
+    assert listed.status_code == 304
+    anything = await client.get(f"/api/v1/chat/{convo_id}/history", headers={**headers, "If-None-Match": "*"})
+    assert anything.status_code == 304
+    wrapped = await client.get(f"/api/v1/chat/{convo_id}/history", headers={**headers, "If-None-Match": f'W/"x{etag[3:]}'})
+    assert wrapped.status_code == 200
+
+    # Rewriting a message's risk (as retriage does) changes the ETag
+    async with chat_endpoint.SessionLocal() as db:
+        message = await db.get(Message, ids[0])
+        message.risk_reason = "Re-triaged"
+        await db.commit()
+    rewritten = await client.get(f"/api/v1/chat/{convo_id}/history", headers={**headers, "If-None-Match": etag})
+    assert rewritten.status_code == 200
+    assert rewritten.json()[0]["risk_reason"] == "Re-triaged"
+    etag = rewritten.headers["etag"]
+
+    # Cursor at the newest message -> nothing new
+    latest = await client.get(f"/api/v1/chat/{convo_id}/history", params={"since": ids[-1]}, headers=headers)
+    assert latest.status_code == 200
+    assert latest.json() == []
+
+    # New message changes the ETag and shows up after the cursor
+    await client.post("/api/v1/chat/", json={"conversation_id": convo_id, "content": "Thanks!"}, headers=headers)
+    newer = await client.get(f"/api/v1/chat/{convo_id}/history", params={"since": ids[-1]}, headers={**headers, "If-None-Match": etag})
+    assert newer.status_code == 200
+    assert newer.headers["etag"] != etag
+    assert newer.json()
+    assert all(m["id"] > ids[-1] for m in newer.json())
+
+class ConnectedRequest:
+    headers = {}
+
+    async def is_disconnected(self):
+        return False
+
+# The push counterpart must not pin a pooled connection while the stream is open
+@pytest.mark.asyncio
+async def test_conversation_events_release_request_session(override_get_db):
+    async with chat_endpoint.SessionLocal() as db:
+        patient = await db.get(User, 1)
+        conversation = Conversation(user_id=patient.id)
+        db.add(conversation)
+        await db.commit()
+
+        response = await chat_endpoint.conversation_events(conversation.id, ConnectedRequest(), None, db, patient)
+        assert not db.in_transaction()
+        await response.body_iterator.aclose()
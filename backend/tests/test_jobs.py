@@ -0,0 +1,232 @@
+import asyncio
+import uuid
+import pytest
+from sqlalchemy import delete, select
+from app import worker as worker_module
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.db.models import Job
+from app.services import jobs
+from app.services.jobs import JobWorker, claim, complete, enqueue, fail
+from app.services.facts import get_profile
+from app.services.memory import MemoryService, PendingMessage
+
+@pytest.fixture
+async def kind(override_get_db):
+    # A kind of its own per test, so leftovers from other runs are never claimed
+    name = f"test.{uuid.uuid4().hex}"
+    yield name
+    async with chat_endpoint.SessionLocal() as db:
+        await db.execute(delete(Job).where(Job.kind == name))
+        await db.commit()
+
+async def _enqueue(kind: str, *keys, delay: float = 0, **options):
+    async with chat_endpoint.SessionLocal() as db:
+        queued = [await enqueue(db, kind, {"n": i}, key=key, delay=delay, **options) for i, key in enumerate(keys)]
+        await db.commit()
+    return [job.id for job in queued]
+
+async def _claim(kind: str):
+    async with chat_endpoint.SessionLocal() as db:
+        return await claim(db, [kind])
+
+async def _jobs(kind: str):
+    async with chat_endpoint.SessionLocal() as db:
+        return (await db.execute(select(Job).where(Job.kind == kind).order_by(Job.id))).scalars().all()
+
+# A ready job brings along every queued job with its key, even delayed ones
+@pytest.mark.asyncio
+async def test_claim_coalesces_jobs_with_the_same_key(kind):
+    first = await _enqueue(kind, "patient:1")
+    delayed = await _enqueue(kind, "patient:1", "patient:1", "patient:2", delay=60)
+
+    group = await _claim(kind)
+    assert [job.id for job in group] == first + delayed[:2]
+    assert all(job.status == "running" and job.attempts == 1 for job in group)
+    # patient:2 is not ready yet
+    assert await _claim(kind) == []
+
+# Jobs for a key that is being worked on wait for that run to finish
+@pytest.mark.asyncio
+async def test_busy_key_is_left_alone(kind):
+    await _enqueue(kind, "patient:1")
+    group = await _claim(kind)
+    later = await _enqueue(kind, "patient:1", "patient:2")
+
+    assert [job.id for job in await _claim(kind)] == [later[1]]
+    assert await _claim(kind) == []
+    async with chat_endpoint.SessionLocal() as db:
+        await complete(db, group)
+    assert [job.id for job in await _claim(kind)] == [later[0]]
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_get_disjoint_whole_groups(kind):
+    keys = [f"patient:{i}" for i in range(4)]
+    await _enqueue(kind, *keys, *keys, *keys)
+
+    groups = await asyncio.gather(*[_claim(kind) for _ in range(6)])
+    claimed = [group for group in groups if group]
+    # Every key claimed exactly once, with all three of its jobs
+    assert sorted(group[0].key for group in claimed) == keys
+    assert all(len(group) == 3 and {job.key for job in group} == {group[0].key} for group in claimed)
+
+# A row held by another transaction (e.g. a retry being written) is skipped, not waited on
+@pytest.mark.asyncio
+async def test_claim_skips_rows_locked_elsewhere(kind):
+    held, free = await _enqueue(kind, None, None)
+    async with chat_endpoint.SessionLocal() as other:
+        await other.execute(select(Job).where(Job.id == held).with_for_update())
+        group = await asyncio.wait_for(_claim(kind), timeout=5)
+        assert [job.id for job in group] == [free]
+        assert await asyncio.wait_for(_claim(kind), timeout=5) == []
+        await other.rollback()
+    assert [job.id for job in await _claim(kind)] == [held]
+
+@pytest.mark.asyncio
+async def test_failed_jobs_back_off_then_go_dead(kind):
+    await _enqueue(kind, "patient:1", max_attempts=2)
+
+    group = await _claim(kind)
+    async with chat_endpoint.SessionLocal() as db:
+        await fail(db, group, "boom")
+    [job] = await _jobs(kind)
+    assert job.status == "queued" and job.last_error == "boom"
+    assert job.run_after > job.created_at
+    assert await _claim(kind) == []  # still backing off
+
+    async with chat_endpoint.SessionLocal() as db:
+        job.run_after = job.created_at
+        await db.merge(job)
+        await db.commit()
+    group = await _claim(kind)
+    async with chat_endpoint.SessionLocal() as db:
+        await fail(db, group, "boom again")
+    [job] = await _jobs(kind)
+    assert (job.status, job.attempts, job.last_error) == ("dead", 2, "boom again")
+    assert await _claim(kind) == []
+
+@pytest.mark.asyncio
+async def test_backoff_grows_and_is_capped():
+    assert jobs.backoff_seconds(1, base=5) < jobs.backoff_seconds(3, base=5)
+    assert jobs.backoff_seconds(30, base=5) <= jobs.MAX_BACKOFF_SECONDS + 5
+
+# The worker runs each group once and deletes finished jobs; failures stay for a retry
+@pytest.mark.asyncio
+async def test_worker_runs_groups_and_records_failures(kind):
+    await _enqueue(kind, "patient:1", "patient:1", "patient:2")
+    await _enqueue(kind, "patient:3")
+    calls = []
+
+    async def handler(group):
+        calls.append([job.payload["n"] for job in group])
+        if group[0].key == "patient:3":
+            raise RuntimeError("handler failed")
+
+    worker = JobWorker({kind: handler}, session_factory=chat_endpoint.SessionLocal)
+    assert await worker.run_pending() == 4
+    assert calls == [[0, 1], [2], [0]]
+    [left] = await _jobs(kind)
+    assert (left.key, left.status, left.last_error) == ("patient:3", "queued", "RuntimeError: handler failed")
+
+# stop() lets the running job finish, then run() returns
+@pytest.mark.asyncio
+async def test_worker_stop_drains_in_flight_jobs(kind):
+    await _enqueue(kind, "patient:1")
+    started, finished = asyncio.Event(), []
+
+    async def handler(group):
+        started.set()
+        await asyncio.sleep(0.2)
+        finished.extend(job.id for job in group)
+
+    worker = JobWorker({kind: handler}, concurrency=2, poll_seconds=0.05, drain_seconds=5,
+                       session_factory=chat_endpoint.SessionLocal)
+    running = asyncio.create_task(worker.run())
+    await asyncio.wait_for(started.wait(), timeout=5)
+    worker.stop()
+    await asyncio.wait_for(running, timeout=5)
+    assert len(finished) == 1
+    assert await _jobs(kind) == []
+
+# Past the drain timeout the job is handed back instead of waiting for the lock timeout
+@pytest.mark.asyncio
+async def test_worker_releases_jobs_it_cannot_drain(kind):
+    await _enqueue(kind, "patient:1")
+    started = asyncio.Event()
+
+    async def handler(group):
+        started.set()
+        await asyncio.sleep(60)
+
+    worker = JobWorker({kind: handler}, concurrency=1, poll_seconds=0.05, drain_seconds=0.1,
+                       session_factory=chat_endpoint.SessionLocal)
+    running = asyncio.create_task(worker.run())
+    await asyncio.wait_for(started.wait(), timeout=5)
+    worker.stop()
+    await asyncio.wait_for(running, timeout=5)
+    [job] = await _jobs(kind)
+    assert (job.status, job.attempts) == ("queued", 0)
+
+class ScriptedMemoryChain:
+    def __init__(self, items):
+        self.items = items
+        self.inputs = []
+
+    async def ainvoke(self, inputs):
+        self.inputs.append(inputs)
+        return {"items": self.items}
+
+class LowRiskChain:
+    async def ainvoke(self, inputs):
+        return {"risk_level": "LOW", "reason": "stub triage", "summary": "- stub triage"}
+
+class CannedChatChain:
+    async def ainvoke(self, inputs):
+        return {"content": "Noted.", "confidence": "High", "reason": "stub", "citations": []}
+
+# One LLM call for the batch, provenance still per message
+@pytest.mark.asyncio
+async def test_batch_extraction_keeps_per_message_provenance(scratch_patient):
+    service = MemoryService()
+    service.chain = ScriptedMemoryChain([
+        {"value": "Ibuprofen", "category": "medication", "status": "stopped", "source_message_id": 103},
+        {"value": "Ibuprofen", "category": "medication", "status": "active", "source_message_id": 101},
+        {"value": "Headache", "category": "symptom", "status": "active", "source_message_id": 102},
+        {"value": "Penicillin", "category": "allergy", "status": "active", "source_message_id": 999},
+    ])
+    batch = [
+        PendingMessage(101, "I take Advil daily"),
+        PendingMessage(102, "My head hurts"),
+        PendingMessage(103, "Actually I stopped the Advil"),
+    ]
+    async with chat_endpoint.SessionLocal() as session:
+        await service.extract_and_update_memory(session, scratch_patient, batch)
+
+    assert len(service.chain.inputs) == 1
+    assert service.chain.inputs[0]["message"] == "[101] I take Advil daily\n[102] My head hurts\n[103] Actually I stopped the Advil"
+
+    async with chat_endpoint.SessionLocal() as session:
+        profile = await get_profile(session, scratch_patient)
+    assert [(m["value"], m["status"], m["provenance_pointer"]) for m in profile.medications] == [("Ibuprofen", "stopped", 103)]
+    assert profile.symptoms[0]["provenance_pointer"] == 102
+    # An id outside the batch falls back to the newest message
+    assert profile.allergies[0]["provenance_pointer"] == 103
+
+# Messages posted back to back reach the worker as one extraction job group
+@pytest.mark.asyncio
+async def test_chat_messages_are_extracted_together(client, patient_token, run_jobs):
+    headers = {"Authorization": f"Bearer {patient_token}"}
+    chat_endpoint.risk_service.cache = None
+    chat_endpoint.risk_service.chain = LowRiskChain()
+    chat_endpoint.chat_service.chain = CannedChatChain()
+    worker_module.memory_service.chain = ScriptedMemoryChain([])
+    await run_jobs("patient:1")  # earlier leftovers
+    worker_module.memory_service.chain = ScriptedMemoryChain([])
+
+    first = await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "I take Advil daily"}, headers=headers)
+    conversation_id = first.json()["conversation_id"]
+    await client.post("/api/v1/chat/", json={"conversation_id": conversation_id, "content": "and my head hurts"}, headers=headers)
+
+    assert await run_jobs("patient:1") == 2
+    assert len(worker_module.memory_service.chain.inputs) == 1
+    lines = worker_module.memory_service.chain.inputs[0]["message"].splitlines()
+    assert [line.split("] ", 1)[1] for line in lines] == ["I take Advil daily", "and my head hurts"]
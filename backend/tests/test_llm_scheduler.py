@@ -0,0 +1,117 @@
+import asyncio
+import time
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from app.core.metrics import metrics
+from app.services.llm_scheduler import LLMScheduler, ScheduledLLM
+
+class Throttled(Exception):
+    pass
+
+async def hold(scheduler: LLMScheduler, purpose: str, order: list, gate: asyncio.Event):
+    async with scheduler.slot(purpose):
+        order.append(purpose)
+        await gate.wait()
+
+@pytest.mark.asyncio
+async def test_waiting_calls_run_risk_then_chat_then_memory():
+    scheduler = LLMScheduler(max_concurrency=1, reserve=0)
+    order, gate = [], asyncio.Event()
+    blocker = asyncio.create_task(hold(scheduler, "chat", order, gate))
+    await asyncio.sleep(0)
+
+    # Queued in the worst order; memory was first in line but runs last
+    waiting = [asyncio.create_task(hold(scheduler, p, order, gate)) for p in ("memory", "chat", "risk")]
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth() == 3
+    assert metrics.get("llm_queue_depth", purpose="memory") == 1
+
+    gate.set()
+    await asyncio.gather(blocker, *waiting)
+    assert order == ["chat", "risk", "chat", "memory"]
+    assert scheduler.in_flight == 0
+    assert metrics.get("llm_queue_depth", purpose="memory") == 0
+
+@pytest.mark.asyncio
+async def test_risk_is_not_starved_by_a_memory_backlog():
+    scheduler = LLMScheduler(max_concurrency=3, reserve=2)
+    order, gate = [], asyncio.Event()
+    backlog = [asyncio.create_task(hold(scheduler, "memory", order, gate)) for _ in range(20)]
+    await asyncio.sleep(0)
+    # Background work only gets the unreserved slot
+    assert scheduler.in_flight == 1
+    assert scheduler.queue_depth("memory") == 19
+
+    started = time.perf_counter()
+    await asyncio.wait_for(scheduler.acquire("risk"), timeout=0.5)
+    assert time.perf_counter() - started < 0.1
+    scheduler.release()
+
+    gate.set()
+    await asyncio.gather(*backlog)
+    assert len(order) == 20
+
+@pytest.mark.asyncio
+async def test_throttling_halves_concurrency_and_successes_restore_it():
+    scheduler = LLMScheduler(max_concurrency=8, min_concurrency=1)
+    with pytest.raises(Throttled):
+        async with scheduler.slot("chat"):
+            raise Throttled("429 RESOURCE_EXHAUSTED: quota exceeded")
+    assert scheduler.limit == 4
+    with pytest.raises(ValueError):
+        async with scheduler.slot("chat"):
+            raise ValueError("bad output")  # not a quota error: limit unchanged
+    assert scheduler.limit == 4
+
+    for _ in range(40):
+        async with scheduler.slot("chat"):
+            pass
+    assert scheduler.limit == 8
+    assert scheduler.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_token_bucket_spaces_out_calls():
+    scheduler = LLMScheduler(requests_per_minute=600, burst=1)  # one call per 100ms
+    started = time.perf_counter()
+    for _ in range(3):
+        async with scheduler.slot("chat"):
+            pass
+    assert time.perf_counter() - started >= 0.18
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    scheduler = LLMScheduler(max_concurrency=1, reserve=0)
+    await scheduler.acquire("chat")
+    waiter = asyncio.create_task(scheduler.acquire("memory"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.queue_depth() == 0
+
+    scheduler.release()
+    await asyncio.wait_for(scheduler.acquire("chat"), timeout=0.5)
+    scheduler.release()
+    assert scheduler.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_scheduled_llm_holds_a_slot_for_the_whole_stream():
+    scheduler = LLMScheduler(max_concurrency=1, reserve=0)
+    llm = ScheduledLLM(FakeListChatModel(responses=["hello there"]), scheduler, "chat")
+    chain = ChatPromptTemplate.from_messages([("human", "{input}")]) | llm | StrOutputParser()
+
+    chunks = []
+    async for chunk in chain.astream({"input": "hi"}):
+        chunks.append(chunk)
+        assert scheduler.in_flight == 1
+    assert "".join(chunks) == "hello there"
+    assert scheduler.in_flight == 0
+
+    assert await chain.ainvoke({"input": "hi"}) == "hello there"
+    assert scheduler.in_flight == 0
+
+def test_unknown_purpose_is_rejected():
+    with pytest.raises(ValueError):
+        ScheduledLLM(FakeListChatModel(responses=["x"]), LLMScheduler(), "batch")
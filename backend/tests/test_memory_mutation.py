@@ -5,7 +5,7 @@ from app.core.security import create_access_token
 
 # 2. Test Memory Mutation
 @pytest.mark.asyncio
-async def test_memory_mutation(client: AsyncClient, patient_token: str):
+async def test_memory_mutation(client: AsyncClient, patient_token: str, run_jobs):
     headers = {"Authorization": f"Bearer {patient_token}"}
 
     # CLEANUP: Clear profile for patient 1 before starting to avoid legacy data from previous runs
@@ -19,8 +19,8 @@ async def test_memory_mutation(client: AsyncClient, patient_token: str):
     resp1 = await client.post("/api/v1/chat/", json=payload1, headers=headers)
     assert resp1.status_code == 200
     
-    # Wait for background task to process memory (MemoryService extraction runs in background)
-    await asyncio.sleep(4) 
+    # Run the queued memory extraction job (normally picked up by the worker process)
+    await run_jobs("patient:1")
     
     # Verify Profile
     prof_resp1 = await client.get("/api/v1/chat/patient/profile", headers=headers)
@@ -42,7 +42,7 @@ async def test_memory_mutation(client: AsyncClient, patient_token: str):
     resp2 = await client.post("/api/v1/chat/", json=payload2, headers=headers)
     assert resp2.status_code == 200
     
-    await asyncio.sleep(4)
+    await run_jobs("patient:1")
     
     # Verify Profile Update
     prof_resp2 = await client.get("/api/v1/chat/patient/profile", headers=headers)
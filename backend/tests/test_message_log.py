@@ -0,0 +1,49 @@
+import json
+import pytest
+from httpx import AsyncClient
+
+# Clinician message log: keyset pagination, filters and NDJSON streaming
+@pytest.mark.asyncio
+async def test_message_log_pagination_and_stream(client: AsyncClient, patient_token: str, clinician_token: str):
+    patient_headers = {"Authorization": f"Bearer {patient_token}"}
+    clinician_headers = {"Authorization": f"Bearer {clinician_token}"}
+
+    resp = await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "My knee is a bit stiff this morning."}, headers=patient_headers)
+    assert resp.status_code == 200
+    convo_id = resp.json()["conversation_id"]
+
+    url = "/api/v1/clinician/patient/1/messages"
+
+    # Patients cannot read the log
+    forbidden = await client.get(url, headers=patient_headers)
+    assert forbidden.status_code == 403
+
+    # Walk the conversation one message per page
+    seen = []
+    params = {"conversation_id": convo_id, "limit": 1}
+    while True:
+        page = await client.get(url, params=params, headers=clinician_headers)
+        assert page.status_code == 200
+        assert len(page.json()) <= 1
+        seen += [m["id"] for m in page.json()]
+        cursor = page.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        params["before"] = cursor
+    assert len(seen) >= 2
+    assert seen == sorted(seen, reverse=True)
+
+    # Unpaginated view of the same conversation matches the walk
+    full = await client.get(url, params={"conversation_id": convo_id}, headers=clinician_headers)
+    assert [m["id"] for m in full.json()] == seen
+
+    # NDJSON stream returns the same rows
+    streamed = await client.get(url, params={"conversation_id": convo_id, "format": "ndjson"}, headers=clinician_headers)
+    assert streamed.status_code == 200
+    assert streamed.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in streamed.text.splitlines()] == full.json()
+
+    # Risk filter
+    low = await client.get(url, params={"conversation_id": convo_id, "risk_level": "LOW"}, headers=clinician_headers)
+    assert low.status_code == 200
+    assert all(m["risk_level"] == "LOW" for m in low.json())
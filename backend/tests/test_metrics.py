@@ -0,0 +1,66 @@
+import pytest
+from httpx import AsyncClient
+from app.core.metrics import Metrics, metrics
+from app.services.fake_llm import FakeChatModel
+from app.services.llm_scheduler import LLMScheduler, ScheduledLLM
+
+def test_histogram_buckets_are_cumulative_in_the_exposition():
+    registry = Metrics()
+    for value in (0.003, 0.2, 0.2, 12):
+        registry.observe("stage_seconds", value, stage="risk")
+    registry.incr("llm_calls_total", purpose="risk", outcome="ok")
+    registry.set("circuit_open", 0, circuit='say "hi"')
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="risk",le="0.005"} 1' in text
+    assert 'stage_seconds_bucket{stage="risk",le="0.25"} 3' in text
+    assert 'stage_seconds_bucket{stage="risk",le="10"} 3' in text
+    assert 'stage_seconds_bucket{stage="risk",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="risk"} 4' in text
+    assert 'llm_calls_total{outcome="ok",purpose="risk"} 1' in text
+    assert 'circuit_open{circuit="say \\"hi\\""} 0' in text
+    assert "# TYPE stage_seconds histogram" in text
+
+@pytest.mark.asyncio
+async def test_llm_calls_are_timed_by_outcome_with_token_counts():
+    before = metrics.get("llm_tokens_total", purpose="chat", kind="output")
+    llm = ScheduledLLM(FakeChatModel(purpose="chat"), LLMScheduler(), "chat")
+    await llm.ainvoke("hello there")
+    chunks = [chunk async for chunk in llm.astream("hello there")]
+    assert len(chunks) > 1
+    # Both calls report the same usage (the stream on its last chunk)
+    per_call = (metrics.get("llm_tokens_total", purpose="chat", kind="output") - before) / 2
+    assert per_call > 0 and per_call.is_integer()
+    assert metrics.histogram("llm_call_seconds", purpose="chat", outcome="ok").count >= 2
+
+    failing = ScheduledLLM(FakeChatModel(purpose="chat", failure_rate=1.0, failure_mode="throttle"), LLMScheduler(), "chat")
+    failed_before = metrics.get("llm_calls_total", purpose="chat", outcome="throttled")
+    with pytest.raises(RuntimeError):
+        await failing.ainvoke("hello")
+    assert metrics.get("llm_calls_total", purpose="chat", outcome="throttled") == failed_before + 1
+
+@pytest.mark.asyncio
+async def test_chat_request_is_broken_down_into_stages_and_queries(client: AsyncClient, patient_token: str):
+    route = dict(method="POST", route="/api/v1/chat/")
+    requests_before = metrics.histogram("http_request_db_queries", **route)
+    requests_before = requests_before.count if requests_before else 0
+    resp = await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "Can I book an appointment?"},
+                             headers={"Authorization": f"Bearer {patient_token}"})
+    assert resp.status_code == 200
+
+    queries = metrics.histogram("http_request_db_queries", **route)
+    assert queries.count == requests_before + 1
+    assert queries.sum > 0
+    assert metrics.histogram("http_request_seconds", status=200, **route).count >= 1
+    # Templated, with the prefixes of the included routers, whatever the id
+    history = await client.get(f"/api/v1/chat/{resp.json()['conversation_id']}/history",
+                               headers={"Authorization": f"Bearer {patient_token}"})
+    assert history.status_code == 200
+    assert metrics.histogram("http_request_seconds", method="GET", route="/api/v1/chat/{conversation_id}/history",
+                             status=200).count >= 1
+
+    text = (await client.get("/metrics")).text
+    for stage in ("validate", "redact", "profile", "save_message", "rules", "risk", "reply", "save_reply"):
+        assert f'stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'llm_call_seconds_count{outcome="ok",purpose="risk"}' in text
+    assert 'jobs{kind="memory.extract",status="queued"}' in text
+    assert "db_query_seconds_count" in text
@@ -0,0 +1,118 @@
+import uuid
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.core.security import create_access_token
+from app.db.models import PatientFact, User
+from app.services.facts import get_profile, normalize_value, upsert_facts
+
+def _item(value: str, status: str, message_id: int, category: str = "medication"):
+    return {"value": value, "category": category, "status": status, "source_message_id": message_id}
+
+async def _upsert(patient_id: int, *items):
+    async with chat_endpoint.SessionLocal() as db:
+        await upsert_facts(db, patient_id, list(items))
+        await db.commit()
+
+async def _profile(patient_id: int):
+    async with chat_endpoint.SessionLocal() as db:
+        return await get_profile(db, patient_id)
+
+def test_normalize_value():
+    assert normalize_value("  Ibuprofen   200mg ") == normalize_value("ibuprofen 200MG") == "ibuprofen 200mg"
+
+# One row per fact: case and spacing variants update it in place
+@pytest.mark.asyncio
+async def test_upsert_merges_variants_and_tracks_stop(scratch_patient):
+    await _upsert(scratch_patient, _item("Ibuprofen", "active", 1), _item("Headache", "active", 1, "symptom"))
+    await _upsert(scratch_patient, _item("ibuprofen ", "stopped", 2))
+    profile = await _profile(scratch_patient)
+    [med] = profile.medications
+    assert (med["value"], med["status"], med["provenance_pointer"]) == ("Ibuprofen", "stopped", 2)
+    assert "stopped_at" in med
+    assert [s["value"] for s in profile.symptoms] == ["Headache"]
+
+    await _upsert(scratch_patient, _item("IBUPROFEN", "active", 3))
+    [med] = (await _profile(scratch_patient)).medications
+    assert med["status"] == "active" and "stopped_at" not in med
+
+# A fact from an older message never overwrites a newer one (out-of-order commits)
+@pytest.mark.asyncio
+async def test_older_message_does_not_roll_a_fact_back(scratch_patient):
+    await _upsert(scratch_patient, _item("Warfarin", "stopped", 10))
+    await _upsert(scratch_patient, _item("Warfarin", "active", 4))
+    [med] = (await _profile(scratch_patient)).medications
+    assert (med["status"], med["provenance_pointer"]) == ("stopped", 10)
+
+# Within one batch the later message wins
+@pytest.mark.asyncio
+async def test_duplicate_fact_in_one_batch(scratch_patient):
+    await _upsert(scratch_patient, _item("Aspirin", "active", 1), _item("aspirin", "stopped", 2))
+    [med] = (await _profile(scratch_patient)).medications
+    assert (med["status"], med["provenance_pointer"]) == ("stopped", 2)
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_reads_facts(client: AsyncClient, scratch_patient):
+    await _upsert(scratch_patient, _item("Penicillin", "active", 7, "allergy"))
+    token = create_access_token(subject=str(scratch_patient))
+    resp = await client.get("/api/v1/chat/patient/profile", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [a["value"] for a in body["allergies"]] == ["Penicillin"]
+    assert body["medications"] == []
+
+    resp = await client.delete("/api/v1/chat/patient/profile", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 204
+    assert (await _profile(scratch_patient)).allergies == []
+
+@pytest.fixture
+async def clinic_patients(override_get_db):
+    """Two clinics, a patient on a marker drug in each, and a clinician scoped to the first."""
+    marker = f"Warfarin-{uuid.uuid4().hex[:8]}"
+    async with chat_endpoint.SessionLocal() as db:
+        users = [
+            User(email=f"facts-{uuid.uuid4().hex}@example.com", hashed_password="!", role=role, clinic_id=clinic)
+            for role, clinic in [("patient", "facts-a"), ("patient", "facts-a"), ("patient", "facts-b"), ("clinician", "facts-a")]
+        ]
+        db.add_all(users)
+        await db.commit()
+    patients = users[:3]
+    await _upsert(patients[0].id, _item(marker, "active", 1))
+    await _upsert(patients[1].id, _item(marker.upper(), "stopped", 1))
+    await _upsert(patients[2].id, _item(marker, "active", 1))
+    yield marker, [p.id for p in patients], create_access_token(subject=str(users[3].id))
+    async with chat_endpoint.SessionLocal() as db:
+        ids = [u.id for u in users]
+        await db.execute(delete(PatientFact).where(PatientFact.patient_id.in_(ids)))
+        await db.execute(delete(User).where(User.id.in_(ids)))
+        await db.commit()
+
+# "Everyone active on warfarin", across patients, within the clinician's clinic
+@pytest.mark.asyncio
+async def test_clinician_fact_search(client: AsyncClient, clinician_token: str, patient_token: str, clinic_patients):
+    marker, patient_ids, scoped_token = clinic_patients
+
+    resp = await client.get("/api/v1/clinician/facts", params={"category": "medication", "value": marker},
+                            headers={"Authorization": f"Bearer {patient_token}"})
+    assert resp.status_code == 403
+
+    unscoped = {"Authorization": f"Bearer {clinician_token}"}
+    resp = await client.get("/api/v1/clinician/facts", params={"category": "medication", "value": marker.lower(), "status": "active"},
+                            headers=unscoped)
+    assert resp.status_code == 200
+    assert sorted(f["patient_id"] for f in resp.json()) == [patient_ids[0], patient_ids[2]]
+
+    resp = await client.get("/api/v1/clinician/facts", params={"category": "medication", "value": marker},
+                            headers={"Authorization": f"Bearer {scoped_token}"})
+    assert sorted(f["patient_id"] for f in resp.json()) == patient_ids[:2]
+
+    # Keyset pages cover every match exactly once
+    first = await client.get("/api/v1/clinician/facts", params={"category": "medication", "value": marker, "limit": 2}, headers=unscoped)
+    second = await client.get("/api/v1/clinician/facts", params={"category": "medication", "value": marker, "limit": 2,
+                                                                 "cursor": first.headers["X-Next-Cursor"]}, headers=unscoped)
+    assert sorted(f["patient_id"] for f in first.json() + second.json()) == patient_ids
+    assert "X-Next-Cursor" not in second.headers
+
+    resp = await client.get("/api/v1/clinician/facts", params={"category": "diagnosis", "value": marker}, headers=unscoped)
+    assert resp.status_code == 400
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.core.metrics import metrics
+from app.db.models import PatientProfile
+from app.services.facts import get_profile
+from app.services.memory import MemoryService, PendingMessage
+
+class EchoMedicationChain:
+    """Extracts each message as an active medication, after an LLM-like pause."""
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        items = []
+        for line in inputs["message"].splitlines():
+            message_id, content = line[1:].split("] ", 1)
+            items.append({"value": content, "category": "medication", "status": "active",
+                          "source_message_id": int(message_id)})
+        return {"items": items}
+
+async def _profile(patient_id: int):
+    async with chat_endpoint.SessionLocal() as session:
+        header = (await session.execute(
+            select(PatientProfile).where(PatientProfile.patient_id == patient_id)
+        )).scalars().one()
+        return header.version, await get_profile(session, patient_id)
+
+async def _extract(service: MemoryService, patient_id: int, message_id: int, content: str):
+    async with chat_endpoint.SessionLocal() as session:
+        await service.extract_and_update_memory(session, patient_id, [PendingMessage(message_id, content)])
+
+# Simultaneous extractions all read the same profile; none of their facts may be lost
+@pytest.mark.asyncio
+async def test_concurrent_extractions_keep_every_fact(scratch_patient):
+    service = MemoryService()
+    service.chain = EchoMedicationChain()
+    conflicts = metrics.get("profile_update_conflicts_total")
+
+    drugs = [f"Drug{i}" for i in range(12)]
+    await asyncio.gather(*[_extract(service, scratch_patient, i + 1, drug) for i, drug in enumerate(drugs)])
+
+    version, profile = await _profile(scratch_patient)
+    assert sorted(m["value"] for m in profile.medications) == sorted(drugs)
+    assert version == len(drugs)
+    # Conflicts were resolved by reapplying, not by asking the LLM again
+    assert service.chain.calls == len(drugs)
+    assert metrics.get("profile_update_conflicts_total") > conflicts
+
+# A writer that read an old version retries against the latest one
+@pytest.mark.asyncio
+async def test_stale_write_reapplies_onto_latest_profile(scratch_patient):
+    service = MemoryService()
+    service.chain = EchoMedicationChain(delay=0)
+    await _extract(service, scratch_patient, 1, "Ibuprofen")
+
+    slow = MemoryService()
+    slow.chain = EchoMedicationChain(delay=0.2)
+    pending = asyncio.create_task(_extract(slow, scratch_patient, 3, "Metformin"))
+    await asyncio.sleep(0.05)  # the slow extraction has read version 1
+    await _extract(service, scratch_patient, 2, "Lisinopril")
+    await pending
+
+    version, profile = await _profile(scratch_patient)
+    assert [(m["value"], m["provenance_pointer"]) for m in profile.medications] == [
+        ("Ibuprofen", 1), ("Lisinopril", 2), ("Metformin", 3),
+    ]
+    assert version == 3
+    assert slow.chain.calls == 1
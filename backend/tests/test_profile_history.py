@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, select
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.db.models import Conversation, Escalation, Message, PatientActivity, ProfileSnapshot, User
+from app.schemas import RiskLevel
+from app.services import facts
+from app.services.facts import delete_profile, get_profile, profile_at_version
+from app.services.memory import MemoryService, PendingMessage
+
+class ScriptedMemoryChain:
+    def __init__(self):
+        self.items = []
+
+    async def ainvoke(self, inputs):
+        return {"items": self.items}
+
+FACT_LISTS = ("medications", "symptoms", "allergies", "chief_complaint")
+
+def _facts(profile):
+    return {field: getattr(profile, field) for field in FACT_LISTS}
+
+@pytest.fixture
+def memory(scratch_patient, monkeypatch):
+    monkeypatch.setattr(facts, "PROFILE_SNAPSHOT_INTERVAL", 2)
+    service = MemoryService()
+    service.chain = ScriptedMemoryChain()
+
+    async def extract(message_id: int, *items):
+        service.chain.items = [
+            {"value": value, "category": category, "status": status, "source_message_id": message_id}
+            for value, category, status in items
+        ]
+        async with chat_endpoint.SessionLocal() as session:
+            await service.extract_and_update_memory(session, scratch_patient, [PendingMessage(message_id, "...")])
+    return extract
+
+async def _current(patient_id: int):
+    async with chat_endpoint.SessionLocal() as session:
+        return await get_profile(session, patient_id)
+
+async def _at(patient_id: int, version):
+    async with chat_endpoint.SessionLocal() as session:
+        return await profile_at_version(session, patient_id, version)
+
+# Any past version rebuilds exactly, whether or not a snapshot sits in between
+@pytest.mark.asyncio
+async def test_every_version_rebuilds_from_snapshots_and_events(scratch_patient, memory):
+    steps = [
+        (1, ("Ibuprofen", "medication", "active"), ("Headache", "symptom", "active")),
+        (2, ("Penicillin", "allergy", "active")),
+        (3, ("ibuprofen", "medication", "stopped")),
+        (4, ("Headache", "symptom", "resolved"), ("Metformin", "medication", "active")),
+        (5, ("Ibuprofen", "medication", "active")),
+    ]
+    seen = []
+    for message_id, *items in steps:
+        await memory(message_id, *items)
+        seen.append(_facts(await _current(scratch_patient)))
+
+    async with chat_endpoint.SessionLocal() as session:
+        snapshots = (await session.execute(
+            select(ProfileSnapshot.version).where(ProfileSnapshot.patient_id == scratch_patient).order_by(ProfileSnapshot.version)
+        )).scalars().all()
+    assert snapshots == [2, 4]
+
+    for version, expected in enumerate(seen, start=1):
+        rebuilt = await _at(scratch_patient, version)
+        assert rebuilt.version == version
+        assert _facts(rebuilt) == expected
+
+    assert _facts(await _at(scratch_patient, None)) == {field: [] for field in FACT_LISTS}
+
+# Clearing the profile is a new version; earlier versions stay readable
+@pytest.mark.asyncio
+async def test_clear_is_recorded_as_a_version(scratch_patient, memory):
+    await memory(1, ("Aspirin", "medication", "active"))
+    async with chat_endpoint.SessionLocal() as session:
+        await delete_profile(session, scratch_patient)
+        await session.commit()
+    await memory(2, ("Warfarin", "medication", "active"))
+
+    assert [m["value"] for m in (await _at(scratch_patient, 1)).medications] == ["Aspirin"]
+    assert (await _at(scratch_patient, 2)).medications == []
+    assert [m["value"] for m in (await _at(scratch_patient, 3)).medications] == ["Warfarin"]
+    assert [m["value"] for m in (await _current(scratch_patient)).medications] == ["Warfarin"]
+
+@pytest.fixture
+async def conversation(scratch_patient):
+    async with chat_endpoint.SessionLocal() as db:
+        conversation = Conversation(user_id=scratch_patient)
+        db.add(conversation)
+        await db.commit()
+    yield conversation.id
+    async with chat_endpoint.SessionLocal() as db:
+        await db.execute(delete(Escalation).where(Escalation.conversation_id == conversation.id))
+        await db.execute(delete(Message).where(Message.conversation_id == conversation.id))
+        await db.execute(delete(Conversation).where(Conversation.id == conversation.id))
+        await db.execute(delete(PatientActivity).where(PatientActivity.patient_id == scratch_patient))
+        await db.commit()
+
+async def _message(conversation_id: int) -> Message:
+    async with chat_endpoint.SessionLocal() as db:
+        message = Message(conversation_id=conversation_id, sender_type="patient", content="...",
+                          content_redacted="...", timestamp=datetime.utcnow())
+        db.add(message)
+        await db.commit()
+        return message
+
+# Escalations keep a (profile_id, version) reference instead of a copy of the profile
+@pytest.mark.asyncio
+async def test_escalation_shows_profile_as_of_escalation(client: AsyncClient, clinician_token: str,
+                                                         scratch_patient, conversation, memory):
+    await memory(1, ("Ibuprofen", "medication", "active"))
+    trigger = await _message(conversation)
+    async with chat_endpoint.SessionLocal() as db:
+        patient = await db.get(User, scratch_patient)
+        risk = SimpleNamespace(risk_level=RiskLevel.HIGH, reason="stub", summary="- stub")
+        response = await chat_endpoint._escalate(db, patient, trigger, risk)
+        escalation = await db.get(Escalation, response.escalation_id)
+    assert escalation.patient_profile_snapshot is None
+    assert escalation.profile_version == 1 and escalation.profile_id is not None
+
+    await asyncio.sleep(0.01)
+    later = await _message(conversation)
+    await memory(later.id, ("Ibuprofen", "medication", "stopped"), ("Warfarin", "medication", "active"))
+
+    headers = {"Authorization": f"Bearer {clinician_token}"}
+    resp = await client.get(f"/api/v1/escalations/{response.escalation_id}/profile", headers=headers)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["version"] == 1
+    assert [(m["value"], m["status"]) for m in body["medications"]] == [("Ibuprofen", "active")]
+
+    # Point in time by message: what was known when each message was sent
+    history = f"/api/v1/clinician/patient/{scratch_patient}/profile/history"
+    at_trigger = (await client.get(history, params={"message_id": trigger.id}, headers=headers)).json()
+    assert [(m["value"], m["status"]) for m in at_trigger["medications"]] == [("Ibuprofen", "active")]
+    current = (await client.get(history, headers=headers)).json()
+    assert current["version"] == 2
+    assert [(m["value"], m["status"]) for m in current["medications"]] == [("Ibuprofen", "stopped"), ("Warfarin", "active")]
+    assert (await client.get(history, params={"message_id": 0}, headers=headers)).status_code == 404
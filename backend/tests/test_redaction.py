@@ -18,6 +18,78 @@ def test_pii_redaction_logic():
     # Let's verify what the actual implementation supports. 
     # Assuming standard NRIC/Phone patterns as per requirements.
 
+import random
+import re
+from app.core.privacy import RegexDetector, NricChecksumDetector, DictionaryDetector, redact_pii_batch, redact_pii_async
+
+# The original patterns, frozen: the pipeline has since gained categories of its own
+ORIGINAL_PATTERNS = {
+    "nric": r"[STFG]\d{7}[A-Z]",
+    "phone": r"(\+?65)?[ -]?\d{4}[ -]?\d{4}",
+    "email": r"[\w\.-]+@[\w\.-]+\.\w+",
+    "name": r"(?<=My name is )[A-Z][a-z]+ [A-Z][a-z]+",
+    "ssn": r'\b\d{3}-\d{2}-\d{4}\b',
+    "id_generic": r'\bID\d{5,}\b',
+}
+
+def _sequential_redact(text: str) -> str:
+    # The original one-re.sub-per-pattern implementation
+    for ptype, pattern in ORIGINAL_PATTERNS.items():
+        text = re.sub(pattern, f"[{ptype.upper()}_REDACTED]", text)
+    return text
+
+def test_single_pass_matches_sequential_redaction():
+    # Only PII the original patterns covered (MRN-style "ID1234" is redacted by the pipeline now)
+    messages = [
+        "My name is John Doe, my IC is S1234567A and my phone is +65 9123 4567.",
+        "Call 8123-4567 or email tan.mei.ling@example.com after 5pm.",
+        "SSN 123-45-6789, patient ID204518, took 500mg at 08:30.",
+        "My blood sugar was 7.8 this morning, no PII here.",
+        "F7654321X and G1234567Z are both on file; ticket 1234 is too short.",
+        "",
+    ]
+    for text in messages:
+        assert redact_pii(text) == _sequential_redact(text)
+    assert redact_pii_batch(messages + [None]) == [redact_pii(t) for t in messages] + [None]
+
+def test_digit_walk_matches_full_scan():
+    # Guards DIGIT_ANCHORED: skipping to digits must not change what the full alternation finds
+    detector = RegexDetector()
+    rng = random.Random(0)
+    alphabet = "SFGIDMRNmrn:#()0123456789+- -@.abMy name is Ann Lee"
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 40)))
+        redacted, _ = detector.redact(text)
+        assert redacted == detector.regex.sub(lambda m: detector.tokens[m.lastgroup], text)
+
+def test_unformatted_phone_numbers_are_redacted_whole():
+    # The 8-digit SG pattern must not take part of a longer number and leak the remaining digits
+    assert redact_pii("call 5551234567 please") == "call [PHONE_INTL_REDACTED] please"
+    assert redact_pii("call 15551234567") == "call [PHONE_INTL_REDACTED]"
+    assert redact_pii("+1 (555) 123-4567") == "[PHONE_INTL_REDACTED]"
+    assert redact_pii("my phone is +65 9123 4567") == "my phone is [PHONE_REDACTED]"
+
+def test_nric_checksum_and_dictionary_detectors():
+    assert NricChecksumDetector.is_valid("S1234567D")
+    assert not NricChecksumDetector.is_valid("S1234567A")
+
+    # Loose spellings are redacted only with a valid check letter
+    assert redact_pii("IC is s 1234567 d") == "IC is [NRIC_REDACTED]"
+    assert redact_pii("Order s 1234567 a") == "Order s 1234567 a"
+    assert redact_pii("FIN M1234567K") == "FIN [NRIC_REDACTED]"
+
+    detector = DictionaryDetector(["Ward 7B", "Dr. Lim"])
+    redacted, hits = detector.redact("Dr Lim on ward 7b said hi; Limited supply.")
+    assert redacted == "[TERM_REDACTED] on [TERM_REDACTED] said hi; Limited supply."
+    assert hits == {"term": 2}
+
+@pytest.mark.asyncio
+async def test_large_text_redacted_off_loop():
+    pasted = "Potassium 4.1 mmol/L, sodium 139. " * 1000 + "Call me at 9123 4567."
+    redacted = await redact_pii_async(pasted)
+    assert redacted == redact_pii(pasted)
+    assert redacted.endswith("Call me at[PHONE_REDACTED].")
+
 from httpx import AsyncClient
 
 @pytest.mark.asyncio
@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+from app.services.risk_rules import RiskRuleClassifier
+from app.schemas import RiskLevel
+
+CORPUS = Path(__file__).parent / "data" / "risk_corpus.jsonl"
+
+def _load_corpus():
+    with open(CORPUS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# Rule pre-classifier against the labeled corpus
+def test_rule_fast_path_precision_and_recall():
+    classifier = RiskRuleClassifier()
+    rows = _load_corpus()
+    hits = [row for row in rows if classifier.match(row["text"])]
+    high = [row for row in rows if row["label"] == "HIGH"]
+
+    # The fast path skips the LLM, so it must never fire on a non-emergency
+    false_positives = [row["text"] for row in hits if row["label"] != "HIGH"]
+    assert false_positives == []
+    recall = sum(1 for row in hits if row["label"] == "HIGH") / len(high)
+    assert recall >= 0.8
+
+def test_negated_and_hypothetical_mentions_defer_to_llm():
+    classifier = RiskRuleClassifier()
+    assert classifier.classify("No chest pain today, just a bit tired") is None
+    assert classifier.classify("What are the signs of a heart attack?") is None
+    assert classifier.classify("My father had a stroke last year") is None
+    # Past, resolved or reported by someone else
+    assert classifier.classify("I had chest pain yesterday, feeling fine now") is None
+    assert classifier.classify("I used to feel suicidal but I am doing well now") is None
+    assert classifier.classify("The doctor asked about chest pain") is None
+    assert classifier.classify("I've had crushing chest pain for the last hour") is not None
+    # Second-hand, admin and figurative mentions; the same phrase reported now still fires
+    assert classifier.classify("I cannot breathe through my nose because of a cold") is None
+    assert classifier.classify("Refill for nitroglycerin for my chest pain please") is None
+    assert classifier.classify("I have chest pain, I need a refill of my nitro spray") is not None
+
+    result = classifier.classify("No chest pain, but I can't breathe")
+    assert result.risk_level == RiskLevel.HIGH
+    assert "breathing" in result.reason
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from app.api.v1.endpoints import chat as chat_endpoint
+from app.core.metrics import metrics
+from app.db.models import Message
+
+class StubRiskChain:
+    def __init__(self, level: str):
+        self.level = level
+
+    async def ainvoke(self, inputs):
+        # Give the speculative reply time to start before the gate decides
+        await asyncio.sleep(0.05)
+        return {"risk_level": self.level, "reason": "stub triage", "summary": "- stub triage"}
+
+class StubChatChain:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.started = False
+        self.cancelled = False
+
+    async def ainvoke(self, inputs):
+        self.started = True
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {"content": "SPECULATIVE REPLY", "confidence": "High", "reason": "stub", "citations": []}
+
+@pytest.fixture
+def speculative(monkeypatch):
+    monkeypatch.setattr(chat_endpoint, "SPECULATIVE_CHAT_REPLY", True)
+    chat_endpoint.risk_service.cache = None
+
+async def _ai_messages(conversation_id: int):
+    async with chat_endpoint.SessionLocal() as session:
+        result = await session.execute(
+            select(Message).where(Message.conversation_id == conversation_id, Message.sender_type == "ai")
+        )
+        return result.scalars().all()
+
+# Speculative reply: escalations cancel it, and it is never saved or returned
+@pytest.mark.asyncio
+@pytest.mark.parametrize("level", ["HIGH", "MEDIUM"])
+async def test_speculative_reply_discarded_on_escalation(client: AsyncClient, patient_token: str, speculative, level: str):
+    chat_endpoint.risk_service.chain = StubRiskChain(level)
+    chat_chain = StubChatChain(delay=5)
+    chat_endpoint.chat_service.chain = chat_chain
+    wasted_before = metrics.get("speculative_reply_total", outcome="wasted")
+
+    resp = await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "My head feels odd"},
+                             headers={"Authorization": f"Bearer {patient_token}"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert "escalation_id" in data
+    assert "SPECULATIVE" not in resp.text
+
+    assert chat_chain.started and chat_chain.cancelled
+    assert metrics.get("speculative_reply_total", outcome="wasted") == wasted_before + 1
+    replies = await _ai_messages(data["conversation_id"])
+    assert [m.content for m in replies] == [chat_endpoint.ESCALATION_MESSAGE]
+
+@pytest.mark.asyncio
+async def test_speculative_reply_used_when_low(client: AsyncClient, patient_token: str, speculative):
+    chat_endpoint.risk_service.chain = StubRiskChain("LOW")
+    chat_endpoint.chat_service.chain = StubChatChain(delay=0)
+    used_before = metrics.get("speculative_reply_total", outcome="used")
+
+    resp = await client.post("/api/v1/chat/", json={"conversation_id": 0, "content": "Can I book an appointment?"},
+                             headers={"Authorization": f"Bearer {patient_token}"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["content"] == "SPECULATIVE REPLY"
+    assert metrics.get("speculative_reply_total", outcome="used") == used_before + 1
+    replies = await _ai_messages(data["conversation_id"])
+    assert [m.content for m in replies] == ["SPECULATIVE REPLY"]
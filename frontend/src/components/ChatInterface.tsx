@@ -1,4 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
+import { readEvents } from '../lib/sse';
 
 
 // Types
@@ -20,27 +21,45 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ token }) => {
     const [isEscalated, setIsEscalated] = useState(false);
     const messagesEndRef = useRef<null | HTMLDivElement>(null);
 
-    // Poll for new messages every 3 seconds
+    // Subscribe to new messages (server push); reconnects resume from the last seen id
     useEffect(() => {
         if (conversationId === 0) return;
 
-        const fetchMessages = async () => {
-            try {
-                const res = await fetch(`/api/v1/chat/${conversationId}/history`, {
-                    headers: { 'Authorization': `Bearer ${token}` }
-                });
-                if (res.ok) {
-                    const data = await res.json();
-                    // Simple state update - in prod use better diffing
-                    setMessages(data);
+        let serverMessages: Message[] = [];
+        let stopped = false;
+        const controller = new AbortController();
+
+        const subscribe = async () => {
+            while (!stopped) {
+                try {
+                    const lastId = serverMessages.length ? serverMessages[serverMessages.length - 1].id : null;
+                    const url = lastId !== null
+                        ? `/api/v1/chat/${conversationId}/events?since=${lastId}`
+                        : `/api/v1/chat/${conversationId}/events`;
+                    const res = await fetch(url, {
+                        headers: { 'Authorization': `Bearer ${token}` },
+                        signal: controller.signal
+                    });
+                    if (!res.ok || !res.body) throw new Error(`Subscription failed: ${res.status}`);
+                    await readEvents(res, (event, data) => {
+                        if (event !== 'message' || serverMessages.some(m => m.id === data.id)) return;
+                        serverMessages = [...serverMessages, data];
+                        // Server state replaces optimistic local messages
+                        setMessages(serverMessages);
+                    });
+                } catch (e) {
+                    if (stopped) return;
+                    console.error(e);
                 }
-            } catch (e) { console.error(e); }
+                // Stream ended or failed: back off briefly, then resume from the cursor
+                await new Promise(resolve => setTimeout(resolve, 3000));
+            }
         };
 
-        fetchMessages();
-        const interval = setInterval(fetchMessages, 3000);
+        subscribe();
         return () => {
-            clearInterval(interval);
+            stopped = true;
+            controller.abort();
         };
     }, [conversationId, token]);
 
@@ -66,8 +85,19 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ token }) => {
     const sendMessage = async () => {
         if (!input.trim()) return;
 
+        const content = input;
+        const streamingId = -Date.now();
+        let streamed = '';
+        setInput('');
+        setMessages(prev => [...prev, {
+            id: Date.now() - 1,
+            sender_type: 'patient',
+            content,
+            timestamp: new Date().toISOString()
+        }]);
+
         try {
-            const response = await fetch('/api/v1/chat/', {
+            const response = await fetch('/api/v1/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -75,49 +105,55 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({ token }) => {
                 },
                 body: JSON.stringify({
                     conversation_id: conversationId,
-                    content: input
+                    content
                 })
             });
+            if (!response.ok || !response.body) throw new Error(`Chat failed: ${response.status}`);
 
-            const data = await response.json();
-
-            // If new conversation created
-            if (conversationId === 0 && data.conversation_id) {
-                setConversationId(data.conversation_id);
-            }
-
-            // If escalation
-            if (data.message && data.escalation_id) {
-                // Add system message
-                const sysMsg: Message = {
-                    id: Date.now(),
-                    sender_type: 'ai',
-                    content: `[SYSTEM] ${data.message}`,
-                    timestamp: new Date().toISOString()
-                };
-                setMessages(prev => [...prev, {
-                    id: Date.now() - 1,
-                    sender_type: 'patient',
-                    content: input,
-                    timestamp: new Date().toISOString()
-                }, sysMsg]);
-                setIsEscalated(true);
-            } else {
-                // Normal chat reply
-                setMessages(prev => [...prev, {
-                    id: Date.now() - 1,
-                    sender_type: 'patient',
-                    content: input,
-                    timestamp: new Date().toISOString()
-                }, {
-                    id: data.id,
-                    sender_type: data.sender_type,
-                    content: data.content,
-                    timestamp: data.timestamp
-                }]);
-            }
-
-            setInput('');
+            await readEvents(response, (event, data) => {
+                if (event === 'token') {
+                    // Render streamed tokens in a placeholder AI bubble (survives history polls replacing state)
+                    streamed += data.content;
+                    const text = streamed;
+                    setMessages(prev => prev.some(m => m.id === streamingId)
+                        ? prev.map(m => m.id === streamingId ? { ...m, content: text } : m)
+                        : [...prev, {
+                            id: streamingId,
+                            sender_type: 'ai',
+                            content: text,
+                            timestamp: new Date().toISOString()
+                        }]);
+                } else if (event === 'final') {
+                    if (conversationId === 0 && data.conversation_id) {
+                        setConversationId(data.conversation_id);
+                    }
+                    const finalMsg: Message = {
+                        id: data.id,
+                        sender_type: data.sender_type,
+                        content: data.content,
+                        timestamp: data.timestamp
+                    };
+                    setMessages(prev => {
+                        // The subscription may already have delivered the saved reply
+                        if (prev.some(m => m.id === finalMsg.id)) return prev.filter(m => m.id !== streamingId);
+                        return prev.some(m => m.id === streamingId)
+                            ? prev.map(m => m.id === streamingId ? finalMsg : m)
+                            : [...prev, finalMsg];
+                    });
+                } else if (event === 'escalation') {
+                    if (conversationId === 0 && data.conversation_id) {
+                        setConversationId(data.conversation_id);
+                    }
+                    // Add system message
+                    setMessages(prev => [...prev, {
+                        id: Date.now(),
+                        sender_type: 'ai',
+                        content: `[SYSTEM] ${data.message}`,
+                        timestamp: new Date().toISOString()
+                    }]);
+                    setIsEscalated(true);
+                }
+            });
         } catch (e) {
             console.error("Error sending message", e);
         }
@@ -1,4 +1,5 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
+import { readEvents } from '../lib/sse';
 
 // Types
 interface PatientListItem {
@@ -40,7 +41,9 @@ interface Escalation {
     trigger_message_id: number;
     status: string;
     triage_summary: string;
-    patient_profile_snapshot?: any;
+    patient_profile_snapshot?: any; // Legacy escalations; newer ones reference profile_version (GET /escalations/{id}/profile)
+    profile_id?: number | null;
+    profile_version?: number | null;
     created_at?: string;
 }
 
@@ -49,6 +52,7 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
     const [selectedPatientId, setSelectedPatientId] = useState<number | null>(null);
     const [selectedProfile, setSelectedProfile] = useState<PatientProfile | null>(null);
     const [messageLog, setMessageLog] = useState<MessageLogItem[]>([]);
+    const [messageCursor, setMessageCursor] = useState<string | null>(null); // X-Next-Cursor for older messages
     const [loading, setLoading] = useState(false);
 
     // Escalation State
@@ -57,6 +61,13 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
     const [selectedEscalationId, setSelectedEscalationId] = useState<number | null>(null);
     const [replyContent, setReplyContent] = useState('');
     const [submittingReply, setSubmittingReply] = useState(false);
+    // Degraded mode: AI triage unavailable, some messages are waiting for re-triage
+    const [triageStatus, setTriageStatus] = useState<{ degraded: boolean; pending_retriage: number } | null>(null);
+
+    // Bumped by live events to refetch the selected patient's profile/log
+    const [patientRefreshKey, setPatientRefreshKey] = useState(0);
+    const selectedPatientRef = useRef<number | null>(null);
+    useEffect(() => { selectedPatientRef.current = selectedPatientId; }, [selectedPatientId]);
 
     // Fetch Patient List
     const fetchPatients = async () => {
@@ -88,15 +99,79 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
         }
     };
 
-    // Poll for list updates
+    const fetchTriageStatus = async () => {
+        try {
+            const res = await fetch('/api/v1/clinician/status', {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (res.ok) {
+                setTriageStatus(await res.json());
+            }
+        } catch (e) {
+            console.error("Failed to fetch triage status", e);
+        }
+    };
+
+    // Circuit state changes are not pushed; poll the degraded flag
+    useEffect(() => {
+        const timer = setInterval(fetchTriageStatus, 30000);
+        return () => clearInterval(timer);
+    }, [token]);
+
+    // Live clinician feed (server push) instead of polling
     useEffect(() => {
-        fetchPatients();
-        fetchEscalations();
-        const interval = setInterval(() => {
+        let stopped = false;
+        const controller = new AbortController();
+
+        const refreshAll = () => {
             fetchPatients();
             fetchEscalations();
-        }, 5000);
-        return () => clearInterval(interval);
+            fetchTriageStatus();
+            setPatientRefreshKey(k => k + 1);
+        };
+
+        const subscribe = async () => {
+            while (!stopped) {
+                // (Re)connecting: anything could have changed meanwhile
+                refreshAll();
+                try {
+                    const res = await fetch('/api/v1/clinician/events', {
+                        headers: { 'Authorization': `Bearer ${token}` },
+                        signal: controller.signal
+                    });
+                    if (!res.ok || !res.body) throw new Error(`Feed failed: ${res.status}`);
+                    await readEvents(res, (event, data) => {
+                        const isSelected = data.patient_id !== undefined && data.patient_id === selectedPatientRef.current;
+                        if (event === 'escalation.created' || event === 'escalation.resolved') {
+                            fetchEscalations();
+                            fetchPatients();
+                            fetchTriageStatus();
+                            if (isSelected) setPatientRefreshKey(k => k + 1);
+                        } else if (event === 'escalation.updated') {
+                            fetchEscalations();
+                        } else if (event === 'patient.activity') {
+                            fetchPatients();
+                            fetchTriageStatus();
+                            if (isSelected) setPatientRefreshKey(k => k + 1);
+                        } else if (event === 'profile.updated') {
+                            if (isSelected) setPatientRefreshKey(k => k + 1);
+                        } else if (event === 'resync') {
+                            refreshAll();
+                        }
+                    });
+                } catch (e) {
+                    if (stopped) return;
+                    console.error("Clinician feed error", e);
+                }
+                await new Promise(resolve => setTimeout(resolve, 3000));
+            }
+        };
+
+        subscribe();
+        return () => {
+            stopped = true;
+            controller.abort();
+        };
     }, [token]);
 
     // Automatically select patient if escalation is selected
@@ -118,6 +193,7 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
         if (!selectedPatientId) {
             setSelectedProfile(null);
             setMessageLog([]);
+            setMessageCursor(null);
             return;
         }
 
@@ -140,6 +216,7 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
                 if (resMsg.ok) {
                     const dataMsg = await resMsg.json();
                     setMessageLog(dataMsg);
+                    setMessageCursor(resMsg.headers.get('X-Next-Cursor'));
                 }
 
             } catch (e) {
@@ -149,12 +226,26 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
             }
         };
 
+        // Refetched on selection and whenever the live feed reports changes for this patient
         fetchData();
-        // Set up separate poll for updates if needed, or just refresh on select
-        const interval = setInterval(fetchData, 3000);
-        return () => clearInterval(interval);
 
-    }, [selectedPatientId, token]);
+    }, [selectedPatientId, token, patientRefreshKey]);
+
+    const loadOlderMessages = async () => {
+        if (!selectedPatientId || !messageCursor) return;
+        try {
+            const res = await fetch(`/api/v1/clinician/patient/${selectedPatientId}/messages?before=${messageCursor}`, {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (res.ok) {
+                const older: MessageLogItem[] = await res.json();
+                setMessageLog(prev => [...prev, ...older.filter(m => !prev.some(p => p.id === m.id))]);
+                setMessageCursor(res.headers.get('X-Next-Cursor'));
+            }
+        } catch (e) {
+            console.error(e);
+        }
+    };
 
 
     return (
@@ -162,6 +253,11 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
             {/* Left Sidebar: Patient List & Triage Queue */}
             <div className="w-1/3 bg-gray-50 border-r border-gray-200 flex flex-col">
                 <div className="p-0 border-b border-gray-200 bg-white">
+                    {triageStatus?.degraded && (
+                        <div className="px-4 py-2 text-xs font-semibold text-amber-800 bg-amber-50 border-b border-amber-200">
+                            AI triage degraded: {triageStatus.pending_retriage} message(s) awaiting re-triage. Only rule-detected emergencies are escalating.
+                        </div>
+                    )}
                     <div className="flex border-b">
                         <button
                             onClick={() => setActiveTab('patients')}
@@ -492,6 +588,14 @@ const ClinicianDashboard: React.FC<ClinicianDashboardProps> = ({ token }) => {
                                                 </tbody>
                                             </table>
                                             {messageLog.length === 0 && <div className="p-6 text-center text-gray-400 italic">No messages recorded.</div>}
+                                            {messageCursor && (
+                                                <button
+                                                    onClick={loadOlderMessages}
+                                                    className="w-full py-3 text-xs font-semibold text-blue-600 hover:bg-blue-50 border-t border-gray-100"
+                                                >
+                                                    Load older messages
+                                                </button>
+                                            )}
                                         </div>
                                     </div>
 